@@ -6,6 +6,9 @@
 -- Enable PostGIS extension for geospatial data
 CREATE EXTENSION IF NOT EXISTS postgis;
 
+-- Enable trigram matching for substring (ILIKE '%...%') searches
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- =====================================================
 -- GEOSPATIAL & MONITORING (Operational)
 -- =====================================================
@@ -50,18 +53,54 @@ CREATE TABLE Pollutant (
     description TEXT
 );
 
--- AirQualityReading Table
-CREATE TABLE AirQualityReading (
+-- RawIngestion Table (raw provider payloads, stored once per payload)
+CREATE TABLE RawIngestion (
     id SERIAL PRIMARY KEY,
+    provider_id INTEGER REFERENCES Provider(id) ON DELETE SET NULL,
+    payload_hash VARCHAR(64) UNIQUE NOT NULL, -- sha256 of the payload
+    payload JSONB NOT NULL,
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- AirQualityReading Table, partitioned by month on datetime
+CREATE TABLE AirQualityReading (
+    id SERIAL,
     station_id INTEGER NOT NULL REFERENCES Station(id) ON DELETE CASCADE,
     pollutant_id INTEGER NOT NULL REFERENCES Pollutant(id) ON DELETE CASCADE,
     provider_id INTEGER REFERENCES Provider(id) ON DELETE SET NULL,
     datetime TIMESTAMP NOT NULL,
     value FLOAT NOT NULL, -- Normalized to canonical units
     aqi INTEGER,
-    raw_json JSONB, -- Raw payload for audit trail
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    raw_json JSONB, -- Legacy inline payload, see raw_ingestion_id
+    raw_ingestion_id INTEGER REFERENCES RawIngestion(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, datetime),
+    CONSTRAINT uq_reading UNIQUE (station_id, pollutant_id, datetime)
+) PARTITION BY RANGE (datetime);
+
+-- Catch-all for readings outside the monthly partitions (e.g. seeded history)
+CREATE TABLE AirQualityReading_default PARTITION OF AirQualityReading DEFAULT;
+
+-- Create (if missing) the monthly partition containing month_start.
+-- Called for the current and next month here and by the daily aggregation job.
+CREATE OR REPLACE FUNCTION ensure_airqualityreading_partition(month_start DATE)
+RETURNS VOID AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month_start)::date;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'airqualityreading' AND relkind = 'p') THEN
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF airqualityreading FOR VALUES FROM (%L) TO (%L)',
+            'airqualityreading_y' || to_char(start_date, 'YYYY') || 'm' || to_char(start_date, 'MM'),
+            start_date,
+            (start_date + INTERVAL '1 month')::date
+        );
+    END IF;
+END;
+$$ language 'plpgsql';
+
+SELECT ensure_airqualityreading_partition(CURRENT_DATE);
+SELECT ensure_airqualityreading_partition((CURRENT_DATE + INTERVAL '1 month')::date);
 
 -- =====================================================
 -- USERS & ACCESS CONTROL (Operational)
@@ -169,6 +208,7 @@ CREATE TABLE AirQualityDailyStats (
     avg_aqi INTEGER,
     max_aqi INTEGER,
     min_aqi INTEGER,
+    p95_value FLOAT,
     readings_count INTEGER,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE (station_id, pollutant_id, date)
@@ -185,15 +225,16 @@ CREATE INDEX idx_mapregion_geom ON MapRegion USING gist(geom);
 -- Station indexes
 CREATE INDEX idx_station_city ON Station(city);
 CREATE INDEX idx_station_country ON Station(country);
+CREATE INDEX idx_station_city_trgm ON Station USING gin(city gin_trgm_ops);
+CREATE INDEX idx_station_country_trgm ON Station USING gin(country gin_trgm_ops);
 CREATE INDEX idx_station_region_id ON Station(region_id);
 CREATE INDEX idx_station_provider_id ON Station(provider_id);
 
 -- AirQualityReading indexes (critical for query performance)
-CREATE INDEX idx_aqr_station_id ON AirQualityReading(station_id);
 CREATE INDEX idx_aqr_pollutant_id ON AirQualityReading(pollutant_id);
-CREATE INDEX idx_aqr_datetime ON AirQualityReading(datetime DESC);
 CREATE INDEX idx_aqr_station_datetime ON AirQualityReading(station_id, datetime DESC);
-CREATE INDEX idx_aqr_station_pollutant_datetime ON AirQualityReading(station_id, pollutant_id, datetime DESC);
+CREATE INDEX idx_aqr_station_pollutant_datetime_cov ON AirQualityReading(station_id, pollutant_id, datetime DESC) INCLUDE (value, aqi);
+CREATE INDEX idx_aqr_datetime_station_pollutant ON AirQualityReading(datetime, station_id, pollutant_id);
 CREATE INDEX idx_aqr_aqi ON AirQualityReading(aqi) WHERE aqi IS NOT NULL;
 CREATE INDEX idx_aqr_raw_json ON AirQualityReading USING gin(raw_json);
 
@@ -204,18 +245,18 @@ CREATE INDEX idx_appuser_role_id ON AppUser(role_id);
 CREATE INDEX idx_appuser_is_active ON AppUser(is_active) WHERE is_active = TRUE;
 
 -- Alert indexes
-CREATE INDEX idx_alert_user_id ON Alert(user_id);
+CREATE INDEX idx_alert_user_active ON Alert(user_id, is_active);
 CREATE INDEX idx_alert_station_id ON Alert(station_id);
 CREATE INDEX idx_alert_is_active ON Alert(is_active) WHERE is_active = TRUE;
 CREATE INDEX idx_alert_triggered_at ON Alert(triggered_at DESC);
 
 -- Recommendation indexes
-CREATE INDEX idx_recommendation_user_id ON Recommendation(user_id);
+CREATE INDEX idx_recommendation_user_created ON Recommendation(user_id, created_at DESC);
 CREATE INDEX idx_recommendation_station_id ON Recommendation(station_id);
 CREATE INDEX idx_recommendation_created_at ON Recommendation(created_at DESC);
 
 -- Report indexes
-CREATE INDEX idx_report_user_id ON Report(user_id);
+CREATE INDEX idx_report_user_created ON Report(user_id, created_at DESC);
 CREATE INDEX idx_report_created_at ON Report(created_at DESC);
 CREATE INDEX idx_report_date_range ON Report(start_date, end_date);
 
@@ -240,6 +281,18 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_appuser_updated_at BEFORE UPDATE ON AppUser
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Notify the alert checker when a new reading arrives (payload: station_id:pollutant_id)
+CREATE OR REPLACE FUNCTION notify_airqualityreading_inserted()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('aqr_new', NEW.station_id || ':' || NEW.pollutant_id);
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER airquality_notify AFTER INSERT ON AirQualityReading
+    FOR EACH ROW EXECUTE FUNCTION notify_airqualityreading_inserted();
+
 -- =====================================================
 -- INITIAL DATA (Optional)
 -- =====================================================
@@ -298,7 +351,9 @@ COMMENT ON TABLE Recommendation IS 'Personalized health recommendations based on
 COMMENT ON TABLE ProductRecommendation IS 'Product suggestions for health protection';
 COMMENT ON TABLE Report IS 'Generated reports for data analysis';
 COMMENT ON TABLE AirQualityDailyStats IS 'Pre-aggregated daily statistics for performance';
+COMMENT ON TABLE RawIngestion IS 'Raw provider payloads, deduplicated by hash and referenced by readings';
 
-COMMENT ON COLUMN AirQualityReading.raw_json IS 'Raw API payload stored for audit trail and reprocessing';
+COMMENT ON COLUMN AirQualityReading.raw_json IS 'Legacy raw API payload; new readings reference RawIngestion instead';
+COMMENT ON COLUMN AirQualityReading.raw_ingestion_id IS 'Raw API payload stored for audit trail and reprocessing';
 COMMENT ON COLUMN Alert.threshold IS 'AQI or concentration value that triggers the alert';
 COMMENT ON COLUMN Recommendation.aqi_band IS 'EPA AQI band: 0=Good, 1=Moderate, 2=USG, 3=Unhealthy, 4=VeryUnhealthy, 5=Hazardous';
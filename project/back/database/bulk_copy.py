@@ -0,0 +1,58 @@
+"""
+Bulk loading helpers for PostgreSQL
+Streams rows through COPY FROM STDIN, the fastest way to load large batches
+(no per-row parse/plan, unlike INSERT even in multi-values form)
+"""
+
+import csv
+import io
+import json
+from typing import Any, Dict, List
+
+from sqlalchemy import JSON
+from sqlalchemy.orm import Session
+
+
+def copy_rows(session: Session, model, rows: List[Dict[str, Any]]) -> int:
+    """
+    Load a list of dicts into the model's table using COPY ... FROM STDIN
+
+    Columns are taken from the model's table, in table order, restricted to
+    the keys present in the rows, so server-side defaults (id, created_at)
+    still apply. Runs on the session's current connection/transaction; the
+    caller is responsible for committing.
+
+    Note: COPY aborts on any constraint violation, so rows must already be
+    de-duplicated against the table.
+
+    Returns:
+        Number of rows copied
+    """
+    if not rows:
+        return 0
+
+    table = model.__table__
+    keys = set(rows[0].keys())
+    columns = [c for c in table.columns if c.name in keys]
+    json_columns = {c.name for c in columns if isinstance(c.type, JSON)}
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        record = []
+        for column in columns:
+            value = row.get(column.name)
+            if value is not None and column.name in json_columns:
+                value = json.dumps(value)
+            record.append(value)
+        writer.writerow(record)
+    buf.seek(0)
+
+    column_list = ", ".join(f'"{c.name}"' for c in columns)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH CSV', buf)
+    finally:
+        cursor.close()
+
+    return len(rows)
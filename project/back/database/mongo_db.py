@@ -1,3 +1,4 @@
+from functools import lru_cache
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 
@@ -10,23 +11,41 @@ MONGODB_DB = os.getenv("MONGODB_DB", "airquality_logs")
 
 MONGODB_URL = f"mongodb://{MONGODB_USER}:{MONGODB_PASSWORD}@{MONGODB_HOST}:{MONGODB_PORT}"
 
-# Create MongoDB client
-client = AsyncIOMotorClient(MONGODB_URL)
-database = client[MONGODB_DB]
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "5"))
+
+# MongoDB client is built lazily on first use
+# (pool sized explicitly instead of Motor defaults)
+@lru_cache(maxsize=1)
+def get_mongo_client() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        MONGODB_URL,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=60000,
+    )
+
+@lru_cache(maxsize=1)
+def _database():
+    return get_mongo_client()[MONGODB_DB]
 
 # Dependency to get MongoDB database
 async def get_mongo_db():
-    return database
+    return _database()
 
-# Collections
+# Collections (handles are cached after the first call)
+@lru_cache(maxsize=1)
 def get_api_logs_collection():
-    return database.api_logs
+    return _database()["api_logs"]
 
+@lru_cache(maxsize=1)
 def get_error_logs_collection():
-    return database.error_logs
+    return _database()["error_logs"]
 
+@lru_cache(maxsize=1)
 def get_data_ingestion_logs_collection():
-    return database.data_ingestion_logs
+    return _database()["data_ingestion_logs"]
 
+@lru_cache(maxsize=1)
 def get_alert_history_collection():
-    return database.alert_history
+    return _database()["alert_history"]
@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine
+import logging
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+from sqlalchemy import create_engine, event, func, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 import os
 
 # Database URL
@@ -12,15 +17,142 @@ POSTGRES_DB = os.getenv("POSTGRES_DB", "airquality_db")
 
 DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
-# Create engine
-engine = create_engine(DATABASE_URL, echo=True)
+# Direct server address for session-level features that a transaction-mode
+# PgBouncer cannot multiplex (LISTEN/NOTIFY); defaults to the address above
+POSTGRES_DIRECT_HOST = os.getenv("POSTGRES_DIRECT_HOST", POSTGRES_HOST)
+POSTGRES_DIRECT_PORT = os.getenv("POSTGRES_DIRECT_PORT", POSTGRES_PORT)
+
+DIRECT_DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_DIRECT_HOST}:{POSTGRES_DIRECT_PORT}/{POSTGRES_DB}"
+
+# SQL logging is opt-in: SQL_ECHO=1 echoes every statement (debug only),
+# SQL_LOG_LEVEL=INFO enables it through the standard logging config
+SQL_ECHO = os.getenv("SQL_ECHO") == "1"
+logging.getLogger("sqlalchemy.engine").setLevel(os.getenv("SQL_LOG_LEVEL", "WARNING").upper())
+
+# Connection pool (shared by API requests and background jobs).
+# pool_pre_ping transparently replaces connections dropped while idle and
+# pool_recycle retires them before server/proxy idle timeouts.
+# pool_timeout bounds how long a checkout waits once all
+# pool_size + max_overflow connections are in use.
+# LIFO checkout reuses the most recently returned (warm) connections and
+# lets the surplus sit idle long enough to be recycled; pre-ping costs one
+# round trip per checkout and can be disabled (DB_POOL_PRE_PING=0) where
+# connections are never dropped behind the app's back
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections opened at startup so first requests don't pay the connect cost
+DB_POOL_WARM_SIZE = int(os.getenv("DB_POOL_WARM_SIZE", "5"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_USE_LIFO = os.getenv("DB_POOL_USE_LIFO", "1") == "1"
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# Per-request SQL statistics (query count and time), exposed by main.py as
+# X-SQL-Queries / X-SQL-Time response headers to spot N+1 regressions
+SQL_QUERY_STATS = os.getenv("SQL_QUERY_STATS") == "1"
+
+# Holds a mutable QueryStats while a request is being served; the object
+# (not the variable) is updated, so counts made in threadpool workers,
+# which run in a copy of the request context, are still seen
+_query_stats: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+def start_query_stats() -> QueryStats:
+    """Start collecting SQL statistics for the current context (request)"""
+    stats = QueryStats()
+    _query_stats.set(stats)
+    return stats
+
+
+# The start time lives on the statement's execution context, not on the
+# connection: after_cursor_execute never fires for a statement that raises,
+# so nothing may be left behind on the pooled connection
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _query_stats.get() is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _query_stats.get()
+    start = getattr(context, "_query_start", None)
+    if stats is not None and start is not None:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - start
+
+# Engine and session factory are built lazily on first use, so importing
+# this module (e.g. transitively through models) is free
+@lru_cache(maxsize=1)
+def get_engine():
+    # values_plus_batch makes psycopg2 rewrite executemany() calls into multi-row
+    # INSERT ... VALUES (...), (...) statements and batch UPDATE/DELETE as well.
+    # Use session.execute(insert(Model), list_of_dicts) to benefit from it.
+    engine = create_engine(
+        DATABASE_URL,
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=1000,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_use_lifo=DB_POOL_USE_LIFO,
+        echo=SQL_ECHO,
+    )
+    if SQL_QUERY_STATS:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+def warm_pool(size: int = DB_POOL_WARM_SIZE):
+    """
+    Open `size` pooled connections (capped at pool_size) and check each one
+    with SELECT 1; they stay in the pool when returned
+    """
+    connections = []
+    try:
+        for _ in range(min(size, DB_POOL_SIZE)):
+            conn = get_engine().connect()
+            connections.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            conn.close()
+
+@lru_cache(maxsize=1)
+def _session_factory() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
 
 # Create session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def SessionLocal() -> Session:
+    return _session_factory()()
 
 # Base class for models
 Base = declarative_base()
 
+def utc_hours_ago(hours: int):
+    """
+    SQL expression for "now minus N hours" evaluated by PostgreSQL.
+    Timestamps are stored as naive UTC, so now() is converted to UTC
+    timestamp without time zone: comparing a plain timestamp column with
+    timestamptz would cast every row and bypass its index
+    """
+    return func.timezone("UTC", func.now()) - text(f"INTERVAL '{int(hours)} hours'")
+
+def columns_for(model, schema) -> list:
+    """
+    Table columns of `model` named like the fields of a response schema, to
+    select read-only lists as plain rows instead of hydrating ORM objects
+    """
+    return [model.__table__.c[name] for name in schema.model_fields]
+
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
@@ -1,260 +1,454 @@
 """
 Database initialization script
-Seeds initial data: roles, permissions, pollutants
-Run this after the database schema is created
+Seeds initial data: roles, permissions, pollutants, providers, regions,
+stations and test users. Every table is seeded idempotently (only missing
+rows are inserted), so it is safe to run on every start.
+Run this after the database schema is created, or pass --init-schema
 """
 
+import argparse
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from database.postgres_db import SessionLocal, engine, Base
+from database.postgres_db import SessionLocal, get_engine, Base
 from models import Role, Permission, RolePermission, Pollutant, Provider, Station, MapRegion, AppUser
 
-def init_database():
-    """Initialize database with seed data"""
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+def install_reading_notify_trigger(db: Session):
+    """
+    Install (idempotently) the AFTER INSERT trigger that NOTIFYs the alert
+    checker on channel 'aqr_new' with payload 'station_id:pollutant_id'
+    """
+    db.execute(text("""
+        CREATE OR REPLACE FUNCTION notify_airqualityreading_inserted()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM pg_notify('aqr_new', NEW.station_id || ':' || NEW.pollutant_id);
+            RETURN NEW;
+        END;
+        $$ language 'plpgsql'
+    """))
+    db.execute(text("DROP TRIGGER IF EXISTS airquality_notify ON airqualityreading"))
+    db.execute(text("""
+        CREATE TRIGGER airquality_notify AFTER INSERT ON airqualityreading
+            FOR EACH ROW EXECUTE FUNCTION notify_airqualityreading_inserted()
+    """))
+    db.commit()
+
+
+def install_reading_partitions(db: Session):
+    """
+    Install (idempotently) ensure_airqualityreading_partition() and, when
+    airqualityreading is partitioned, its DEFAULT partition and the partitions
+    of the current and next month. Databases created before partitioning keep
+    their plain table (converting it needs a data migration).
+    """
+    db.execute(text("""
+        CREATE OR REPLACE FUNCTION ensure_airqualityreading_partition(month_start DATE)
+        RETURNS VOID AS $$
+        DECLARE
+            start_date DATE := date_trunc('month', month_start)::date;
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'airqualityreading' AND relkind = 'p') THEN
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF airqualityreading FOR VALUES FROM (%L) TO (%L)',
+                    'airqualityreading_y' || to_char(start_date, 'YYYY') || 'm' || to_char(start_date, 'MM'),
+                    start_date,
+                    (start_date + INTERVAL '1 month')::date
+                );
+            END IF;
+        END;
+        $$ language 'plpgsql'
+    """))
+    db.execute(text("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'airqualityreading' AND relkind = 'p') THEN
+                CREATE TABLE IF NOT EXISTS airqualityreading_default PARTITION OF airqualityreading DEFAULT;
+            END IF;
+        END $$
+    """))
+    db.execute(text("SELECT ensure_airqualityreading_partition(CURRENT_DATE)"))
+    db.execute(text("SELECT ensure_airqualityreading_partition((CURRENT_DATE + INTERVAL '1 month')::date)"))
+    db.commit()
+
+
+def upgrade_reading_indexes():
+    """
+    Replace the plain (station_id, pollutant_id, datetime DESC) index with the
+    covering version, and add the (datetime, station_id, pollutant_id)
+    index used by the daily aggregation, on databases created before they existed.
+    The single-column station_id/datetime indexes are prefixes of those and
+    are dropped.
+    CONCURRENTLY cannot run inside a transaction, hence AUTOCOMMIT.
+    Partitioned tables are skipped: they are created with their final indexes
+    and do not support CONCURRENTLY.
+    """
+    with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        partitioned = conn.execute(text(
+            "SELECT 1 FROM pg_class WHERE relname = 'airqualityreading' AND relkind = 'p'"
+        )).first()
+        if partitioned:
+            return
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aqr_station_pollutant_datetime_cov "
+            "ON airqualityreading (station_id, pollutant_id, datetime DESC) INCLUDE (value, aqi)"
+        ))
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_aqr_station_pollutant_datetime"))
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aqr_datetime_station_pollutant "
+            "ON airqualityreading (datetime, station_id, pollutant_id)"
+        ))
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_aqr_station_id"))
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_aqr_datetime"))
+
+
+def upgrade_user_list_indexes():
+    """
+    Replace the single-column user_id indexes of alert, report and
+    recommendation with composite ones matching the per-user list queries
+    (filter on is_active, order by created_at DESC), on databases created
+    before they existed.
+    CONCURRENTLY cannot run inside a transaction, hence AUTOCOMMIT.
+    """
+    with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alert_user_active "
+            "ON alert (user_id, is_active)"
+        ))
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_alert_user_id"))
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_report_user_created "
+            "ON report (user_id, created_at DESC)"
+        ))
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_report_user_id"))
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_recommendation_user_created "
+            "ON recommendation (user_id, created_at DESC)"
+        ))
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_recommendation_user_id"))
+
+
+def upgrade_station_search_indexes():
+    """
+    Add the pg_trgm GIN indexes that let city/country ILIKE '%...%' searches
+    use an index, on databases created before they existed
+    """
+    with get_engine().begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_station_city_trgm "
+            "ON station USING gin (city gin_trgm_ops)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_station_country_trgm "
+            "ON station USING gin (country gin_trgm_ops)"
+        ))
+
+
+def upgrade_reading_unique_key():
+    """
+    Add the uq_reading unique key (station_id, pollutant_id, datetime) that the
+    normalizer's ON CONFLICT DO NOTHING relies on, to databases created from an
+    older init_database.sql. Duplicate readings are removed first, keeping the
+    oldest row of each key.
+    """
+    with get_engine().begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'uq_reading'"
+        )).first()
+        if exists:
+            return
+        conn.execute(text("""
+            DELETE FROM airqualityreading a
+            USING airqualityreading b
+            WHERE a.station_id = b.station_id
+              AND a.pollutant_id = b.pollutant_id
+              AND a.datetime = b.datetime
+              AND a.id > b.id
+        """))
+        conn.execute(text(
+            "ALTER TABLE airqualityreading "
+            "ADD CONSTRAINT uq_reading UNIQUE (station_id, pollutant_id, datetime)"
+        ))
+
+
+def upgrade_daily_stats_columns():
+    """Add columns introduced after the first release to existing databases"""
+    with get_engine().begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE airqualitydailystats ADD COLUMN IF NOT EXISTS p95_value FLOAT"
+        ))
+
+
+def upgrade_raw_ingestion_table():
+    """
+    Create the RawIngestion table and the readings' raw_ingestion_id column
+    on databases created before raw payloads were moved out of the readings
+    """
+    with get_engine().begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS rawingestion (
+                id SERIAL PRIMARY KEY,
+                provider_id INTEGER REFERENCES provider(id) ON DELETE SET NULL,
+                payload_hash VARCHAR(64) UNIQUE NOT NULL,
+                payload JSONB NOT NULL,
+                received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        conn.execute(text(
+            "ALTER TABLE airqualityreading ADD COLUMN IF NOT EXISTS raw_ingestion_id INTEGER "
+            "REFERENCES rawingestion(id) ON DELETE SET NULL"
+        ))
+
+
+def seed_by_name(db: Session, model, rows: List[Dict[str, Any]]) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+    """
+    Insert the rows of a name-keyed seed table that are not present yet
+    
+    One SELECT of the existing (name, id) pairs plus, if needed, one
+    multi-row INSERT ... RETURNING for the missing ones.
+    
+    Returns:
+        (name -> id map for all rows, list of newly created {"id", "name"})
+    """
+    ids = {name: row_id for name, row_id in db.execute(select(model.name, model.id))}
+    missing = [row for row in rows if row["name"] not in ids]
+    
+    created = []
+    if missing:
+        result = db.execute(insert(model).returning(model.id, model.name), missing)
+        created = [{"id": row_id, "name": name} for row_id, name in result]
+        ids.update({row["name"]: row["id"] for row in created})
+    
+    return ids, created
+
+
+def seed_monitoring_network(db: Session):
+    """Seed mock providers, map regions and monitoring stations that don't exist yet"""
+    # Insert default providers (mock)
+    providers_data = [
+        {"name": "AQICN Mock", "api_endpoint": "https://api.waqi.info/feed/", "ingestion_frequency_minutes": 30},
+        {"name": "Google Air Quality Mock", "api_endpoint": "https://airquality.googleapis.com/v1/", "ingestion_frequency_minutes": 30},
+        {"name": "IQAir Mock", "api_endpoint": "https://api.airvisual.com/v2/", "ingestion_frequency_minutes": 60}
+    ]
+    provider_ids, created_providers = seed_by_name(db, Provider, providers_data)
+    print(f"Providers: {len(created_providers)} created, {len(provider_ids)} total")
+    
+    # Insert map regions. Only name/description are bound, so the PostGIS
+    # geom column is never sent (avoids geom type issues)
+    regions_data = [
+        {"name": "Bogotá D.C.", "description": "Capital city of Colombia"},
+        {"name": "Antioquia", "description": "Department of Antioquia"},
+        {"name": "Valle del Cauca", "description": "Department of Valle del Cauca"}
+    ]
+    region_ids, created_regions = seed_by_name(db, MapRegion, regions_data)
+    print(f"Regions: {len(created_regions)} created, {len(region_ids)} total")
     
+    # Insert monitoring stations
+    provider_aqicn = provider_ids["AQICN Mock"]
+    provider_google = provider_ids["Google Air Quality Mock"]
+    provider_iqair = provider_ids["IQAir Mock"]
+    
+    stations_data = [
+        {
+            "name": "Kennedy - Bogotá",
+            "latitude": 4.6097,
+            "longitude": -74.0817,
+            "city": "Bogotá",
+            "country": "Colombia",
+            "region_id": region_ids["Bogotá D.C."],
+            "provider_id": provider_aqicn
+        },
+        {
+            "name": "Usaquén - Bogotá",
+            "latitude": 4.7110,
+            "longitude": -74.0721,
+            "city": "Bogotá",
+            "country": "Colombia",
+            "region_id": region_ids["Bogotá D.C."],
+            "provider_id": provider_google
+        },
+        {
+            "name": "Medellín Centro",
+            "latitude": 6.2442,
+            "longitude": -75.5812,
+            "city": "Medellín",
+            "country": "Colombia",
+            "region_id": region_ids["Antioquia"],
+            "provider_id": provider_iqair
+        },
+        {
+            "name": "Envigado - Medellín",
+            "latitude": 6.1650,
+            "longitude": -75.5847,
+            "city": "Medellín",
+            "country": "Colombia",
+            "region_id": region_ids["Antioquia"],
+            "provider_id": provider_aqicn
+        },
+        {
+            "name": "Cali Centro",
+            "latitude": 3.4516,
+            "longitude": -76.5320,
+            "city": "Cali",
+            "country": "Colombia",
+            "region_id": region_ids["Valle del Cauca"],
+            "provider_id": provider_google
+        }
+    ]
+    
+    existing_stations = set(db.execute(select(Station.name)).scalars())
+    missing_stations = [st for st in stations_data if st["name"] not in existing_stations]
+    if missing_stations:
+        db.execute(insert(Station), missing_stations)
+    
+    print(f"Stations: {len(missing_stations)} created, {len(existing_stations) + len(missing_stations)} total")
+
+
+def init_database(init_schema: bool = False, seed_stations: bool = True):
+    """
+    Initialize database with seed data
+    
+    Args:
+        init_schema: Create missing tables with create_all (the Docker setup
+                     already creates the schema from init_database.sql)
+        seed_stations: Also seed providers, map regions and monitoring stations
+    """
+    if init_schema:
+        print("Creating database tables...")
+        Base.metadata.create_all(bind=get_engine())
+    upgrade_reading_indexes()
+    upgrade_user_list_indexes()
+    upgrade_station_search_indexes()
+    upgrade_reading_unique_key()
+    upgrade_daily_stats_columns()
+    upgrade_raw_ingestion_table()
+    
+    # One session / one transaction for the whole seed. SessionLocal has
+    # autoflush=False and every PK we need comes back through RETURNING, so
+    # nothing is flushed until the final commit.
     db = SessionLocal()
     try:
-        # Check if providers and stations already exist
-        provider_count = db.query(Provider).count()
-        station_count = db.query(Station).count()
+        install_reading_notify_trigger(db)
+        install_reading_partitions(db)
         
-        if provider_count > 0 and station_count > 0:
-            print(f"Database already initialized ({provider_count} providers, {station_count} stations).")
-            return
-        
-        print(f"Initializing database... (providers: {provider_count}, stations: {station_count})")
+        # Seed data is fully recoverable by re-running this script, so the
+        # seed transaction may skip waiting for the WAL flush on commit.
+        # SET LOCAL only lasts until the commit below; never use this on the
+        # readings/alerts write path.
+        db.execute(text("SET LOCAL synchronous_commit = OFF"))
         
         print("Seeding initial data...")
         
-        # Insert roles only if they don't exist
-        roles = db.query(Role).all()
-        if len(roles) == 0:
-            roles_data = [
-                {"name": "Citizen", "description": "General public user with basic access"},
-                {"name": "Researcher", "description": "Academic or scientific researcher with extended access"},
-                {"name": "Administrator", "description": "System administrator with full access"}
-            ]
-            
-            roles = []
-            for role_data in roles_data:
-                role = Role(**role_data)
-                db.add(role)
-                roles.append(role)
-            
-            db.flush()
-            print(f"Created {len(roles)} roles")
-        else:
-            print(f"Roles already exist ({len(roles)} roles found)")
-        
-        # Insert permissions only if they don't exist
-        permissions = db.query(Permission).all()
-        if len(permissions) == 0:
-            permissions_data = [
-                {"name": "view_current_aqi", "description": "View current air quality index"},
-                {"name": "view_historical_data", "description": "View historical air quality data"},
-                {"name": "download_data", "description": "Download air quality data"},
-                {"name": "configure_alerts", "description": "Configure personal alerts"},
-                {"name": "generate_reports", "description": "Generate custom reports"},
-                {"name": "manage_users", "description": "Manage user accounts"},
-                {"name": "manage_stations", "description": "Manage monitoring stations"},
-                {"name": "system_configuration", "description": "Configure system settings"}
-            ]
-            
-            permissions = []
-            for perm_data in permissions_data:
-                perm = Permission(**perm_data)
-                db.add(perm)
-                permissions.append(perm)
-            
-            db.flush()
-            print(f"Created {len(permissions)} permissions")
-            
-            # Assign permissions to roles
-            role_permissions_map = {
-                "Citizen": ["view_current_aqi", "configure_alerts"],
-                "Researcher": ["view_current_aqi", "view_historical_data", "download_data", "configure_alerts", "generate_reports"],
-                "Administrator": None  # All permissions
-            }
-            
-            for role in roles:
-                perms = role_permissions_map.get(role.name)
-                
-                if perms is None:
-                    # Administrator gets all permissions
-                    for perm in permissions:
-                        role_perm = RolePermission(role_id=role.id, permission_id=perm.id)
-                        db.add(role_perm)
-                else:
-                    # Assign specific permissions
-                    for perm_name in perms:
-                        perm = next((p for p in permissions if p.name == perm_name), None)
-                        if perm:
-                            role_perm = RolePermission(role_id=role.id, permission_id=perm.id)
-                            db.add(role_perm)
-            
-            print("Assigned permissions to roles")
-        else:
-            print(f"Permissions already exist ({len(permissions)} permissions found)")
-        
-        # Insert pollutants only if they don't exist
-        existing_pollutants = db.query(Pollutant).all()
-        if len(existing_pollutants) == 0:
-            pollutants_data = [
-                {"name": "PM2.5", "unit": "μg/m³", "description": "Fine particulate matter with diameter less than 2.5 micrometers"},
-                {"name": "PM10", "unit": "μg/m³", "description": "Particulate matter with diameter less than 10 micrometers"},
-                {"name": "O3", "unit": "ppb", "description": "Ground-level ozone"},
-                {"name": "NO2", "unit": "ppb", "description": "Nitrogen dioxide"},
-                {"name": "SO2", "unit": "ppb", "description": "Sulfur dioxide"},
-                {"name": "CO", "unit": "ppm", "description": "Carbon monoxide"}
-            ]
-            
-            for poll_data in pollutants_data:
-                pollutant = Pollutant(**poll_data)
-                db.add(pollutant)
-            
-            print(f"Created {len(pollutants_data)} pollutants")
-        else:
-            print(f"Pollutants already exist ({len(existing_pollutants)} pollutants found)")
-        
-        # Insert default providers (mock)
-        providers_data = [
-            {"name": "AQICN Mock", "api_endpoint": "https://api.waqi.info/feed/", "ingestion_frequency_minutes": 30},
-            {"name": "Google Air Quality Mock", "api_endpoint": "https://airquality.googleapis.com/v1/", "ingestion_frequency_minutes": 30},
-            {"name": "IQAir Mock", "api_endpoint": "https://api.airvisual.com/v2/", "ingestion_frequency_minutes": 60}
+        # Insert roles that don't exist yet
+        roles_data = [
+            {"name": "Citizen", "description": "General public user with basic access"},
+            {"name": "Researcher", "description": "Academic or scientific researcher with extended access"},
+            {"name": "Administrator", "description": "System administrator with full access"}
         ]
+        role_ids, created_roles = seed_by_name(db, Role, roles_data)
+        print(f"Roles: {len(created_roles)} created, {len(role_ids)} total")
         
-        for prov_data in providers_data:
-            provider = Provider(**prov_data)
-            db.add(provider)
+        # Insert permissions that don't exist yet
+        permissions_data = [
+            {"name": "view_current_aqi", "description": "View current air quality index"},
+            {"name": "view_historical_data", "description": "View historical air quality data"},
+            {"name": "download_data", "description": "Download air quality data"},
+            {"name": "configure_alerts", "description": "Configure personal alerts"},
+            {"name": "generate_reports", "description": "Generate custom reports"},
+            {"name": "manage_users", "description": "Manage user accounts"},
+            {"name": "manage_stations", "description": "Manage monitoring stations"},
+            {"name": "system_configuration", "description": "Configure system settings"}
+        ]
+        permission_ids, permissions = seed_by_name(db, Permission, permissions_data)
+        print(f"Permissions: {len(permissions)} created, {len(permission_ids)} total")
         
-        print(f"Created {len(providers_data)} providers")
+        # Grant every role its permissions; pairs already present are skipped,
+        # so roles or permissions added after the first seed get theirs too
+        role_permissions_map = {
+            "Citizen": ["view_current_aqi", "configure_alerts"],
+            "Researcher": ["view_current_aqi", "view_historical_data", "download_data", "configure_alerts", "generate_reports"],
+            "Administrator": None  # All permissions
+        }
         
-        # Insert map regions using raw SQL to avoid geom type issues
-        regions_data = [
-            {"name": "Bogotá D.C.", "description": "Capital city of Colombia"},
-            {"name": "Antioquia", "description": "Department of Antioquia"},
-            {"name": "Valle del Cauca", "description": "Department of Valle del Cauca"}
-        ]
+        role_permissions_data = []
+        for role_name, role_id in role_ids.items():
+            # Roles created outside this seed (not in the map) are left alone
+            perms = role_permissions_map.get(role_name, [])
+            if perms is None:
+                perms = list(permission_ids)
+            role_permissions_data.extend(
+                {"role_id": role_id, "permission_id": permission_ids[perm_name]}
+                for perm_name in perms
+                if perm_name in permission_ids
+            )
         
-        from sqlalchemy import text
-        for region_data in regions_data:
-            db.execute(
-                text("INSERT INTO mapregion (name, description) VALUES (:name, :description)"),
-                {"name": region_data["name"], "description": region_data["description"]}
+        if role_permissions_data:
+            result = db.execute(
+                pg_insert(RolePermission).on_conflict_do_nothing().returning(RolePermission.role_id),
+                role_permissions_data
             )
+            print(f"Role permissions: {len(result.all())} assigned")
         
-        db.flush()
+        # Insert pollutants that don't exist yet
+        pollutants_data = [
+            {"name": "PM2.5", "unit": "μg/m³", "description": "Fine particulate matter with diameter less than 2.5 micrometers"},
+            {"name": "PM10", "unit": "μg/m³", "description": "Particulate matter with diameter less than 10 micrometers"},
+            {"name": "O3", "unit": "ppb", "description": "Ground-level ozone"},
+            {"name": "NO2", "unit": "ppb", "description": "Nitrogen dioxide"},
+            {"name": "SO2", "unit": "ppb", "description": "Sulfur dioxide"},
+            {"name": "CO", "unit": "ppm", "description": "Carbon monoxide"}
+        ]
+        pollutant_ids, created_pollutants = seed_by_name(db, Pollutant, pollutants_data)
+        print(f"Pollutants: {len(created_pollutants)} created, {len(pollutant_ids)} total")
         
-        # Load created regions
-        regions = db.query(MapRegion).all()
-        print(f"Created {len(regions)} regions")
+        if seed_stations:
+            seed_monitoring_network(db)
         
-        # Insert monitoring stations
-        providers = db.query(Provider).all()
-        provider_aqicn = next((p for p in providers if "AQICN" in p.name), providers[0])
-        provider_google = next((p for p in providers if "Google" in p.name), providers[1])
-        provider_iqair = next((p for p in providers if "IQAir" in p.name), providers[2])
+        # Insert test users that don't exist yet
+        existing_users = set(db.execute(
+            select(AppUser.username).where(AppUser.username.like('testuser%'))
+        ).scalars())
         
-        stations_data = [
-            {
-                "name": "Kennedy - Bogotá",
-                "latitude": 4.6097,
-                "longitude": -74.0817,
-                "city": "Bogotá",
-                "country": "Colombia",
-                "region_id": regions[0].id,
-                "provider_id": provider_aqicn.id
-            },
-            {
-                "name": "Usaquén - Bogotá",
-                "latitude": 4.7110,
-                "longitude": -74.0721,
-                "city": "Bogotá",
-                "country": "Colombia",
-                "region_id": regions[0].id,
-                "provider_id": provider_google.id
-            },
+        # Get the Citizen role for test users
+        citizen_role_id = role_ids.get("Citizen") or next(iter(role_ids.values()))
+        
+        test_users_data = [
             {
-                "name": "Medellín Centro",
-                "latitude": 6.2442,
-                "longitude": -75.5812,
-                "city": "Medellín",
-                "country": "Colombia",
-                "region_id": regions[1].id,
-                "provider_id": provider_iqair.id
+                "username": "testuser1",
+                "email": "user1@test.com",
+                "password_hash": "hash123",  # In production, use proper hashing
+                "full_name": "Test User 1",
+                "role_id": citizen_role_id,
+                "location": "Bogotá",
+                "is_active": True
             },
             {
-                "name": "Envigado - Medellín",
-                "latitude": 6.1650,
-                "longitude": -75.5847,
-                "city": "Medellín",
-                "country": "Colombia",
-                "region_id": regions[1].id,
-                "provider_id": provider_aqicn.id
+                "username": "testuser2",
+                "email": "user2@test.com",
+                "password_hash": "hash456",
+                "full_name": "Test User 2",
+                "role_id": citizen_role_id,
+                "location": "Medellín",
+                "is_active": True
             },
             {
-                "name": "Cali Centro",
-                "latitude": 3.4516,
-                "longitude": -76.5320,
-                "city": "Cali",
-                "country": "Colombia",
-                "region_id": regions[2].id,
-                "provider_id": provider_google.id
+                "username": "testuser3",
+                "email": "user3@test.com",
+                "password_hash": "hash789",
+                "full_name": "Test User 3",
+                "role_id": citizen_role_id,
+                "location": "Cali",
+                "is_active": True
             }
         ]
         
-        for station_data in stations_data:
-            station = Station(**station_data)
-            db.add(station)
-        
-        print(f"Created {len(stations_data)} monitoring stations")
-        
-        # Insert test users only if they don't exist
-        from models import AppUser
-        existing_users = db.query(AppUser).filter(AppUser.username.like('testuser%')).count()
-        
-        if existing_users == 0:
-            # Get the Citizen role for test users
-            citizen_role = next((r for r in roles if r.name == "Citizen"), roles[0])
-            
-            test_users_data = [
-                {
-                    "username": "testuser1",
-                    "email": "user1@test.com",
-                    "password_hash": "hash123",  # In production, use proper hashing
-                    "full_name": "Test User 1",
-                    "role_id": citizen_role.id,
-                    "location": "Bogotá",
-                    "is_active": True
-                },
-                {
-                    "username": "testuser2",
-                    "email": "user2@test.com",
-                    "password_hash": "hash456",
-                    "full_name": "Test User 2",
-                    "role_id": citizen_role.id,
-                    "location": "Medellín",
-                    "is_active": True
-                },
-                {
-                    "username": "testuser3",
-                    "email": "user3@test.com",
-                    "password_hash": "hash789",
-                    "full_name": "Test User 3",
-                    "role_id": citizen_role.id,
-                    "location": "Cali",
-                    "is_active": True
-                }
-            ]
-            
-            for user_data in test_users_data:
-                user = AppUser(**user_data)
-                db.add(user)
-            
-            print(f"Created {len(test_users_data)} test users")
-        else:
-            print(f"Test users already exist ({existing_users} users found)")
+        missing_users = [u for u in test_users_data if u["username"] not in existing_users]
+        if missing_users:
+            db.execute(insert(AppUser), missing_users)
+        print(f"Test users: {len(missing_users)} created, {len(existing_users)} already present")
         
         # Commit all changes
         db.commit()
@@ -268,4 +462,11 @@ def init_database():
         db.close()
 
 if __name__ == "__main__":
-    init_database()
+    parser = argparse.ArgumentParser(description="Initialize the Air Quality database")
+    parser.add_argument("--init-schema", action="store_true",
+                        help="create missing tables with SQLAlchemy create_all")
+    parser.add_argument("--skip-stations", action="store_true",
+                        help="do not seed providers, regions and stations")
+    args = parser.parse_args()
+    
+    init_database(init_schema=args.init_schema, seed_stations=not args.skip_stations)
@@ -4,19 +4,89 @@ Verifica las alertas activas y envía notificaciones cuando se cumplen las condi
 Se ejecuta cada minuto para verificar lecturas recientes
 """
 
+import os
+import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
+import numpy as np
+from sqlalchemy.orm import Bundle, joinedload
+from sqlalchemy import and_, tuple_, select, bindparam
 
-from database.postgres_db import SessionLocal
-from models import Alert, AirQualityReading, Station, Pollutant, AppUser
+from database.postgres_db import SessionLocal, DIRECT_DATABASE_URL
+from models import Alert, AirQualityReading
 from services.telegram_notifier import get_telegram_notifier
 
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tiempo mínimo entre notificaciones de una misma alerta (30 minutos)
+NOTIFICATION_COOLDOWN_SECONDS = 1800
+
+# Máximo de notificaciones enviándose en paralelo (límite de Telegram)
+MAX_CONCURRENT_NOTIFICATIONS = 20
+
+# Canal NOTIFY emitido por el trigger AFTER INSERT de airqualityreading
+READING_NOTIFY_CHANNEL = "aqr_new"
+
+# Ventana para agrupar notificaciones de un mismo lote de inserciones
+NOTIFY_DEBOUNCE_SECONDS = 1.0
+
+
+def _build_alerts_with_readings_stmt():
+    """
+    Construye una única sentencia que devuelve cada alerta activa junto con
+    la lectura más reciente (desde :cutoff) de su (estación, contaminante).
+    La subconsulta DISTINCT ON no depende de resultados previos, así que
+    alertas y lecturas llegan en un solo round-trip. De la lectura solo se
+    traen las columnas que usa el job (sin raw_json), cubiertas por el índice
+    (station_id, pollutant_id, datetime DESC) INCLUDE (value, aqi).
+    """
+    active_pairs = select(Alert.station_id, Alert.pollutant_id).where(Alert.is_active == True)
+    
+    latest = select(
+        AirQualityReading.id,
+        AirQualityReading.station_id,
+        AirQualityReading.pollutant_id,
+        AirQualityReading.datetime,
+        AirQualityReading.value,
+        AirQualityReading.aqi
+    ).distinct(
+        AirQualityReading.station_id,
+        AirQualityReading.pollutant_id
+    ).where(
+        tuple_(AirQualityReading.station_id, AirQualityReading.pollutant_id).in_(active_pairs),
+        AirQualityReading.datetime >= bindparam("cutoff")
+    ).order_by(
+        AirQualityReading.station_id,
+        AirQualityReading.pollutant_id,
+        AirQualityReading.datetime.desc()
+    ).subquery()
+    # La lectura llega como una fila con los mismos atributos (id, value, aqi...)
+    latest_reading = Bundle("reading", *latest.c)
+    
+    return select(Alert, latest_reading).options(
+        joinedload(Alert.station),
+        joinedload(Alert.pollutant),
+        joinedload(Alert.user)
+    ).outerjoin(
+        latest,
+        and_(
+            latest.c.station_id == Alert.station_id,
+            latest.c.pollutant_id == Alert.pollutant_id
+        )
+    ).where(Alert.is_active == True)
+
+
+# Construida una sola vez por proceso; cada ejecución solo liga :cutoff
+ALERTS_WITH_READINGS_STMT = _build_alerts_with_readings_stmt()
+
 
 class AlertCheckerJob:
     """
@@ -26,33 +96,63 @@ class AlertCheckerJob:
     
     def __init__(self):
         self.telegram = get_telegram_notifier()
-        self.last_notifications = {}  # Track para evitar spam
+        self.last_notifications = {}  # Fallback en memoria si Redis no está disponible
+        
+        # Cooldown compartido entre procesos/reinicios (SET NX EX en Redis)
+        redis_url = os.getenv("REDIS_URL")
+        self.redis = aioredis.Redis.from_url(redis_url) if REDIS_AVAILABLE and redis_url else None
+        if self.redis is None:
+            logger.info("REDIS_URL not configured, using in-memory alert cooldown")
     
-    async def run(self):
-        """Main execution method"""
+    async def run(self, pairs: Optional[set] = None):
+        """
+        Main execution method
+        
+        Args:
+            pairs: Conjunto de (station_id, pollutant_id) con lecturas nuevas.
+                   Si es None se revisan todas las alertas activas (heartbeat)
+        """
         logger.info("Starting alert checker job...")
         start_time = datetime.utcnow()
         
-        db = SessionLocal()
         try:
-            # Obtener todas las alertas activas
-            active_alerts = db.query(Alert).filter(Alert.is_active == True).all()
+            # Consulta síncrona en un hilo para no bloquear el event loop
+            rows = await asyncio.to_thread(self._load_alerts_with_readings, pairs)
             
-            if not active_alerts:
+            if not rows:
                 logger.info("No active alerts to check")
                 return
             
+            active_alerts = [alert for alert, _ in rows]
+            # Sin lectura reciente, el outer join devuelve la lectura con todo NULL
+            recent_readings = {
+                (reading.station_id, reading.pollutant_id): reading
+                for _, reading in rows if reading.id is not None
+            }
+            
             logger.info(f"Checking {len(active_alerts)} active alerts")
             
-            notifications_sent = 0
+            # Evaluar todas las condiciones de una vez y quedarnos con las que se cumplen
+            triggered = self._evaluate_conditions(active_alerts, recent_readings)
             
-            # Verificar cada alerta
-            for alert in active_alerts:
-                try:
-                    if await self._check_and_notify_alert(db, alert):
-                        notifications_sent += 1
-                except Exception as e:
-                    logger.error(f"Error checking alert {alert.id}: {str(e)}")
+            # Notificar en paralelo solo las alertas cuya condición se cumple
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_NOTIFICATIONS)
+            
+            async def notify(alert, recent_reading):
+                async with semaphore:
+                    return await self._check_and_notify_alert(alert, recent_reading)
+            
+            results = await asyncio.gather(
+                *(notify(alert, reading) for alert, reading in triggered),
+                return_exceptions=True
+            )
+            
+            notifications_sent = 0
+            for (alert, _), result in zip(triggered, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error checking alert {alert.id}: {str(result)}")
+                elif result is True:
+                    notifications_sent += 1
             
             duration = (datetime.utcnow() - start_time).total_seconds()
             logger.info(f"Alert checker completed in {duration:.2f}s. Sent {notifications_sent} notifications.")
@@ -60,13 +160,139 @@ class AlertCheckerJob:
         except Exception as e:
             logger.error(f"Fatal error in alert checker: {str(e)}")
             raise
+    
+    def _load_alerts_with_readings(self, pairs: Optional[set]) -> List[Tuple[Alert, Optional[AirQualityReading]]]:
+        """
+        Alertas activas (con estación, contaminante y usuario precargados)
+        y la lectura más reciente de cada una, en una sola consulta
+        """
+        stmt = ALERTS_WITH_READINGS_STMT
+        if pairs:
+            stmt = stmt.where(tuple_(Alert.station_id, Alert.pollutant_id).in_(list(pairs)))
+        
+        cutoff = datetime.utcnow() - timedelta(minutes=5)
+        db = SessionLocal()
+        try:
+            return db.execute(stmt, {"cutoff": cutoff}).all()
         finally:
             db.close()
     
+    async def listen(self):
+        """
+        Escucha el canal NOTIFY de nuevas lecturas y ejecuta run() solo para
+        los pares (estación, contaminante) afectados. El job programado cada
+        minuto se mantiene como heartbeat de respaldo.
+        """
+        import psycopg2
+        import psycopg2.extensions
+        
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(DIRECT_DATABASE_URL)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {READING_NOTIFY_CHANNEL};")
+                logger.info(f"Listening for new readings on channel '{READING_NOTIFY_CHANNEL}'")
+                
+                queue: asyncio.Queue = asyncio.Queue()
+                fd = conn.fileno()
+                
+                def on_notify():
+                    try:
+                        conn.poll()
+                    except Exception as e:
+                        # Conexión caída: el descriptor queda legible (EOF) y el
+                        # callback se repetiría sin fin; se quita y el error se
+                        # pasa a la cola para que el bucle de abajo reconecte
+                        loop.remove_reader(fd)
+                        queue.put_nowait(e)
+                        return
+                    while conn.notifies:
+                        queue.put_nowait(conn.notifies.pop(0).payload)
+                
+                def parse(item):
+                    if isinstance(item, Exception):
+                        raise item
+                    return self._parse_notify_payload(item)
+                
+                loop.add_reader(fd, on_notify)
+                try:
+                    while True:
+                        # Agrupar las notificaciones de un mismo lote de inserciones
+                        pairs = {parse(await queue.get())}
+                        await asyncio.sleep(NOTIFY_DEBOUNCE_SECONDS)
+                        while not queue.empty():
+                            pairs.add(parse(queue.get_nowait()))
+                        pairs.discard(None)
+                        
+                        if pairs:
+                            await self.run(pairs)
+                finally:
+                    loop.remove_reader(fd)
+                    
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reading listener failed, retrying in 30s: {str(e)}")
+                await asyncio.sleep(30)
+            finally:
+                if conn is not None:
+                    conn.close()
+    
+    def _parse_notify_payload(self, payload: str) -> Optional[Tuple[int, int]]:
+        """Convierte el payload 'station_id:pollutant_id' del trigger en una tupla"""
+        try:
+            station_id, pollutant_id = payload.split(":")
+            return int(station_id), int(pollutant_id)
+        except ValueError:
+            logger.warning(f"Invalid notify payload: {payload}")
+            return None
+    
+    def _evaluate_conditions(
+        self,
+        alerts: List[Alert],
+        recent_readings: Dict[tuple, AirQualityReading]
+    ) -> List[Tuple[Alert, AirQualityReading]]:
+        """
+        Evalúa vectorialmente (NumPy) la condición de todas las alertas que
+        tienen lectura reciente
+        
+        Returns:
+            Lista de (alerta, lectura) cuya condición se cumple
+        """
+        candidates = []
+        for alert in alerts:
+            reading = recent_readings.get((alert.station_id, alert.pollutant_id))
+            if reading is None:
+                logger.debug(f"No recent reading for alert {alert.id}")
+                continue
+            candidates.append((alert, reading))
+        
+        if not candidates:
+            return []
+        
+        values = np.fromiter((r.value for _, r in candidates), dtype=float, count=len(candidates))
+        thresholds = np.fromiter((a.threshold for a, _ in candidates), dtype=float, count=len(candidates))
+        conditions = np.array([a.trigger_condition for a, _ in candidates], dtype=object)
+        
+        mask = np.select(
+            [conditions == 'exceeds', conditions == 'below', conditions == 'equals'],
+            [values > thresholds, values < thresholds, np.abs(values - thresholds) < 0.01],
+            default=False
+        )
+        
+        for condition in set(conditions.tolist()) - {'exceeds', 'below', 'equals'}:
+            logger.warning(f"Unknown condition: {condition}")
+        
+        return [candidates[i] for i in np.nonzero(mask)[0]]
+    
     async def _check_and_notify_alert(
         self,
-        db: Session,
-        alert: Alert
+        alert: Alert,
+        recent_reading: Optional[AirQualityReading]
     ) -> bool:
         """
         Verifica una alerta específica y envía notificación si aplica
@@ -74,57 +300,87 @@ class AlertCheckerJob:
         Returns:
             True si se envió notificación, False otherwise
         """
-        # Obtener la lectura más reciente para esta estación y contaminante
-        recent_reading = db.query(AirQualityReading).filter(
-            and_(
-                AirQualityReading.station_id == alert.station_id,
-                AirQualityReading.pollutant_id == alert.pollutant_id,
-                AirQualityReading.datetime >= datetime.utcnow() - timedelta(minutes=5)
-            )
-        ).order_by(AirQualityReading.datetime.desc()).first()
-        
         if not recent_reading:
             logger.debug(f"No recent reading for alert {alert.id}")
             return False
         
-        # Verificar si se cumple la condición
-        if not self._check_condition(
-            recent_reading.value,
-            alert.threshold,
-            alert.trigger_condition
-        ):
-            logger.debug(f"Alert {alert.id} condition not met")
-            return False
+        # La condición ya fue evaluada en _evaluate_conditions()
         
         # Verificar cooldown para evitar spam (no notificar más de 1 vez cada 30 min)
         alert_key = f"{alert.id}_{alert.station_id}_{alert.pollutant_id}"
-        last_notif_time = self.last_notifications.get(alert_key)
+        if not await self._acquire_cooldown(alert_key):
+            logger.debug(f"Alert {alert.id} in cooldown period")
+            return False
         
-        if last_notif_time:
-            time_since_last = (datetime.utcnow() - last_notif_time).total_seconds()
-            if time_since_last < 1800:  # 30 minutos
-                logger.debug(f"Alert {alert.id} in cooldown period")
-                return False
+        # Enviar notificación; si la entrega en segundo plano falla después,
+        # el notificador libera el cooldown con este callback
+        async def release_cooldown():
+            await self._release_cooldown(alert_key)
         
-        # Enviar notificación
-        sent = await self._send_alert_notification(db, alert, recent_reading)
+        sent = await self._send_alert_notification(alert, recent_reading, release_cooldown)
         
-        if sent:
-            self.last_notifications[alert_key] = datetime.utcnow()
-            
-            # Actualizar timestamp de última notificación (si agregas este campo al modelo)
-            # alert.last_notification_at = datetime.utcnow()
-            # db.commit()
+        if not sent:
+            # Liberar el cooldown para reintentar en la próxima ejecución
+            await self._release_cooldown(alert_key)
+        
+        # Actualizar timestamp de última notificación (si agregas este campo al modelo)
+        # alert.last_notification_at = datetime.utcnow()
+        # db.commit()
         
         return sent
     
+    async def _acquire_cooldown(self, alert_key: str) -> bool:
+        """
+        Reserva la ventana de cooldown de una alerta
+        
+        Returns:
+            True si se puede notificar, False si la alerta está en cooldown
+        """
+        if self.redis is not None:
+            try:
+                acquired = await self.redis.set(
+                    f"alert_cd:{alert_key}", "1",
+                    ex=NOTIFICATION_COOLDOWN_SECONDS, nx=True
+                )
+                return bool(acquired)
+            except Exception as e:
+                logger.warning(f"Redis cooldown unavailable, using in-memory fallback: {str(e)}")
+        
+        now = datetime.utcnow()
+        self._prune_cooldowns(now)
+        if alert_key in self.last_notifications:
+            return False
+        self.last_notifications[alert_key] = now
+        return True
+    
+    async def _release_cooldown(self, alert_key: str):
+        """Libera el cooldown de una alerta cuya notificación falló"""
+        self.last_notifications.pop(alert_key, None)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(f"alert_cd:{alert_key}")
+            except Exception as e:
+                logger.warning(f"Could not release Redis cooldown: {str(e)}")
+    
+    def _prune_cooldowns(self, now: datetime):
+        """Elimina del fallback en memoria los cooldowns ya expirados"""
+        expired = [
+            key for key, notified_at in self.last_notifications.items()
+            if (now - notified_at).total_seconds() >= NOTIFICATION_COOLDOWN_SECONDS
+        ]
+        for key in expired:
+            del self.last_notifications[key]
+    
     def _check_condition(
         self,
         value: float,
         threshold: float,
         condition: str
     ) -> bool:
-        """Verifica si se cumple la condición de la alerta"""
+        """
+        Verifica si se cumple la condición de la alerta (versión escalar;
+        run() usa _evaluate_conditions para el lote completo)
+        """
         if condition == 'exceeds':
             return value > threshold
         elif condition == 'below':
@@ -137,16 +393,19 @@ class AlertCheckerJob:
     
     async def _send_alert_notification(
         self,
-        db: Session,
         alert: Alert,
-        reading: AirQualityReading
+        reading: AirQualityReading,
+        on_failure: Optional[Callable[[], Awaitable[None]]] = None
     ) -> bool:
-        """Envía notificación de alerta"""
+        """
+        Envía notificación de alerta. on_failure se ejecuta si el envío por
+        Telegram (en segundo plano) termina fallando
+        """
         
-        # Obtener información adicional
-        station = db.query(Station).filter(Station.id == alert.station_id).first()
-        pollutant = db.query(Pollutant).filter(Pollutant.id == alert.pollutant_id).first()
-        user = db.query(AppUser).filter(AppUser.id == alert.user_id).first()
+        # Información adicional (precargada con joinedload en run())
+        station = alert.station
+        pollutant = alert.pollutant
+        user = alert.user
         
         if not station or not pollutant:
             logger.error(f"Missing station or pollutant for alert {alert.id}")
@@ -171,8 +430,8 @@ class AlertCheckerJob:
         
         if alert.notification_method in ['telegram', 'all']:
             try:
-                notification_sent = await self.telegram.send_alert(alert_data, reading_data)
-                logger.info(f"Telegram notification sent for alert {alert.id}")
+                notification_sent = await self.telegram.send_alert(alert_data, reading_data, on_failure)
+                logger.info(f"Telegram notification queued for alert {alert.id}")
             except Exception as e:
                 logger.error(f"Failed to send Telegram notification: {str(e)}")
         
@@ -191,8 +450,15 @@ async def main():
     """Entry point para ejecución directa o testing"""
     job = AlertCheckerJob()
     await job.run()
+    # Las alertas se envían agrupadas en segundo plano: esperar a que salgan
+    await job.telegram.drain()
 
 
 if __name__ == "__main__":
-    import asyncio
+    try:
+        # uvloop's C timer heap and run loop, same loop uvicorn uses for the API
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main())
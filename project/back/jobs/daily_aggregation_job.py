@@ -3,20 +3,40 @@ Daily Aggregation Job
 Computes per-day, per-station, per-pollutant aggregates
 Populates AirQualityDailyStats table for efficient queries
 Runs once per day during off-peak hours
+
+The rollup is a regular table maintained one day at a time (a single
+GROUP BY + upsert inside Postgres) rather than a materialized view:
+REFRESH MATERIALIZED VIEW always recomputes the whole reading history,
+while the API and reports rely on the table's ids and created_at.
 """
 
+import os
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, date
-from sqlalchemy import func
+from typing import Any, Dict, List
+from sqlalchemy import (
+    Date, Float, Integer, cast, column, func, literal_column, select, text, tuple_, update, values
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 
 from database.postgres_db import SessionLocal
-from models import AirQualityReading, AirQualityDailyStats, Station, Pollutant
+from models import AirQualityReading, AirQualityDailyStats
+from services.reference_cache import stats_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Days aggregated concurrently by backfill (keep below DB_POOL_SIZE)
+BACKFILL_MAX_WORKERS = int(os.getenv("BACKFILL_MAX_WORKERS", "4"))
+
+# Daily aggregates written per transaction
+AGGREGATION_CHUNK_SIZE = 1000
+
+# Unique key of AirQualityDailyStats (ON CONFLICT target)
+DAILY_STATS_KEY = ("station_id", "pollutant_id", "date")
+
 
 class DailyAggregationJob:
     """
@@ -27,12 +47,14 @@ class DailyAggregationJob:
     def __init__(self):
         pass
     
-    def run(self, target_date: date = None):
+    def run(self, target_date: date = None, recompute: bool = False):
         """
         Main execution method
         
         Args:
             target_date: Date to aggregate (defaults to yesterday)
+            recompute: The day was aggregated before, so most aggregates
+                       already exist and are refreshed with a bulk UPDATE
         """
         if target_date is None:
             target_date = (datetime.utcnow() - timedelta(days=1)).date()
@@ -51,34 +73,49 @@ class DailyAggregationJob:
                 "pollutants_processed": 0,
             }
             
-            # Get all active stations
-            stations = db.query(Station).all()
-            pollutants = db.query(Pollutant).all()
+            self._ensure_reading_partitions(db)
             
-            stats["stations_processed"] = len(stations)
-            stats["pollutants_processed"] = len(pollutants)
+            # Aggregate every station-pollutant combination in one GROUP BY
+            grouped_rows = self._aggregate_day(db, target_date)
             
-            # For each station-pollutant combination
-            for station in stations:
-                for pollutant in pollutants:
-                    try:
-                        result = self._aggregate_for_station_pollutant(
-                            db, station.id, pollutant.id, target_date
-                        )
-                        
-                        if result == "created":
-                            stats["aggregates_created"] += 1
-                        elif result == "updated":
-                            stats["aggregates_updated"] += 1
-                        
-                    except Exception as e:
-                        stats["errors"] += 1
-                        logger.error(
-                            f"Error aggregating station {station.id}, "
-                            f"pollutant {pollutant.id}: {str(e)}"
-                        )
+            # Stations/pollutants that had readings that day
+            stats["stations_processed"] = len({row.station_id for row in grouped_rows})
+            stats["pollutants_processed"] = len({row.pollutant_id for row in grouped_rows})
             
-            db.commit()
+            rows = [
+                {
+                    "station_id": row.station_id,
+                    "pollutant_id": row.pollutant_id,
+                    "date": target_date,
+                    "avg_value": row.avg_value,
+                    "avg_aqi": int(row.avg_aqi) if row.avg_aqi is not None else None,
+                    "max_aqi": row.max_aqi,
+                    "min_aqi": row.min_aqi,
+                    "p95_value": row.p95_value,
+                    "readings_count": row.readings_count,
+                }
+                for row in grouped_rows
+            ]
+            
+            # Write and commit in chunks so a failure only loses its chunk
+            # and the transaction (locks/WAL) stays bounded
+            for offset in range(0, len(rows), AGGREGATION_CHUNK_SIZE):
+                chunk = rows[offset:offset + AGGREGATION_CHUNK_SIZE]
+                try:
+                    created, updated = self._save_chunk(db, chunk, recompute)
+                    db.commit()
+                    stats["aggregates_created"] += created
+                    stats["aggregates_updated"] += updated
+                except Exception as e:
+                    db.rollback()
+                    stats["errors"] += len(chunk)
+                    logger.error(
+                        f"Error saving aggregates {offset}-{offset + len(chunk)} "
+                        f"for {target_date}: {str(e)}"
+                    )
+            
+            # Cached /stats/daily responses may now be stale
+            stats_cache.invalidate()
             
             end_time = datetime.utcnow()
             duration = (end_time - start_time).total_seconds()
@@ -100,73 +137,151 @@ class DailyAggregationJob:
         finally:
             db.close()
     
-    def _aggregate_for_station_pollutant(
-        self,
-        db: Session,
-        station_id: int,
-        pollutant_id: int,
-        target_date: date
-    ) -> str:
+    def _ensure_reading_partitions(self, db: Session):
+        """
+        Create the monthly airqualityreading partitions of the current and
+        next month ahead of time, so new readings never land in the DEFAULT
+        partition (no-op if the table is not partitioned)
         """
-        Compute aggregates for a specific station-pollutant-date combination
+        today = datetime.utcnow().date()
+        next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        try:
+            for month_start in (today, next_month):
+                db.execute(
+                    text("SELECT ensure_airqualityreading_partition(:month_start)"),
+                    {"month_start": month_start}
+                )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Could not create reading partitions: {str(e)}")
+    
+    def _aggregate_day(self, db: Session, target_date: date):
+        """
+        Compute aggregates for every station-pollutant combination of a day
+        in a single GROUP BY query, so Postgres does the math instead of
+        materializing every reading in Python
         
         Returns:
-            "created", "updated", or "skipped"
+            Rows with station_id, pollutant_id, avg_value, avg_aqi,
+            max_aqi, min_aqi, p95_value, readings_count
         """
-        # Define date range
+        # Define date range [start, start + 1 day)
         start_datetime = datetime.combine(target_date, datetime.min.time())
-        end_datetime = datetime.combine(target_date, datetime.max.time())
-        
-        # Query readings for the day
-        readings = db.query(AirQualityReading).filter(
-            AirQualityReading.station_id == station_id,
-            AirQualityReading.pollutant_id == pollutant_id,
-            AirQualityReading.datetime >= start_datetime,
-            AirQualityReading.datetime <= end_datetime
+        end_datetime = start_datetime + timedelta(days=1)
+        
+        return db.execute(
+            select(
+                AirQualityReading.station_id,
+                AirQualityReading.pollutant_id,
+                func.avg(AirQualityReading.value).label("avg_value"),
+                func.avg(AirQualityReading.aqi).label("avg_aqi"),
+                func.max(AirQualityReading.aqi).label("max_aqi"),
+                func.min(AirQualityReading.aqi).label("min_aqi"),
+                func.percentile_cont(0.95).within_group(
+                    AirQualityReading.value.asc()
+                ).label("p95_value"),
+                func.count().label("readings_count"),
+            ).where(
+                AirQualityReading.datetime >= start_datetime,
+                AirQualityReading.datetime < end_datetime,
+                AirQualityReading.value.isnot(None)
+            ).group_by(
+                AirQualityReading.station_id,
+                AirQualityReading.pollutant_id
+            )
         ).all()
+    
+    def _save_chunk(self, db: Session, rows: List[Dict[str, Any]], recompute: bool):
+        """
+        Write a chunk of daily aggregates
         
-        if not readings:
-            # No data for this combination
-            return "skipped"
-        
-        # Compute statistics
-        values = [r.value for r in readings if r.value is not None]
-        aqi_values = [r.aqi for r in readings if r.aqi is not None]
-        
-        if not values:
-            return "skipped"
-        
-        aggregates = {
-            "station_id": station_id,
-            "pollutant_id": pollutant_id,
-            "date": target_date,
-            "avg_value": sum(values) / len(values) if values else None,
-            "avg_aqi": int(sum(aqi_values) / len(aqi_values)) if aqi_values else None,
-            "max_aqi": max(aqi_values) if aqi_values else None,
-            "min_aqi": min(aqi_values) if aqi_values else None,
-            "readings_count": len(readings),
-        }
+        Returns:
+            (created, updated) counts
+        """
+        updated = 0
+        if recompute:
+            updated_keys = self._update_daily_stats(db, rows)
+            updated = len(updated_keys)
+            rows = [
+                r for r in rows
+                if (r["station_id"], r["pollutant_id"]) not in updated_keys
+            ]
+        
+        created = 0
+        if rows:
+            created_flags = self._upsert_daily_stats(db, rows)
+            created = sum(created_flags)
+            updated += len(created_flags) - created
+        
+        return created, updated
+    
+    def _upsert_daily_stats(self, db: Session, rows: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Insert or update all daily aggregates in one
+        INSERT ... ON CONFLICT (station_id, pollutant_id, date) DO UPDATE
+        
+        Returns:
+            One flag per row, True if it was created (xmax = 0), False if updated
+        """
+        stmt = insert(AirQualityDailyStats).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(DAILY_STATS_KEY),
+            set_={
+                key: stmt.excluded[key]
+                for key in rows[0]
+                if key not in DAILY_STATS_KEY
+            }
+        ).returning(literal_column("xmax = 0").label("created"))
+        
+        return list(db.execute(stmt).scalars())
+    
+    def _update_daily_stats(self, db: Session, rows: List[Dict[str, Any]]) -> set:
+        """
+        Update the existing daily aggregates with a single
+        UPDATE ... FROM (VALUES ...) statement
+        
+        Returns:
+            (station_id, pollutant_id) keys of the rows that were updated
+        """
+        data = values(
+            column("station_id", Integer),
+            column("pollutant_id", Integer),
+            column("date", Date),
+            column("avg_value", Float),
+            column("avg_aqi", Integer),
+            column("max_aqi", Integer),
+            column("min_aqi", Integer),
+            column("p95_value", Float),
+            column("readings_count", Integer),
+            name="data",
+        ).data([
+            (
+                r["station_id"], r["pollutant_id"], r["date"], r["avg_value"], r["avg_aqi"],
+                r["max_aqi"], r["min_aqi"], r["p95_value"], r["readings_count"],
+            )
+            for r in rows
+        ])
+        
+        # Explicit casts: an all-NULL VALUES column would otherwise be typed as text
+        stmt = update(AirQualityDailyStats).values(
+            avg_value=cast(data.c.avg_value, Float),
+            avg_aqi=cast(data.c.avg_aqi, Integer),
+            max_aqi=cast(data.c.max_aqi, Integer),
+            min_aqi=cast(data.c.min_aqi, Integer),
+            p95_value=cast(data.c.p95_value, Float),
+            readings_count=cast(data.c.readings_count, Integer),
+        ).where(
+            tuple_(
+                AirQualityDailyStats.station_id,
+                AirQualityDailyStats.pollutant_id,
+                AirQualityDailyStats.date,
+            ) == tuple_(data.c.station_id, data.c.pollutant_id, cast(data.c.date, Date))
+        ).returning(AirQualityDailyStats.station_id, AirQualityDailyStats.pollutant_id)
         
-        # Check if aggregate already exists
-        existing = db.query(AirQualityDailyStats).filter(
-            AirQualityDailyStats.station_id == station_id,
-            AirQualityDailyStats.pollutant_id == pollutant_id,
-            AirQualityDailyStats.date == target_date
-        ).first()
-        
-        if existing:
-            # Update existing
-            for key, value in aggregates.items():
-                if key not in ["station_id", "pollutant_id", "date"]:
-                    setattr(existing, key, value)
-            return "updated"
-        else:
-            # Create new
-            daily_stat = AirQualityDailyStats(**aggregates)
-            db.add(daily_stat)
-            return "created"
+        return {(station_id, pollutant_id) for station_id, pollutant_id in db.execute(stmt)}
     
-    def backfill(self, start_date: date, end_date: date):
+    def backfill(self, start_date: date, end_date: date, recompute: bool = False):
         """
         Backfill aggregates for a date range
         Useful for historical data or after system outages
@@ -174,11 +289,13 @@ class DailyAggregationJob:
         Args:
             start_date: Start of date range
             end_date: End of date range
+            recompute: The range was aggregated before (e.g. after late
+                       readings), refresh existing aggregates with a bulk UPDATE
         """
         logger.info(f"Starting backfill from {start_date} to {end_date}")
         
-        current_date = start_date
         total_days = (end_date - start_date).days + 1
+        dates = [start_date + timedelta(days=offset) for offset in range(total_days)]
         
         results = {
             "total_days": total_days,
@@ -187,20 +304,24 @@ class DailyAggregationJob:
             "total_errors": 0,
         }
         
-        while current_date <= end_date:
-            try:
-                logger.info(f"Processing {current_date} ({results['days_processed'] + 1}/{total_days})")
-                day_stats = self.run(current_date)
-                
-                results["days_processed"] += 1
-                results["total_aggregates_created"] += day_stats.get("aggregates_created", 0)
-                results["total_errors"] += day_stats.get("errors", 0)
-                
-            except Exception as e:
-                logger.error(f"Error processing {current_date}: {str(e)}")
-                results["total_errors"] += 1
+        # Days are independent: aggregate them concurrently, each run() uses
+        # its own session/connection from the pool
+        with ThreadPoolExecutor(max_workers=BACKFILL_MAX_WORKERS) as executor:
+            futures = {executor.submit(self.run, day, recompute): day for day in dates}
             
-            current_date += timedelta(days=1)
+            for future in as_completed(futures):
+                day = futures[future]
+                try:
+                    day_stats = future.result()
+                    
+                    results["days_processed"] += 1
+                    results["total_aggregates_created"] += day_stats.get("aggregates_created", 0)
+                    results["total_errors"] += day_stats.get("errors", 0)
+                    logger.info(f"Processed {day} ({results['days_processed']}/{total_days})")
+                    
+                except Exception as e:
+                    logger.error(f"Error processing {day}: {str(e)}")
+                    results["total_errors"] += 1
         
         logger.info(f"Backfill complete: {results}")
         return results
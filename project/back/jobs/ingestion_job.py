@@ -6,8 +6,9 @@ Fetches raw JSON payloads and passes them to the normalizer
 
 import asyncio
 import logging
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Tuple
 from sqlalchemy.orm import Session
 
 from database.postgres_db import SessionLocal
@@ -19,6 +20,23 @@ from jobs.normalizer import DataNormalizer
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Máximo de proveedores consultados en paralelo
+MAX_CONCURRENT_PROVIDERS = 8
+
+
+@dataclass(frozen=True, slots=True)
+class MockProvider:
+    """Stand-in for a Provider row when none are configured"""
+    name: str
+    id: int
+
+
+DEFAULT_PROVIDERS = (
+    MockProvider("AQICN Mock", 1),
+    MockProvider("Google Air Quality Mock", 2),
+    MockProvider("IQAir Mock", 3),
+)
+
 
 class IngestionJob:
     """
@@ -26,6 +44,15 @@ class IngestionJob:
     Runs on a schedule (every 10-60 minutes)
     """
     
+    # Provider name keyword -> fetch method, checked in order
+    _PROVIDER_FETCHERS = {
+        "aqicn": "_fetch_aqicn",
+        "waqi": "_fetch_aqicn",
+        "google": "_fetch_google",
+        "iqair": "_fetch_iqair",
+        "airvisual": "_fetch_iqair",
+    }
+    
     def __init__(self):
         self.mock_service = MockServiceManager()
         self.mongo_logs = get_data_ingestion_logs_collection()
@@ -36,10 +63,9 @@ class IngestionJob:
         logger.info("Starting ingestion job...")
         start_time = datetime.utcnow()
         
-        db = SessionLocal()
         try:
-            # Get active providers from database
-            providers = db.query(Provider).all()
+            # Get active providers from database (in a thread, off the event loop)
+            providers = await asyncio.to_thread(self._load_providers)
             
             if not providers:
                 logger.warning("No providers configured. Using default mock providers.")
@@ -52,29 +78,26 @@ class IngestionJob:
                 "errors": [],
             }
             
-            # Fetch data from each provider
-            for provider in providers:
-                try:
-                    logger.info(f"Fetching data from provider: {provider.name}")
-                    provider_data = await self._fetch_provider_data(provider)
-                    
-                    if provider_data:
-                        raw_count = len(provider_data)
-                        
-                        # Normalize and save to database
-                        norm_stats = await self.normalizer.normalize_and_save(provider_data, provider.name)
-                        results["total_readings"] += norm_stats.get("saved", 0)
-                        
-                        # Log to MongoDB
-                        await self._log_ingestion(provider.name, provider_data, "success")
-                        
-                        logger.info(f"Fetched {raw_count} records from {provider.name}, saved {norm_stats.get('saved', 0)} readings")
-                    
-                except Exception as e:
-                    error_msg = f"Error fetching data from {provider.name}: {str(e)}"
+            # Fetch data from all providers concurrently
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROVIDERS)
+            log_entries = []
+            outcomes = await asyncio.gather(
+                *(self._process_provider(provider, semaphore, log_entries) for provider in providers),
+                return_exceptions=True
+            )
+            
+            # Log to MongoDB the activity of all providers at once
+            if log_entries:
+                await self.mongo_logs.insert_many(log_entries, ordered=False)
+            
+            for provider, outcome in zip(providers, outcomes):
+                if isinstance(outcome, Exception):
+                    error_msg = f"Error fetching data from {provider.name}: {str(outcome)}"
                     logger.error(error_msg)
                     results["errors"].append(error_msg)
-                    await self._log_ingestion(provider.name, [], "error", str(e))
+                else:
+                    results["providers_processed"] += 1
+                    results["total_readings"] += outcome
             
             end_time = datetime.utcnow()
             duration = (end_time - start_time).total_seconds()
@@ -90,69 +113,113 @@ class IngestionJob:
         except Exception as e:
             logger.error(f"Fatal error in ingestion job: {str(e)}")
             raise
+    
+    def _load_providers(self) -> List[Provider]:
+        """Load the configured providers"""
+        db = SessionLocal()
+        try:
+            return db.query(Provider).all()
         finally:
             db.close()
     
+    async def _process_provider(
+        self, 
+        provider: Provider, 
+        semaphore: asyncio.Semaphore, 
+        log_entries: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Fetch, normalize and save the data of one provider
+        Its ingestion log entry is appended to log_entries
+        
+        Returns:
+            Number of readings saved
+        """
+        async with semaphore:
+            try:
+                logger.info(f"Fetching data from provider: {provider.name}")
+                provider_data = await self._fetch_provider_data(provider)
+                
+                if not provider_data:
+                    return 0
+                
+                raw_count = len(provider_data)
+                
+                # Normalize and save to database
+                norm_stats = await self.normalizer.normalize_and_save(provider_data, provider.name)
+                saved = norm_stats.get("saved", 0)
+                
+                log_entries.append(self._ingestion_log_entry(provider.name, provider_data, "success"))
+                
+                logger.info(f"Fetched {raw_count} records from {provider.name}, saved {saved} readings")
+                return saved
+                
+            except Exception as e:
+                log_entries.append(self._ingestion_log_entry(provider.name, [], "error", str(e)))
+                raise
+    
     async def _fetch_provider_data(self, provider: Provider) -> List[Dict[str, Any]]:
         """
         Fetch data from a specific provider
         In production, this would make actual API calls
         For now, uses mock services
         """
-        provider_name = provider.name.lower()
-        
-        if "aqicn" in provider_name or "waqi" in provider_name:
-            data = self.mock_service.aqicn.get_all_stations()
-        elif "google" in provider_name:
-            # Generar datos para todas las 5 estaciones
-            data = [
-                self.mock_service.google.get_current_conditions(4.6097, -74.0817),   # Kennedy - Bogotá
-                self.mock_service.google.get_current_conditions(4.7110, -74.0721),   # Usaquén - Bogotá
-                self.mock_service.google.get_current_conditions(6.2442, -75.5812),   # Medellín Centro
-                self.mock_service.google.get_current_conditions(6.1650, -75.5847),   # Envigado - Medellín
-                self.mock_service.google.get_current_conditions(3.4516, -76.5320),   # Cali Centro
-            ]
-        elif "iqair" in provider_name or "airvisual" in provider_name:
-            # Generar datos para todas las estaciones
-            data = [
-                self.mock_service.iqair.get_city_data("bogota"),
-                self.mock_service.iqair.get_city_data("medellin"),
-                self.mock_service.iqair.get_city_data("cali"),
-                # IQAir también puede usar coordenadas directamente
-                self.mock_service.iqair.get_nearest_station(4.7110, -74.0721),  # Usaquén
-                self.mock_service.iqair.get_nearest_station(6.1650, -75.5847),  # Envigado
-            ]
-        else:
-            logger.warning(f"Unknown provider type: {provider.name}, using AQICN mock")
-            data = self.mock_service.aqicn.get_all_stations()
+        return await asyncio.to_thread(self._get_fetcher(provider.name))
+    
+    def _get_fetcher(self, provider_name: str) -> Callable[[], List[Dict[str, Any]]]:
+        """Resolve the provider type to its fetch method"""
+        provider_lower = provider_name.lower()
+        for keyword, method_name in self._PROVIDER_FETCHERS.items():
+            if keyword in provider_lower:
+                return getattr(self, method_name)
         
-        return data
+        logger.warning(f"Unknown provider type: {provider_name}, using AQICN mock")
+        return self._fetch_aqicn
+    
+    def _fetch_aqicn(self) -> List[Dict[str, Any]]:
+        return self.mock_service.aqicn.get_all_stations()
+    
+    def _fetch_google(self) -> List[Dict[str, Any]]:
+        # Generar datos para todas las 5 estaciones
+        return self.mock_service.google.get_conditions_batch([
+            (4.6097, -74.0817),   # Kennedy - Bogotá
+            (4.7110, -74.0721),   # Usaquén - Bogotá
+            (6.2442, -75.5812),   # Medellín Centro
+            (6.1650, -75.5847),   # Envigado - Medellín
+            (3.4516, -76.5320),   # Cali Centro
+        ])
     
-    async def _log_ingestion(
+    def _fetch_iqair(self) -> List[Dict[str, Any]]:
+        # Generar datos para todas las estaciones (mismo timestamp para el lote)
+        now = datetime.utcnow()
+        return [
+            self.mock_service.iqair.get_city_data("bogota", now=now),
+            self.mock_service.iqair.get_city_data("medellin", now=now),
+            self.mock_service.iqair.get_city_data("cali", now=now),
+            # IQAir también puede usar coordenadas directamente
+            self.mock_service.iqair.get_nearest_station(4.7110, -74.0721, now),  # Usaquén
+            self.mock_service.iqair.get_nearest_station(6.1650, -75.5847, now),  # Envigado
+        ]
+    
+    def _ingestion_log_entry(
         self, 
         provider: str, 
         data: List[Dict], 
         status: str, 
         error: str = None
-    ):
-        """Log ingestion activity to MongoDB"""
-        log_entry = {
+    ) -> Dict[str, Any]:
+        """Build the MongoDB log entry of an ingestion activity"""
+        return {
             "timestamp": datetime.utcnow(),
             "provider": provider,
             "status": status,
             "records_fetched": len(data),
             "error": error,
         }
-        
-        await self.mongo_logs.insert_one(log_entry)
     
-    def _get_default_providers(self) -> List[Provider]:
+    def _get_default_providers(self) -> Tuple[MockProvider, ...]:
         """Return mock provider objects for testing"""
-        return [
-            type('Provider', (), {'name': 'AQICN Mock', 'id': 1})(),
-            type('Provider', (), {'name': 'Google Air Quality Mock', 'id': 2})(),
-            type('Provider', (), {'name': 'IQAir Mock', 'id': 3})(),
-        ]
+        return DEFAULT_PROVIDERS
 
 
 async def main():
@@ -162,4 +229,10 @@ async def main():
 
 
 if __name__ == "__main__":
+    try:
+        # uvloop's C timer heap and run loop, same loop uvicorn uses for the API
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main())
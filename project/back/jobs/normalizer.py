@@ -8,19 +8,51 @@ Transforms raw API payloads into canonical format
 - Persists to PostgreSQL
 """
 
+import asyncio
+import hashlib
+import json
 import logging
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from functools import lru_cache
+import numpy as np
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 
 from database.postgres_db import SessionLocal
 from database.mongo_db import get_error_logs_collection
-from models import AirQualityReading, Station, Pollutant, Provider
+from models import AirQualityReading, RawIngestion, Station, Pollutant, Provider
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Provider batches normalized in parallel off the event loop
+MAX_NORMALIZER_THREADS = 8
+
+# API pollutant code -> standard pollutant name
+POLLUTANT_CODES = {
+    "pm25": "PM2.5",
+    "pm10": "PM10",
+    "o3": "O3",
+    "no2": "NO2",
+    "so2": "SO2",
+    "co": "CO",
+}
+
+# AQICN iaqi key -> (standard pollutant name, unit)
+AQICN_POLLUTANTS = {
+    "pm25": ("PM2.5", "μg/m³"),
+    "pm10": ("PM10", "μg/m³"),
+    "o3": ("O3", "ppb"),
+    "no2": ("NO2", "ppb"),
+    "so2": ("SO2", "ppb"),
+    "co": ("CO", "ppm"),
+}
+
 
 class DataNormalizer:
     """
@@ -46,12 +78,31 @@ class DataNormalizer:
         (301, 500, 250.5, 500.4),# Hazardous
     ]
     
+    # Provider name keyword -> normalizer method, checked in order
+    _PROVIDER_HANDLERS = {
+        "aqicn": "_normalize_aqicn",
+        "waqi": "_normalize_aqicn",
+        "google": "_normalize_google",
+        "iqair": "_normalize_iqair",
+    }
+    
+    # Breakpoint columns as arrays for the vectorized AQI calculation
+    _AQI_LO, _AQI_HI, _CONC_LO, _CONC_HI = np.array(AQI_BREAKPOINTS, dtype=float).T
+    _AQI_HIGHS = [bp[1] for bp in AQI_BREAKPOINTS]
+    
+    # Pollutant/station lookups shared by every normalizer in the process,
+    # loaded on first use and reloaded after invalidate_caches()
+    pollutant_cache: Dict[str, int] = {}
+    station_cache: Dict[tuple, int] = {}
+    station_coords_cache: List[tuple] = []
+    _caches_loaded = False
+    _cache_lock = threading.Lock()
+    
     def __init__(self):
         self.mongo_logs = get_error_logs_collection()
-        self.pollutant_cache = {}
-        self.station_cache = {}
-        self.station_coords_cache = []
-        self.db_session = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=MAX_NORMALIZER_THREADS, thread_name_prefix="normalizer"
+        )
     
     async def normalize_and_save(
         self, 
@@ -60,10 +111,33 @@ class DataNormalizer:
     ) -> Dict[str, Any]:
         """
         Main method to normalize and save data
+        The parsing and SQLAlchemy work runs in a worker thread so the event
+        loop stays free for other providers and MongoDB writes
         
         Returns:
             Statistics about the normalization process
         """
+        loop = asyncio.get_running_loop()
+        stats, failed_records = await loop.run_in_executor(
+            self._executor, self._normalize_and_save_sync, raw_data, provider_name
+        )
+        
+        if failed_records:
+            await self._log_errors(provider_name, failed_records)
+        
+        return stats
+    
+    def _normalize_and_save_sync(
+        self, 
+        raw_data: List[Dict[str, Any]], 
+        provider_name: str
+    ) -> Tuple[Dict[str, Any], List[Tuple[Dict[str, Any], str]]]:
+        """
+        Blocking body of normalize_and_save
+        
+        Returns:
+            (statistics, list of (record, error) to log to MongoDB)
+        """
         db = SessionLocal()
         try:
             # Get provider
@@ -71,8 +145,8 @@ class DataNormalizer:
             if not provider:
                 provider = self._create_provider(db, provider_name)
             
-            # Load caches
-            self._load_caches(db)
+            # Load caches (only the first time or after a station change)
+            self._ensure_caches(db)
             
             stats = {
                 "total_records": len(raw_data),
@@ -83,33 +157,50 @@ class DataNormalizer:
                 "error_details": []
             }
             
+            # Resolve the provider format once for the whole batch
+            handler = self._get_record_normalizer(provider_name)
+            
+            failed_records = []
+            readings = []
+            raw_payloads = {}  # payload hash -> raw record
+            reading_hashes = []  # payload hash of each reading, parallel to readings
             for record in raw_data:
                 try:
                     # Validate and normalize
-                    normalized = self._normalize_record(record, provider_name)
+                    normalized = handler(record) if handler else None
                     
                     if not normalized:
                         stats["errors"] += 1
                         continue
                     
                     stats["validated"] += 1
+                    readings.extend(normalized)
                     
-                    # Save to database
-                    if self._save_reading(db, normalized, provider.id):
-                        stats["saved"] += 1
-                    else:
-                        stats["duplicates"] += 1
+                    payload_hash = self._payload_hash(record)
+                    raw_payloads[payload_hash] = record
+                    reading_hashes.extend([payload_hash] * len(normalized))
                     
                 except Exception as e:
                     stats["errors"] += 1
                     error_msg = f"Error normalizing record: {str(e)}"
                     stats["error_details"].append(error_msg)
                     logger.error(error_msg)
-                    await self._log_error(provider_name, record, str(e))
+                    failed_records.append((record, str(e)))
+            
+            self._fill_aqi(readings)
+            
+            # Store each raw payload once and reference it from its readings
+            raw_ids = self._save_raw_payloads(db, raw_payloads, provider.id)
+            for reading, payload_hash in zip(readings, reading_hashes):
+                reading["raw_ingestion_id"] = raw_ids.get(payload_hash)
+            
+            # Save the whole batch to database, duplicates are skipped by Postgres
+            stats["saved"] = self._save_readings(db, readings, provider.id)
+            stats["duplicates"] = len(readings) - stats["saved"]
             
             db.commit()
             logger.info(f"Normalization complete: {stats['saved']} saved, {stats['duplicates']} duplicates, {stats['errors']} errors")
-            return stats
+            return stats, failed_records
             
         except Exception as e:
             db.rollback()
@@ -118,34 +209,29 @@ class DataNormalizer:
         finally:
             db.close()
     
-    def _normalize_record(
+    def _get_record_normalizer(
         self, 
-        record: Dict[str, Any], 
         provider: str
-    ) -> Optional[List[Dict[str, Any]]]:
+    ) -> Optional[Callable[[Dict[str, Any]], List[Dict[str, Any]]]]:
         """
-        Normalize a single record based on provider format
-        Returns list of normalized readings (one per pollutant)
+        Return the bound normalizer method for the provider format
+        Each call of it normalizes one record into a list of readings (one per pollutant)
         """
-        if "aqicn" in provider.lower() or "waqi" in provider.lower():
-            return self._normalize_aqicn(record)
-        elif "google" in provider.lower():
-            return self._normalize_google(record)
-        elif "iqair" in provider.lower():
-            return self._normalize_iqair(record)
-        else:
-            logger.warning(f"Unknown provider format: {provider}")
-            return None
+        provider_lower = provider.lower()
+        for keyword, method_name in self._PROVIDER_HANDLERS.items():
+            if keyword in provider_lower:
+                return getattr(self, method_name)
+        
+        logger.warning(f"Unknown provider format: {provider}")
+        return None
     
     def _normalize_aqicn(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Normalize AQICN format"""
         try:
             data = record.get("data", {})
             city_name = data.get("city", {}).get("name", "Unknown")
-            timestamp = datetime.strptime(
-                data.get("time", {}).get("s", ""), 
-                "%Y-%m-%d %H:%M:%S"
-            )
+            # "YYYY-MM-DD HH:MM:SS"; fromisoformat accepts the space separator
+            timestamp = datetime.fromisoformat(data.get("time", {}).get("s", ""))
             
             # Get or create station
             geo = data.get("city", {}).get("geo", [0, 0])
@@ -163,16 +249,7 @@ class DataNormalizer:
             readings = []
             iaqi = data.get("iaqi", {})
             
-            pollutant_mapping = {
-                "pm25": ("PM2.5", "μg/m³"),
-                "pm10": ("PM10", "μg/m³"),
-                "o3": ("O3", "ppb"),
-                "no2": ("NO2", "ppb"),
-                "so2": ("SO2", "ppb"),
-                "co": ("CO", "ppm"),
-            }
-            
-            for key, (pollutant_name, unit) in pollutant_mapping.items():
+            for key, (pollutant_name, unit) in AQICN_POLLUTANTS.items():
                 if key in iaqi:
                     value = iaqi[key].get("v", 0)
                     pollutant_id = self._get_pollutant_id(pollutant_name)
@@ -180,15 +257,13 @@ class DataNormalizer:
                     if pollutant_id:
                         # Normalize value to canonical unit
                         normalized_value = self._convert_to_canonical_unit(value, unit, pollutant_name)
-                        aqi = self._calculate_aqi(normalized_value, pollutant_name)
                         
                         readings.append({
                             "station_id": station_id,
                             "pollutant_id": pollutant_id,
                             "datetime": timestamp,
                             "value": normalized_value,
-                            "aqi": aqi,
-                            "raw_json": record,
+                            "aqi": None,  # Computed for the whole batch in _fill_aqi
                         })
             
             return readings
@@ -222,15 +297,13 @@ class DataNormalizer:
                 
                 if pollutant_id:
                     normalized_value = self._convert_to_canonical_unit(value, unit, pollutant_name)
-                    aqi = self._calculate_aqi(normalized_value, pollutant_name)
                     
                     readings.append({
                         "station_id": station_id,
                         "pollutant_id": pollutant_id,
                         "datetime": timestamp,
                         "value": normalized_value,
-                        "aqi": aqi,
-                        "raw_json": record,
+                        "aqi": None,  # Computed for the whole batch in _fill_aqi
                     })
             
             return readings
@@ -270,7 +343,6 @@ class DataNormalizer:
                     "datetime": timestamp,
                     "value": pm25_value,
                     "aqi": aqi,
-                    "raw_json": record,
                 }]
             
             return []
@@ -279,43 +351,94 @@ class DataNormalizer:
             logger.error(f"Error normalizing IQAir record: {str(e)}")
             return []
     
-    def _save_reading(
+    @staticmethod
+    def _payload_hash(record: Dict[str, Any]) -> str:
+        """sha256 of the canonical JSON of a raw payload"""
+        canonical = json.dumps(record, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def _save_raw_payloads(
         self, 
         db: Session, 
-        readings: List[Dict[str, Any]], 
+        raw_payloads: Dict[str, Dict[str, Any]], 
         provider_id: int
-    ) -> bool:
-        """Save readings to database, handle duplicates"""
-        try:
-            for reading_data in readings:
-                reading = AirQualityReading(
-                    **reading_data,
-                    provider_id=provider_id
+    ) -> Dict[str, int]:
+        """
+        Store raw payloads in RawIngestion, skipping the ones already stored
+        
+        Returns:
+            payload hash -> RawIngestion id
+        """
+        if not raw_payloads:
+            return {}
+        
+        rows = [
+            {"provider_id": provider_id, "payload_hash": payload_hash, "payload": record}
+            for payload_hash, record in raw_payloads.items()
+        ]
+        db.execute(
+            insert(RawIngestion).on_conflict_do_nothing(index_elements=["payload_hash"]),
+            rows
+        )
+        
+        return {
+            payload_hash: raw_id
+            for raw_id, payload_hash in db.execute(
+                select(RawIngestion.id, RawIngestion.payload_hash).where(
+                    RawIngestion.payload_hash.in_(list(raw_payloads))
                 )
-                db.add(reading)
-            
-            db.flush()
-            return True
-            
-        except IntegrityError:
-            # Duplicate reading (station_id, pollutant_id, datetime)
-            db.rollback()
-            return False
-        except Exception as e:
-            logger.error(f"Error saving reading: {str(e)}")
-            db.rollback()
-            return False
+            )
+        }
+    
+    def _save_readings(
+        self, 
+        db: Session, 
+        readings: List[Dict[str, Any]], 
+        provider_id: int
+    ) -> int:
+        """
+        Save readings to database in a single INSERT ... ON CONFLICT DO NOTHING
+        Duplicates (station_id, pollutant_id, datetime) are skipped by Postgres
+        
+        Returns:
+            Number of readings actually inserted
+        """
+        if not readings:
+            return 0
+        
+        rows = [{**reading_data, "provider_id": provider_id} for reading_data in readings]
+        stmt = insert(AirQualityReading).on_conflict_do_nothing(
+            index_elements=["station_id", "pollutant_id", "datetime"]
+        ).returning(AirQualityReading.id)
+        
+        return len(db.execute(stmt, rows).all())
+    
+    @classmethod
+    def invalidate_caches(cls):
+        """Force a reload of the pollutant/station caches on the next batch"""
+        with cls._cache_lock:
+            cls._caches_loaded = False
+    
+    @classmethod
+    def _ensure_caches(cls, db: Session):
+        """Load the caches unless they are already loaded"""
+        if cls._caches_loaded:
+            return
+        with cls._cache_lock:
+            if not cls._caches_loaded:
+                cls._load_caches(db)
+                cls._caches_loaded = True
     
-    def _load_caches(self, db: Session):
+    @classmethod
+    def _load_caches(cls, db: Session):
         """Load pollutants and stations into memory cache"""
         pollutants = db.query(Pollutant).all()
-        self.pollutant_cache = {p.name: p.id for p in pollutants}
+        cls.pollutant_cache = {p.name: p.id for p in pollutants}
         
         stations = db.query(Station).all()
-        self.station_cache = {(s.name, s.city): s.id for s in stations}
+        cls.station_cache = {(s.name, s.city): s.id for s in stations}
         # También cachear por coordenadas para búsqueda por proximidad
-        self.station_coords_cache = [(s.id, s.latitude, s.longitude, s.name, s.city) for s in stations]
-        self.db_session = db
+        cls.station_coords_cache = [(s.id, s.latitude, s.longitude, s.name, s.city) for s in stations]
     
     def _get_pollutant_id(self, name: str) -> Optional[int]:
         """Get pollutant ID from cache"""
@@ -354,39 +477,50 @@ class DataNormalizer:
         # Simplified conversion logic
         return value
     
-    def _calculate_aqi(self, concentration: float, pollutant: str) -> int:
-        """Calculate AQI from concentration (simplified EPA formula)"""
-        # Simplified AQI calculation for PM2.5
-        if pollutant == "PM2.5":
-            for aqi_low, aqi_high, conc_low, conc_high in self.AQI_BREAKPOINTS:
-                if conc_low <= concentration <= conc_high:
-                    return int(
-                        ((aqi_high - aqi_low) / (conc_high - conc_low)) * 
-                        (concentration - conc_low) + aqi_low
-                    )
-            return 500  # Hazardous
+    def _fill_aqi(self, readings: List[Dict[str, Any]]):
+        """Compute in one vectorized pass the AQI of the readings that don't have one yet"""
+        pending = [r for r in readings if r["aqi"] is None]
+        if not pending:
+            return
         
-        # Default to moderate
-        return 75
+        values = np.fromiter((r["value"] for r in pending), dtype=float, count=len(pending))
+        pollutant_ids = np.fromiter((r["pollutant_id"] for r in pending), dtype=np.int64, count=len(pending))
+        
+        # Simplified AQI calculation for PM2.5, default to moderate otherwise
+        is_pm25 = pollutant_ids == self.pollutant_cache.get("PM2.5", -1)
+        aqis = np.where(is_pm25, self._calculate_aqi_vec(values), 75)
+        
+        for reading, aqi in zip(pending, aqis.tolist()):
+            reading["aqi"] = int(aqi)
+    
+    def _calculate_aqi_vec(self, concentrations: np.ndarray) -> np.ndarray:
+        """Calculate PM2.5 AQI from concentrations (simplified EPA formula)"""
+        # First breakpoint whose upper bound is >= concentration
+        idx = np.clip(np.searchsorted(self._CONC_HI, concentrations), 0, len(self._CONC_HI) - 1)
+        conc_lo, conc_hi = self._CONC_LO[idx], self._CONC_HI[idx]
+        aqi_lo, aqi_hi = self._AQI_LO[idx], self._AQI_HI[idx]
+        
+        aqi = ((aqi_hi - aqi_lo) / (conc_hi - conc_lo)) * (concentrations - conc_lo) + aqi_lo
+        
+        # Out of range or between breakpoints -> Hazardous
+        in_range = (concentrations >= conc_lo) & (concentrations <= conc_hi)
+        return np.where(in_range, np.trunc(aqi), 500).astype(int)
     
     def _estimate_pm25_from_aqi(self, aqi: int) -> float:
         """Reverse calculate PM2.5 from AQI"""
-        for aqi_low, aqi_high, conc_low, conc_high in self.AQI_BREAKPOINTS:
-            if aqi_low <= aqi <= aqi_high:
+        # First breakpoint whose AQI upper bound is >= aqi
+        i = bisect_left(self._AQI_HIGHS, aqi)
+        if i < len(self.AQI_BREAKPOINTS):
+            aqi_low, aqi_high, conc_low, conc_high = self.AQI_BREAKPOINTS[i]
+            if aqi >= aqi_low:
                 return conc_low + ((aqi - aqi_low) * (conc_high - conc_low)) / (aqi_high - aqi_low)
         return 500.0  # Hazardous
     
-    def _map_pollutant_code(self, code: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _map_pollutant_code(code: str) -> str:
         """Map API pollutant codes to standard names"""
-        mapping = {
-            "pm25": "PM2.5",
-            "pm10": "PM10",
-            "o3": "O3",
-            "no2": "NO2",
-            "so2": "SO2",
-            "co": "CO",
-        }
-        return mapping.get(code.lower(), code.upper())
+        return POLLUTANT_CODES.get(code.lower(), code.upper())
     
     def _create_provider(self, db: Session, name: str) -> Provider:
         """Create provider if it doesn't exist"""
@@ -395,14 +529,18 @@ class DataNormalizer:
         db.commit()
         return provider
     
-    async def _log_error(self, provider: str, record: Dict, error: str):
-        """Log error to MongoDB"""
-        log_entry = {
-            "timestamp": datetime.utcnow(),
-            "provider": provider,
-            "error": error,
-            "record_sample": str(record)[:500],  # Truncate for storage
-            "severity": "error",
-            "error_type": "normalization_error"
-        }
-        await self.mongo_logs.insert_one(log_entry)
+    async def _log_errors(self, provider: str, failed_records: List[Tuple[Dict, str]]):
+        """Log the errors of a batch to MongoDB in a single insert_many"""
+        timestamp = datetime.utcnow()
+        log_entries = [
+            {
+                "timestamp": timestamp,
+                "provider": provider,
+                "error": error,
+                "record_sample": str(record)[:500],  # Truncate for storage
+                "severity": "error",
+                "error_type": "normalization_error"
+            }
+            for record, error in failed_records
+        ]
+        await self.mongo_logs.insert_many(log_entries, ordered=False)
@@ -4,9 +4,12 @@ Manages execution of batch jobs on a schedule
 Uses APScheduler for cron-like scheduling
 """
 
+import asyncio
 import logging
+from apscheduler.executors.asyncio import AsyncIOExecutor
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 
 from jobs.ingestion_job import IngestionJob
@@ -16,35 +19,48 @@ from jobs.alert_checker_job import AlertCheckerJob
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Defaults for every job: never overlap a run, and collapse missed runs into
+# a single one instead of firing the backlog in a burst (a run more than
+# misfire_grace_time seconds late is skipped)
+JOB_DEFAULTS = {
+    "max_instances": 1,
+    "coalesce": True,
+    "misfire_grace_time": 30,
+}
+
 
 class JobScheduler:
     """
     Manages scheduled execution of batch jobs
     According to architecture:
-    - Ingestion: every 10-60 minutes (configurable)
+    - Ingestion: every 10-60 minutes (configurable), followed by the alert check
     - Daily Aggregation: once per day at 02:00 UTC
     """
     
     def __init__(self):
-        self.scheduler = AsyncIOScheduler()
+        self.scheduler = AsyncIOScheduler(
+            executors={"default": AsyncIOExecutor()},
+            job_defaults=JOB_DEFAULTS,
+        )
         self.ingestion_job = IngestionJob()
         self.aggregation_job = DailyAggregationJob()
         self.alert_checker_job = AlertCheckerJob()
+        self.alert_listener_task = None
         
     def start(self):
         """Start the scheduler with configured jobs"""
         logger.info("Initializing job scheduler...")
         
-        # Ingestion Job: runs every 1 minute (for testing)
+        # Ingestion + Alert Checker: one tick every 1 minute (for testing).
+        # Alerts are checked right after ingestion, against fresh data
         self.scheduler.add_job(
-            self.ingestion_job.run,
-            trigger=CronTrigger(minute="*/1"),  # Every 1 minute
-            id="ingestion_job",
-            name="Data Ingestion Job",
+            self.tick,
+            trigger=IntervalTrigger(seconds=60),  # Every 1 minute
+            id="ingestion_alert_tick",
+            name="Data Ingestion + Alert Checker Job",
             replace_existing=True,
-            max_instances=1,
         )
-        logger.info("Scheduled: Ingestion Job (every 1 minute)")
+        logger.info("Scheduled: Ingestion + Alert Checker Job (every 1 minute)")
         
         # Daily Aggregation Job: runs at 02:00 UTC
         self.scheduler.add_job(
@@ -53,19 +69,15 @@ class JobScheduler:
             id="daily_aggregation_job",
             name="Daily Aggregation Job",
             replace_existing=True,
-            max_instances=1,
+            misfire_grace_time=3600,  # Still run if up to 1 hour late
         )
         logger.info("Scheduled: Daily Aggregation Job (daily at 02:00 UTC)")
-        # Alert Checker Job: runs every minute to check active alerts
-        self.scheduler.add_job(
-            self.alert_checker_job.run,
-            trigger=CronTrigger(minute="*/1"),  # Every 1 minute
-            id="alert_checker_job",
-            name="Alert Checker Job",
-            replace_existing=True,
-            max_instances=1,
+        
+        # Alert listener: event-driven checks on LISTEN/NOTIFY of new readings
+        self.alert_listener_task = asyncio.get_running_loop().create_task(
+            self.alert_checker_job.listen()
         )
-        logger.info("Scheduled: Alert Checker Job (every 1 minute)")
+        logger.info("Started: Alert Listener (LISTEN aqr_new)")
         
         # 
         # Start scheduler
@@ -78,9 +90,24 @@ class JobScheduler:
     def stop(self):
         """Stop the scheduler"""
         logger.info("Stopping job scheduler...")
+        if self.alert_listener_task is not None:
+            self.alert_listener_task.cancel()
+            self.alert_listener_task = None
         self.scheduler.shutdown()
         logger.info("Job scheduler stopped")
     
+    async def tick(self):
+        """
+        Minutely tick: ingestion followed by the alert checker heartbeat
+        (new readings are also handled immediately by the alert listener)
+        """
+        try:
+            await self.ingestion_job.run()
+        except Exception as e:
+            logger.error(f"Ingestion failed during tick: {str(e)}")
+        
+        await self.alert_checker_job.run()
+    
     async def run_now(self, job_name: str):
         """Manually trigger a job"""
         if job_name == "ingestion_job":
@@ -88,7 +115,8 @@ class JobScheduler:
             return await self.ingestion_job.run()
         elif job_name == "daily_aggregation_job":
             logger.info("Manually triggering aggregation job...")
-            return await self.aggregation_job.run()
+            # The aggregation job is synchronous: run it in a thread
+            return await asyncio.to_thread(self.aggregation_job.run)
         elif job_name == "alert_checker_job":
             logger.info("Manually triggering alert checker job...")
             return await self.alert_checker_job.run()
@@ -4,31 +4,116 @@ Generates mock historical data to populate reports
 """
 
 import asyncio
-import random
+import os
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import Any, List, Dict, Tuple
+import numpy as np
 import logging
 
+import psycopg2
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from database.postgres_db import SessionLocal
+from database.bulk_copy import copy_rows
 from models import AirQualityReading, Station, Pollutant, Provider
 
 logger = logging.getLogger(__name__)
 
+# Readings inserted and committed per batch
+SEED_BATCH_SIZE = 10000
+
+# Random seed for the mock values, so re-runs generate the same dataset
+SEED_RANDOM_SEED = int(os.getenv("SEED_RANDOM_SEED", "42"))
+
+# Base values for different pollutants (realistic ranges)
+POLLUTANT_RANGES = {
+    'PM2.5': (5, 150),    # μg/m³
+    'PM10': (10, 200),    # μg/m³
+    'O3': (10, 120),      # ppb
+    'NO2': (5, 80),       # ppb
+    'SO2': (0, 50),       # ppb
+    'CO': (0.1, 5.0),     # ppm
+}
+
+# Simplified AQI breakpoints: (bp_lo, bp_hi, aqi_lo, aqi_hi)
+AQI_BREAKPOINTS = {
+    'PM2.5': [
+        (0, 12, 0, 50),
+        (12.1, 35.4, 51, 100),
+        (35.5, 55.4, 101, 150),
+        (55.5, 150.4, 151, 200),
+        (150.5, 250.4, 201, 300),
+        (250.5, 500, 301, 500)
+    ],
+    'PM10': [
+        (0, 54, 0, 50),
+        (55, 154, 51, 100),
+        (155, 254, 101, 150),
+        (255, 354, 151, 200),
+        (355, 424, 201, 300),
+        (425, 604, 301, 500)
+    ],
+    'O3': [
+        (0, 54, 0, 50),
+        (55, 70, 51, 100),
+        (71, 85, 101, 150),
+        (86, 105, 151, 200),
+        (106, 200, 201, 300)
+    ],
+    'NO2': [
+        (0, 53, 0, 50),
+        (54, 100, 51, 100),
+        (101, 360, 101, 150),
+        (361, 649, 151, 200),
+        (650, 1249, 201, 300)
+    ],
+    'SO2': [
+        (0, 35, 0, 50),
+        (36, 75, 51, 100),
+        (76, 185, 101, 150),
+        (186, 304, 151, 200),
+        (305, 604, 201, 300)
+    ],
+    'CO': [
+        (0, 4.4, 0, 50),
+        (4.5, 9.4, 51, 100),
+        (9.5, 12.4, 101, 150),
+        (12.5, 15.4, 151, 200),
+        (15.5, 30.4, 201, 300)
+    ]
+}
+
+
+def _build_aqi_segments(breakpoints):
+    """Precompute (bp_hi, bp_lo, slope, aqi_lo) arrays for breakpoint lookups"""
+    bp_lo, bp_hi, aqi_lo, aqi_hi = np.array(breakpoints, dtype=float).T
+    slope = (aqi_hi - aqi_lo) / (bp_hi - bp_lo)
+    return bp_hi, bp_lo, slope, aqi_lo
+
+
+_AQI_SEGMENTS = {name: _build_aqi_segments(bps) for name, bps in AQI_BREAKPOINTS.items()}
+_DEFAULT_AQI_SEGMENTS = _build_aqi_segments([(0, 100, 0, 100)])
+
 
 class HistoricalDataSeeder:
     """Seeds database with historical mock data for reports"""
     
-    def __init__(self):
+    def __init__(self, seed: int = SEED_RANDOM_SEED):
         self.db = SessionLocal()
+        self.rng = np.random.default_rng(seed)
     
-    def generate_historical_data(self, days_back: int = 30):
+    def generate_historical_data(self, days_back: int = 30) -> int:
         """
         Generate historical data for the last N days
         
         Args:
             days_back: Number of days to generate data for
+        
+        Returns:
+            Number of readings inserted
         """
+        total_readings = 0
         try:
             logger.info(f"Starting historical data generation for {days_back} days")
             
@@ -36,65 +121,89 @@ class HistoricalDataSeeder:
             stations = self.db.query(Station).all()
             if not stations:
                 logger.error("No stations found in database")
-                return
+                return 0
             
             # Get all pollutants
             pollutants = self.db.query(Pollutant).all()
             if not pollutants:
                 logger.error("No pollutants found in database")
-                return
+                return 0
             
             # Get mock provider (ID 6 is IQAir Mock)
             provider = self.db.query(Provider).filter(Provider.id == 6).first()
             if not provider:
                 logger.error("Mock provider not found")
-                return
+                return 0
             
-            # Generate data for each day
+            # Reading times: every 2 hours = 12 readings/day, no future times
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days_back)
             
-            total_readings = 0
-            current_date = start_date
-            
+            timestamps = []
+            current_date = start_date.replace(minute=0, second=0, microsecond=0)
             while current_date <= end_date:
-                # Generate multiple readings per day (every 2 hours = 12 readings/day)
                 for hour in range(0, 24, 2):
-                    reading_time = current_date.replace(hour=hour, minute=0, second=0)
-                    
-                    # Skip future times
+                    reading_time = current_date.replace(hour=hour)
                     if reading_time > end_date:
                         break
-                    
-                    # Generate readings for each station and pollutant
-                    for station in stations:
-                        for pollutant in pollutants:
-                            reading = self._generate_mock_reading(
-                                station=station,
-                                pollutant=pollutant,
-                                provider=provider,
-                                timestamp=reading_time
-                            )
-                            
-                            # Check for duplicates
-                            existing = self.db.query(AirQualityReading).filter(
-                                AirQualityReading.station_id == reading.station_id,
-                                AirQualityReading.pollutant_id == reading.pollutant_id,
-                                AirQualityReading.datetime == reading.datetime
-                            ).first()
-                            
-                            if not existing:
-                                self.db.add(reading)
-                                total_readings += 1
-                    
-                    # Commit in batches
-                    if total_readings % 100 == 0:
-                        self.db.commit()
-                        logger.info(f"Saved {total_readings} readings so far...")
-                
+                    timestamps.append(reading_time)
                 current_date += timedelta(days=1)
             
-            # Final commit
+            # Monthly partitions of the whole range, so past months don't
+            # land in the DEFAULT partition
+            self._ensure_reading_partitions(timestamps)
+            
+            # Generate all values and AQIs at once: arrays of shape
+            # (timestamps, stations, pollutants)
+            values, aqis = self._generate_mock_values(timestamps, len(stations), pollutants)
+            values = np.round(values, 2).tolist()
+            aqis = aqis.tolist()
+            
+            # Readings already stored in the range, loaded once so existing
+            # keys are skipped in memory instead of probed row by row
+            existing = set(self.db.execute(
+                select(
+                    AirQualityReading.station_id,
+                    AirQualityReading.pollutant_id,
+                    AirQualityReading.datetime
+                ).where(
+                    AirQualityReading.datetime >= timestamps[0],
+                    AirQualityReading.datetime <= timestamps[-1]
+                )
+            ).tuples()) if timestamps else set()
+            
+            # Plain ids read once: the ORM objects expire on every commit and
+            # are expunged below, so they are not touched inside the loop
+            station_ids = [station.id for station in stations]
+            pollutant_ids = [pollutant.id for pollutant in pollutants]
+            provider_id = provider.id
+            self.db.expunge_all()
+            
+            rows = []
+            for t, timestamp in enumerate(timestamps):
+                for s, station_id in enumerate(station_ids):
+                    for p, pollutant_id in enumerate(pollutant_ids):
+                        if (station_id, pollutant_id, timestamp) in existing:
+                            continue
+                        rows.append({
+                            "station_id": station_id,
+                            "pollutant_id": pollutant_id,
+                            "provider_id": provider_id,
+                            "datetime": timestamp,
+                            "value": values[t][s][p],
+                            "aqi": aqis[t][s][p],
+                        })
+                
+                # Insert and commit in fixed-size batches
+                if len(rows) >= SEED_BATCH_SIZE:
+                    total_readings += self._insert_readings(rows)
+                    self.db.commit()
+                    self.db.expunge_all()
+                    rows = []
+                    logger.info(f"Saved {total_readings} readings so far...")
+            
+            # Final batch
+            total_readings += self._insert_readings(rows)
             self.db.commit()
             logger.info(f"Historical data generation complete: {total_readings} readings created")
             
@@ -103,132 +212,105 @@ class HistoricalDataSeeder:
             self.db.rollback()
         finally:
             self.db.close()
+        
+        return total_readings
     
-    def _generate_mock_reading(
+    def _generate_mock_values(
         self,
-        station: Station,
-        pollutant: Pollutant,
-        provider: Provider,
-        timestamp: datetime
-    ) -> AirQualityReading:
-        """Generate a single mock reading with realistic variations"""
+        timestamps: List[datetime],
+        n_stations: int,
+        pollutants: List[Pollutant]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Generate mock values with realistic variations and their AQIs
         
-        # Base values for different pollutants (realistic ranges)
-        pollutant_ranges = {
-            'PM2.5': (5, 150),    # μg/m³
-            'PM10': (10, 200),    # μg/m³
-            'O3': (10, 120),      # ppb
-            'NO2': (5, 80),       # ppb
-            'SO2': (0, 50),       # ppb
-            'CO': (0.1, 5.0),     # ppm
-        }
+        Returns:
+            (values, aqis) arrays of shape (timestamps, stations, pollutants)
+        """
+        # Range for each pollutant (default if not found)
+        ranges = np.array([POLLUTANT_RANGES.get(p.name, (10, 100)) for p in pollutants], dtype=float)
         
-        # Get range for this pollutant (default if not found)
-        min_val, max_val = pollutant_ranges.get(pollutant.name, (10, 100))
+        # Daily variation (higher during day, lower at night) and weekly
+        # variation (higher on weekdays)
+        hours = np.array([t.hour for t in timestamps])
+        weekdays = np.array([t.weekday() for t in timestamps])
+        time_factor = np.where(
+            (hours >= 6) & (hours <= 18), 1.2,
+            np.where((hours <= 5) | (hours >= 22), 0.7, 1.0)
+        )
+        week_factor = np.where(weekdays < 5, 1.1, 0.9)
         
-        # Add some daily variation (higher during day, lower at night)
-        hour = timestamp.hour
-        time_factor = 1.0
-        if 6 <= hour <= 18:  # Daytime
-            time_factor = 1.2
-        elif 0 <= hour <= 5 or 22 <= hour <= 23:  # Night
-            time_factor = 0.7
+        base = self.rng.uniform(
+            ranges[:, 0], ranges[:, 1],
+            size=(len(timestamps), n_stations, len(pollutants))
+        )
+        values = base * (time_factor * week_factor)[:, None, None]
         
-        # Add some weekly variation (higher on weekdays)
-        weekday = timestamp.weekday()
-        week_factor = 1.1 if weekday < 5 else 0.9  # Weekday vs weekend
+        aqis = np.empty(values.shape, dtype=int)
+        for p, pollutant in enumerate(pollutants):
+            aqis[:, :, p] = self._calculate_aqi_vec(pollutant.name, values[:, :, p])
         
-        # Generate value with randomness
-        base_value = random.uniform(min_val, max_val)
-        value = base_value * time_factor * week_factor
+        return values, aqis
+    
+    def _ensure_reading_partitions(self, timestamps: List[datetime]):
+        """
+        Create the airqualityreading partition of every month covered by
+        timestamps (no-op if the table is not partitioned)
+        """
+        months = sorted({t.date().replace(day=1) for t in timestamps})
+        try:
+            for month_start in months:
+                self.db.execute(
+                    text("SELECT ensure_airqualityreading_partition(:month_start)"),
+                    {"month_start": month_start}
+                )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"Could not create reading partitions: {str(e)}")
+    
+    def _insert_readings(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert a batch of new readings with COPY
+        If a reading was inserted concurrently since the existing keys were
+        loaded, COPY fails on uq_reading and the batch is retried with
+        INSERT ... ON CONFLICT DO NOTHING
         
-        # Calculate AQI (simplified)
-        aqi = self._calculate_aqi(pollutant.name, value)
+        Returns:
+            Number of readings inserted
+        """
+        if not rows:
+            return 0
         
-        # Create reading
-        reading = AirQualityReading(
-            station_id=station.id,
-            pollutant_id=pollutant.id,
-            provider_id=provider.id,
-            datetime=timestamp,
-            value=round(value, 2),
-            aqi=aqi,
-            raw_json={
-                "source": "mock_historical",
-                "station": station.name,
-                "pollutant": pollutant.name,
-                "timestamp": timestamp.isoformat()
-            }
-        )
+        try:
+            return copy_rows(self.db, AirQualityReading, rows)
+        except psycopg2.IntegrityError:
+            self.db.rollback()
         
-        return reading
+        stmt = insert(AirQualityReading).on_conflict_do_nothing(
+            index_elements=["station_id", "pollutant_id", "datetime"]
+        ).returning(AirQualityReading.id)
+        return len(self.db.execute(stmt, rows).all())
     
-    def _calculate_aqi(self, pollutant_name: str, value: float) -> int:
-        """Calculate AQI based on pollutant concentration"""
-        
-        # Simplified AQI calculation
-        aqi_breakpoints = {
-            'PM2.5': [
-                (0, 12, 0, 50),
-                (12.1, 35.4, 51, 100),
-                (35.5, 55.4, 101, 150),
-                (55.5, 150.4, 151, 200),
-                (150.5, 250.4, 201, 300),
-                (250.5, 500, 301, 500)
-            ],
-            'PM10': [
-                (0, 54, 0, 50),
-                (55, 154, 51, 100),
-                (155, 254, 101, 150),
-                (255, 354, 151, 200),
-                (355, 424, 201, 300),
-                (425, 604, 301, 500)
-            ],
-            'O3': [
-                (0, 54, 0, 50),
-                (55, 70, 51, 100),
-                (71, 85, 101, 150),
-                (86, 105, 151, 200),
-                (106, 200, 201, 300)
-            ],
-            'NO2': [
-                (0, 53, 0, 50),
-                (54, 100, 51, 100),
-                (101, 360, 101, 150),
-                (361, 649, 151, 200),
-                (650, 1249, 201, 300)
-            ],
-            'SO2': [
-                (0, 35, 0, 50),
-                (36, 75, 51, 100),
-                (76, 185, 101, 150),
-                (186, 304, 151, 200),
-                (305, 604, 201, 300)
-            ],
-            'CO': [
-                (0, 4.4, 0, 50),
-                (4.5, 9.4, 51, 100),
-                (9.5, 12.4, 101, 150),
-                (12.5, 15.4, 151, 200),
-                (15.5, 30.4, 201, 300)
-            ]
-        }
+    def _calculate_aqi_vec(self, pollutant_name: str, values: np.ndarray) -> np.ndarray:
+        """Calculate AQIs based on pollutant concentrations"""
+        highs, bp_lo, slope, aqi_lo = _AQI_SEGMENTS.get(pollutant_name, _DEFAULT_AQI_SEGMENTS)
         
-        breakpoints = aqi_breakpoints.get(pollutant_name, [(0, 100, 0, 100)])
+        # First breakpoint whose upper bound is >= value
+        idx = np.searchsorted(highs, values)
+        in_table = idx < len(highs)
+        idx = np.minimum(idx, len(highs) - 1)
         
-        for bp_lo, bp_hi, aqi_lo, aqi_hi in breakpoints:
-            if bp_lo <= value <= bp_hi:
-                aqi = ((aqi_hi - aqi_lo) / (bp_hi - bp_lo)) * (value - bp_lo) + aqi_lo
-                return int(aqi)
+        aqi = slope[idx] * (values - bp_lo[idx]) + aqi_lo[idx]
         
-        # If value exceeds all breakpoints, return max
-        return 500
+        # If value exceeds all breakpoints (or falls between two), return max
+        return np.where(in_table & (values >= bp_lo[idx]), np.trunc(aqi), 500).astype(int)
 
 
-def seed_historical_data(days_back: int = 30):
-    """Entry point for seeding historical data"""
+def seed_historical_data(days_back: int = 30) -> int:
+    """Entry point for seeding historical data; returns the readings inserted"""
     seeder = HistoricalDataSeeder()
-    seeder.generate_historical_data(days_back)
+    return seeder.generate_historical_data(days_back)
 
 
 if __name__ == "__main__":
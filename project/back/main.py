@@ -1,35 +1,62 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import asyncio
+import logging
+from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import text
 from typing import List, Optional
 import os
 from datetime import datetime
 from contextlib import asynccontextmanager
 
 # Database imports
-from database.postgres_db import get_db, engine, Base
+from database.postgres_db import (
+    get_engine, warm_pool, start_query_stats, SQL_QUERY_STATS, Base, SessionLocal
+)
 from database.mongo_db import get_mongo_db
 
 # Router imports
 from routers.public_api import router as public_router
 from routers.admin_api import router as admin_router
+from routers.responses import ORJSON_AVAILABLE
 
 # Job scheduler
 from jobs.scheduler import start_scheduler, stop_scheduler
+from services.telegram_notifier import get_telegram_notifier
+
+# Schema helpers (DB_AUTO_CREATE)
+from init_db import install_reading_partitions
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_connections():
+    """Open the PostgreSQL pool and the MongoDB client before serving requests"""
+    try:
+        await asyncio.to_thread(warm_pool)
+    except Exception as e:
+        logger.warning(f"PostgreSQL pool warm-up failed: {str(e)}")
+    
+    try:
+        mongo_db = await get_mongo_db()
+        await mongo_db.command("ping")
+    except Exception as e:
+        logger.warning(f"MongoDB warm-up failed: {str(e)}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Application lifespan events
-    Starts/stops the job scheduler
+    Warms DB connections and starts/stops the job scheduler
     """
     # Startup
+    await warm_connections()
     await start_scheduler()
     yield
     # Shutdown
     await stop_scheduler()
+    await get_telegram_notifier().close()
 
 
 app = FastAPI(
@@ -38,21 +65,51 @@ app = FastAPI(
                 "Includes Public API for citizens/researchers and Admin API for system management.",
     version="1.0.0",
     lifespan=lifespan,
+    # orjson encodes responses several times faster than stdlib json
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse,
 )
 
-# CORS middleware
-origins = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173,http://localhost:3000").split(",")
+DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+
+# CORS middleware: allowed origins parsed once at startup (any origin in DEBUG)
+ALLOWED_ORIGINS = ["*"] if DEBUG else [
+    origin.strip()
+    for origin in os.getenv(
+        "CORS_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173,http://localhost:3000"
+    ).split(",")
+    if origin.strip()
+]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=origins if not os.getenv("DEBUG", "false").lower() == "true" else ["*"],
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
     expose_headers=["*"],
 )
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Per-request SQL query count/time headers (SQL_QUERY_STATS=1)
+if SQL_QUERY_STATS:
+    @app.middleware("http")
+    async def sql_query_stats(request: Request, call_next):
+        stats = start_query_stats()
+        response = await call_next(request)
+        response.headers["X-SQL-Queries"] = str(stats.count)
+        response.headers["X-SQL-Time"] = f"{stats.seconds * 1000:.1f}ms"
+        return response
+
+# Create database tables only when asked: the schema comes from
+# init_database.sql / init_db.py, and checking every table on each boot
+# costs a catalog round-trip per table
+if os.getenv("DB_AUTO_CREATE") == "1":
+    Base.metadata.create_all(bind=get_engine())
+    # airqualityreading is partitioned: without its DEFAULT and monthly
+    # partitions every insert fails (same step as init_db --init-schema)
+    _partition_db = SessionLocal()
+    try:
+        install_reading_partitions(_partition_db)
+    finally:
+        _partition_db.close()
 
 # Include routers
 app.include_router(public_router)
@@ -68,12 +125,20 @@ async def root():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+def _postgres_ping():
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+    finally:
+        db.close()
+
+
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check():
     """Health check endpoint"""
     try:
-        # Test PostgreSQL connection
-        db.execute("SELECT 1")
+        # Test PostgreSQL connection (sync driver: off the event loop)
+        await asyncio.to_thread(_postgres_ping)
         
         # Test MongoDB connection
         mongo_db = await get_mongo_db()
@@ -113,5 +178,7 @@ if __name__ == "__main__":
         "main:app",
         host=os.getenv("API_HOST", "0.0.0.0"),
         port=int(os.getenv("API_PORT", 8000)),
-        reload=os.getenv("DEBUG", "false").lower() == "true"
+        reload=DEBUG,
+        loop="uvloop",
+        http="httptools",
     )
@@ -7,7 +7,7 @@ Components: Geospatial & Monitoring, Users & Access Control,
 
 from sqlalchemy import (
     Column, Integer, String, Float, DateTime, Date, Boolean, Text, 
-    ForeignKey, UniqueConstraint, CheckConstraint, JSON
+    ForeignKey, UniqueConstraint, CheckConstraint, JSON, Index
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -84,17 +84,29 @@ class Pollutant(Base):
     daily_stats = relationship("AirQualityDailyStats", back_populates="pollutant")
 
 
+class RawIngestion(Base):
+    __tablename__ = 'rawingestion'
+    
+    id = Column(Integer, primary_key=True)
+    provider_id = Column(Integer, ForeignKey('provider.id', ondelete='SET NULL'))
+    payload_hash = Column(String(64), unique=True, nullable=False)  # sha256 of the payload
+    payload = Column(JSON, nullable=False)  # Raw provider payload, stored once
+    received_at = Column(DateTime, server_default=func.now())
+
+
 class AirQualityReading(Base):
     __tablename__ = 'airqualityreading'
     
-    id = Column(Integer, primary_key=True)
+    # Partitioned by month on datetime, so datetime is part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True)
     station_id = Column(Integer, ForeignKey('station.id', ondelete='CASCADE'), nullable=False)
     pollutant_id = Column(Integer, ForeignKey('pollutant.id', ondelete='CASCADE'), nullable=False)
     provider_id = Column(Integer, ForeignKey('provider.id', ondelete='SET NULL'))
-    datetime = Column(DateTime, nullable=False)
+    datetime = Column(DateTime, primary_key=True, nullable=False)
     value = Column(Float, nullable=False)  # Normalized to canonical units
     aqi = Column(Integer)
-    raw_json = Column(JSON)  # Raw payload for audit trail
+    raw_json = Column(JSON)  # Legacy inline payload, ingestion now uses raw_ingestion_id
+    raw_ingestion_id = Column(Integer, ForeignKey('rawingestion.id', ondelete='SET NULL'))
     created_at = Column(DateTime, server_default=func.now())
     
     # Relationships
@@ -105,9 +117,36 @@ class AirQualityReading(Base):
     # Constraints
     __table_args__ = (
         UniqueConstraint('station_id', 'pollutant_id', 'datetime', name='uq_reading'),
+        {'postgresql_partition_by': 'RANGE (datetime)'},
     )
 
 
+# Covering index for "latest reading per station/pollutant" lookups
+# (alert checker, dashboards): allows an Index Only Scan
+Index(
+    'idx_aqr_station_pollutant_datetime_cov',
+    AirQualityReading.station_id,
+    AirQualityReading.pollutant_id,
+    AirQualityReading.datetime.desc(),
+    postgresql_include=['value', 'aqi'],
+)
+
+# Day-range scans grouped by station/pollutant (daily aggregation job)
+Index(
+    'idx_aqr_datetime_station_pollutant',
+    AirQualityReading.datetime,
+    AirQualityReading.station_id,
+    AirQualityReading.pollutant_id,
+)
+
+# Readings of a station over a time window (API, reports)
+Index(
+    'idx_aqr_station_datetime',
+    AirQualityReading.station_id,
+    AirQualityReading.datetime.desc(),
+)
+
+
 # =====================================================
 # Component 2: USERS & ACCESS CONTROL
 # =====================================================
@@ -192,6 +231,10 @@ class Alert(Base):
     pollutant = relationship("Pollutant", back_populates="alerts")
 
 
+# A user's alerts, optionally filtered by is_active (public alerts API)
+Index('idx_alert_user_active', Alert.user_id, Alert.is_active)
+
+
 class Recommendation(Base):
     __tablename__ = 'recommendation'
     
@@ -208,6 +251,9 @@ class Recommendation(Base):
     product_recommendations = relationship("ProductRecommendation", back_populates="recommendation")
 
 
+Index('idx_recommendation_user_created', Recommendation.user_id, Recommendation.created_at.desc())
+
+
 class ProductRecommendation(Base):
     __tablename__ = 'productrecommendation'
     
@@ -246,6 +292,10 @@ class Report(Base):
     pollutant = relationship("Pollutant", back_populates="reports")
 
 
+# A user's reports, newest first (public reports API)
+Index('idx_report_user_created', Report.user_id, Report.created_at.desc())
+
+
 class AirQualityDailyStats(Base):
     __tablename__ = 'airqualitydailystats'
     
@@ -257,6 +307,7 @@ class AirQualityDailyStats(Base):
     avg_aqi = Column(Integer)
     max_aqi = Column(Integer)
     min_aqi = Column(Integer)
+    p95_value = Column(Float)
     readings_count = Column(Integer)
     created_at = Column(DateTime, server_default=func.now())
     
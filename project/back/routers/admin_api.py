@@ -4,18 +4,34 @@ Provides administrative functionality for system management
 Requires admin role authentication
 """
 
+import asyncio
+import json
+import time
+from bson import ObjectId
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, text
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime, timedelta
-
-from database.postgres_db import get_db
+from datetime import datetime
+
+from database.postgres_db import get_db, columns_for, utc_hours_ago, SessionLocal
+from database.mongo_db import (
+    get_mongo_db,
+    get_api_logs_collection,
+    get_error_logs_collection,
+    get_data_ingestion_logs_collection,
+)
 from models import (
     Provider, Station, AppUser, Role, Permission, 
     AirQualityReading, Alert, Report
 )
 from schemas import StationCreate, StationResponse, UserResponse, UserCreate, UserUpdate
 from jobs.scheduler import scheduler
+from jobs.normalizer import DataNormalizer
+from services.reference_cache import reference_cache
+from routers.responses import ORJSON_AVAILABLE
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -24,13 +40,72 @@ router = APIRouter(prefix="/admin", tags=["admin"])
 # SYSTEM MONITORING
 # =====================================================
 
+# Health report is cached briefly so frequent polling (load balancers,
+# monitoring) does not re-run every probe
+HEALTH_CACHE_TTL = 2.0  # seconds
+_health_cache = {"ts": 0.0, "value": None}
+
+
+def _postgres_ping():
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+    finally:
+        db.close()
+
+
+async def _mongo_ping():
+    mongo_db = await get_mongo_db()
+    await mongo_db.command("ping")
+
+
+def _count(model, *criteria):
+    """Scalar COUNT(*) subquery over a model, to gather several counts in one statement"""
+    return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+
+# Planner row estimate (kept by autovacuum/ANALYZE), O(1) instead of a full
+# COUNT(*) scan; summed over the partitions of a partitioned table, whose
+# own reltuples is -1
+APPROX_COUNT_SQL = text("""
+    SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint
+    FROM pg_class c
+    WHERE c.oid = CAST(:table AS regclass)
+       OR c.oid IN (
+           SELECT inhrelid FROM pg_inherits WHERE inhparent = CAST(:table AS regclass)
+       )
+""")
+
+
+def _approx_count(db: Session, model) -> int:
+    """Approximate row count of a model's table"""
+    return db.execute(APPROX_COUNT_SQL, {"table": model.__tablename__}).scalar()
+
+
+def _database_stats() -> dict:
+    last_24h = utc_hours_ago(24)
+    db = SessionLocal()
+    try:
+        row = db.execute(select(
+            _count(Station).label("stations"),
+            _count(AppUser).label("users"),
+            _count(Alert, Alert.is_active == True).label("alerts"),
+            _count(AirQualityReading, AirQualityReading.datetime >= last_24h).label("readings_24h"),
+        )).mappings().one()
+        return dict(row)
+    finally:
+        db.close()
+
+
 @router.get("/health")
-def system_health(db: Session = Depends(get_db)):
+async def system_health():
     """
     Comprehensive system health check
     Returns status of all components
     """
-    from sqlalchemy import text
+    now = time.monotonic()
+    if _health_cache["value"] is not None and now - _health_cache["ts"] < HEALTH_CACHE_TTL:
+        return _health_cache["value"]
     
     health = {
         "timestamp": datetime.utcnow().isoformat(),
@@ -38,24 +113,28 @@ def system_health(db: Session = Depends(get_db)):
         "components": {}
     }
     
+    # Probe PostgreSQL, MongoDB and the database statistics concurrently
+    # (sync SQLAlchemy calls run in threads, off the event loop)
+    pg_result, mongo_result, stats_result = await asyncio.gather(
+        asyncio.to_thread(_postgres_ping),
+        _mongo_ping(),
+        asyncio.to_thread(_database_stats),
+        return_exceptions=True
+    )
+    
     # Check PostgreSQL
-    try:
-        db.execute(text("SELECT 1"))
-        health["components"]["postgresql"] = {"status": "up", "message": "Connected"}
-    except Exception as e:
-        health["components"]["postgresql"] = {"status": "down", "error": str(e)}
+    if isinstance(pg_result, Exception):
+        health["components"]["postgresql"] = {"status": "down", "error": str(pg_result)}
         health["status"] = "degraded"
+    else:
+        health["components"]["postgresql"] = {"status": "up", "message": "Connected"}
     
     # Check MongoDB (from logs collection)
-    try:
-        from database.mongo_db import get_mongo_db
-        import asyncio
-        mongo_db = asyncio.run(get_mongo_db())
-        asyncio.run(mongo_db.command("ping"))
-        health["components"]["mongodb"] = {"status": "up", "message": "Connected"}
-    except Exception as e:
-        health["components"]["mongodb"] = {"status": "down", "error": str(e)}
+    if isinstance(mongo_result, Exception):
+        health["components"]["mongodb"] = {"status": "down", "error": str(mongo_result)}
         health["status"] = "degraded"
+    else:
+        health["components"]["mongodb"] = {"status": "up", "message": "Connected"}
     
     # Check scheduled jobs
     try:
@@ -68,19 +147,13 @@ def system_health(db: Session = Depends(get_db)):
         health["components"]["scheduler"] = {"status": "down", "error": str(e)}
     
     # Database statistics
-    try:
-        stats = {
-            "stations": db.query(Station).count(),
-            "users": db.query(AppUser).count(),
-            "alerts": db.query(Alert).filter(Alert.is_active == True).count(),
-            "readings_24h": db.query(AirQualityReading).filter(
-                AirQualityReading.datetime >= datetime.utcnow() - timedelta(hours=24)
-            ).count(),
-        }
-        health["database_stats"] = stats
-    except Exception as e:
-        health["database_stats"] = {"error": str(e)}
+    if isinstance(stats_result, Exception):
+        health["database_stats"] = {"error": str(stats_result)}
+    else:
+        health["database_stats"] = stats_result
     
+    _health_cache["ts"] = now
+    _health_cache["value"] = health
     return health
 
 
@@ -90,28 +163,34 @@ def system_statistics(db: Session = Depends(get_db)):
     System-wide statistics
     Total counts, recent activity, etc.
     """
-    from sqlalchemy import func
+    last_24h = utc_hours_ago(24)
+    
+    # All counts in a single round trip
+    counts = db.execute(select(
+        _count(Station).label("total_stations"),
+        _count(AppUser).label("total_users"),
+        _count(AppUser, AppUser.is_active == True).label("active_users"),
+        _count(Alert).label("total_alerts"),
+        _count(Alert, Alert.is_active == True).label("active_alerts"),
+        _count(Report).label("total_reports"),
+        _count(AirQualityReading, AirQualityReading.datetime >= last_24h).label("readings_24h"),
+        _count(Alert, Alert.triggered_at >= last_24h).label("alerts_triggered_24h"),
+    )).mappings().one()
     
-    # Count queries
     stats = {
-        "total_stations": db.query(Station).count(),
-        "total_users": db.query(AppUser).count(),
-        "active_users": db.query(AppUser).filter(AppUser.is_active == True).count(),
-        "total_alerts": db.query(Alert).count(),
-        "active_alerts": db.query(Alert).filter(Alert.is_active == True).count(),
-        "total_readings": db.query(AirQualityReading).count(),
-        "total_reports": db.query(Report).count(),
+        key: counts[key]
+        for key in (
+            "total_stations", "total_users", "active_users", "total_alerts",
+            "active_alerts", "total_reports",
+        )
     }
+    # Readings is the largest table: use the planner estimate, not COUNT(*)
+    stats["total_readings"] = _approx_count(db, AirQualityReading)
     
     # Recent activity
-    last_24h = datetime.utcnow() - timedelta(hours=24)
     stats["recent_activity"] = {
-        "readings_24h": db.query(AirQualityReading).filter(
-            AirQualityReading.datetime >= last_24h
-        ).count(),
-        "alerts_triggered_24h": db.query(Alert).filter(
-            Alert.triggered_at >= last_24h
-        ).count(),
+        "readings_24h": counts["readings_24h"],
+        "alerts_triggered_24h": counts["alerts_triggered_24h"],
     }
     
     # Storage statistics
@@ -151,8 +230,9 @@ async def run_job_manually(job_name: str):
 @router.get("/providers")
 def get_providers(db: Session = Depends(get_db)):
     """Get all data providers"""
-    providers = db.query(Provider).all()
-    return providers
+    return reference_cache.get_or_load(
+        "providers", lambda: jsonable_encoder(db.query(Provider).all())
+    )
 
 
 @router.post("/providers")
@@ -173,6 +253,7 @@ def create_provider(
     db.add(provider)
     db.commit()
     db.refresh(provider)
+    reference_cache.invalidate("providers")
     return provider
 
 
@@ -185,6 +266,7 @@ def delete_provider(provider_id: int, db: Session = Depends(get_db)):
     
     db.delete(provider)
     db.commit()
+    reference_cache.invalidate("providers")
     return {"message": "Provider deleted"}
 
 
@@ -196,10 +278,14 @@ def delete_provider(provider_id: int, db: Session = Depends(get_db)):
 def admin_get_stations(
     skip: int = 0,
     limit: int = 100,
+    after_id: Optional[int] = Query(None, description="Keyset cursor: id of the last station of the previous page"),
     db: Session = Depends(get_db)
 ):
     """Get all stations (admin view with more details)"""
-    stations = db.query(Station).offset(skip).limit(limit).all()
+    query = select(*columns_for(Station, StationResponse))
+    if after_id is not None:
+        query = query.where(Station.id > after_id)
+    stations = db.execute(query.order_by(Station.id).offset(skip).limit(limit)).all()
     return stations
 
 
@@ -210,6 +296,7 @@ def create_station(station: StationCreate, db: Session = Depends(get_db)):
     db.add(db_station)
     db.commit()
     db.refresh(db_station)
+    DataNormalizer.invalidate_caches()
     return db_station
 
 
@@ -229,6 +316,7 @@ def update_station(
     
     db.commit()
     db.refresh(db_station)
+    DataNormalizer.invalidate_caches()
     return db_station
 
 
@@ -241,6 +329,7 @@ def delete_station(station_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_station)
     db.commit()
+    DataNormalizer.invalidate_caches()
     return {"message": "Station deleted"}
 
 
@@ -254,17 +343,21 @@ def get_users(
     limit: int = 100,
     role_id: Optional[int] = None,
     is_active: Optional[bool] = None,
+    after_id: Optional[int] = Query(None, description="Keyset cursor: id of the last user of the previous page"),
     db: Session = Depends(get_db)
 ):
     """Get all users with optional filters"""
-    query = db.query(AppUser)
+    # Only the response columns (never password_hash), as plain rows
+    query = select(*columns_for(AppUser, UserResponse))
     
     if role_id:
-        query = query.filter(AppUser.role_id == role_id)
+        query = query.where(AppUser.role_id == role_id)
     if is_active is not None:
-        query = query.filter(AppUser.is_active == is_active)
+        query = query.where(AppUser.is_active == is_active)
+    if after_id is not None:
+        query = query.where(AppUser.id > after_id)
     
-    users = query.offset(skip).limit(limit).all()
+    users = db.execute(query.order_by(AppUser.id).offset(skip).limit(limit)).all()
     return users
 
 
@@ -315,83 +408,124 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
 @router.get("/roles")
 def get_roles(db: Session = Depends(get_db)):
     """Get all roles"""
-    roles = db.query(Role).all()
-    return roles
+    return reference_cache.get_or_load(
+        "roles", lambda: jsonable_encoder(db.query(Role).all())
+    )
 
 
 @router.get("/permissions")
 def get_permissions(db: Session = Depends(get_db)):
     """Get all permissions"""
-    permissions = db.query(Permission).all()
-    return permissions
+    return reference_cache.get_or_load(
+        "permissions", lambda: jsonable_encoder(db.query(Permission).all())
+    )
 
 
 # =====================================================
 # AUDIT LOGS (from MongoDB)
 # =====================================================
 
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+if ORJSON_AVAILABLE:
+    import orjson
+    
+    def _encode_log(doc: dict) -> bytes:
+        # orjson encodes datetimes natively (ISO 8601)
+        return orjson.dumps(doc, default=str)
+else:
+    def _encode_log(doc: dict) -> bytes:
+        return json.dumps(doc, default=_json_default).encode()
+
+
+async def _stream_logs(
+    collection,
+    query: dict,
+    skip: int,
+    limit: int,
+    after_id: Optional[str] = None
+) -> StreamingResponse:
+    """
+    Stream the newest log documents matching `query` as a JSON array
+    ObjectId is converted to string by MongoDB in the pipeline, and each
+    document is encoded as it arrives from the cursor instead of building
+    the whole list first.
+    after_id (the _id of the last document of the previous page) seeks past
+    that document in (timestamp, _id) DESC order instead of skipping
+    """
+    if after_id is not None:
+        if not ObjectId.is_valid(after_id):
+            raise HTTPException(status_code=400, detail="Invalid after_id")
+        anchor = await collection.find_one({"_id": ObjectId(after_id)}, {"timestamp": 1})
+        if anchor is None:
+            raise HTTPException(status_code=400, detail="Invalid after_id")
+        query = {
+            "$and": [query, {"$or": [
+                {"timestamp": {"$lt": anchor.get("timestamp")}},
+                {"timestamp": anchor.get("timestamp"), "_id": {"$lt": anchor["_id"]}},
+            ]}]
+        }
+    
+    pipeline = [{"$match": query}, {"$sort": {"timestamp": -1, "_id": -1}}]
+    if skip > 0:
+        pipeline.append({"$skip": skip})
+    if limit > 0:
+        pipeline.append({"$limit": limit})
+    pipeline.append({"$addFields": {"_id": {"$toString": "$_id"}}})
+    
+    async def body():
+        yield b"["
+        first = True
+        async for doc in collection.aggregate(pipeline):
+            yield (b"" if first else b",") + _encode_log(doc)
+            first = False
+        yield b"]"
+    
+    return StreamingResponse(body(), media_type="application/json")
+
+
 @router.get("/logs/api")
 async def get_api_logs(
     limit: int = 100,
-    skip: int = 0
+    skip: int = 0,
+    after_id: Optional[str] = None
 ):
     """Get API access logs from MongoDB"""
-    from database.mongo_db import get_api_logs_collection
-    
-    collection = get_api_logs_collection()
-    logs = await collection.find().sort("timestamp", -1).skip(skip).limit(limit).to_list(length=limit)
-    
-    # Convert ObjectId to string for JSON serialization
-    for log in logs:
-        log["_id"] = str(log["_id"])
-    
-    return logs
+    return await _stream_logs(get_api_logs_collection(), {}, skip, limit, after_id)
 
 
 @router.get("/logs/errors")
 async def get_error_logs(
     limit: int = 100,
     skip: int = 0,
-    severity: Optional[str] = None
+    severity: Optional[str] = None,
+    after_id: Optional[str] = None
 ):
     """Get error logs from MongoDB"""
-    from database.mongo_db import get_error_logs_collection
-    
-    collection = get_error_logs_collection()
-    
     query = {}
     if severity:
         query["severity"] = severity
     
-    logs = await collection.find(query).sort("timestamp", -1).skip(skip).limit(limit).to_list(length=limit)
-    
-    for log in logs:
-        log["_id"] = str(log["_id"])
-    
-    return logs
+    return await _stream_logs(get_error_logs_collection(), query, skip, limit, after_id)
 
 
 @router.get("/logs/ingestion")
 async def get_ingestion_logs(
     limit: int = 100,
     skip: int = 0,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    after_id: Optional[str] = None
 ):
     """Get data ingestion logs from MongoDB"""
-    from database.mongo_db import get_data_ingestion_logs_collection
-    
-    collection = get_data_ingestion_logs_collection()
-    
     query = {}
     if status:
         query["status"] = status
     
-    logs = await collection.find(query).sort("timestamp", -1).skip(skip).limit(limit).to_list(length=limit)
-    
-    for log in logs:
-        log["_id"] = str(log["_id"])
-    
-    return logs
+    return await _stream_logs(get_data_ingestion_logs_collection(), query, skip, limit, after_id)
 
 
 # =====================================================
@@ -410,14 +544,15 @@ def seed_historical_data(
     from jobs.seed_historical_data import seed_historical_data
     
     try:
-        seed_historical_data(days)
+        new_readings = seed_historical_data(days)
         
-        # Count new readings
-        total_readings = db.query(AirQualityReading).count()
+        # Approximate total (planner estimate) instead of a full COUNT(*)
+        total_readings = _approx_count(db, AirQualityReading)
         
         return {
             "status": "success",
             "message": f"Successfully generated {days} days of historical data",
+            "new_readings": new_readings,
             "total_readings": total_readings,
             "estimated_new_readings": days * 12 * 5 * 6  # days * readings_per_day * stations * pollutants
         }
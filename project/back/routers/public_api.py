@@ -3,20 +3,24 @@ Public REST API Router
 Serves citizen and researcher requests for air quality data
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime, timedelta
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.orm import Session, raiseload
+from typing import List, Optional, Tuple
+from datetime import datetime
 import os
 
-from database.postgres_db import get_db
+from database.postgres_db import get_db, columns_for, utc_hours_ago
 from models import Station, AirQualityReading, Alert, Recommendation, AirQualityDailyStats, Pollutant, Report
 from schemas import (
     StationResponse, ReadingResponse, AlertResponse, AlertCreate, AlertUpdate,
     RecommendationResponse, DailyStatsResponse, ReportCreate, ReportResponse
 )
-from services.report_generator import ReportGenerator
+from services.report_generator import generate_report_file
+from services.reference_cache import reference_cache, stats_cache
+from routers.responses import rows_response
 
 router = APIRouter(prefix="/api", tags=["public"])
 
@@ -37,7 +41,7 @@ def get_stations(
     Get list of monitoring stations
     Optionally filter by city or country
     """
-    query = db.query(Station)
+    query = db.query(Station).options(raiseload("*"))
     
     if city:
         query = query.filter(Station.city.ilike(f"%{city}%"))
@@ -67,6 +71,7 @@ def get_current_readings(
     city: Optional[str] = None,
     pollutant_id: Optional[int] = None,
     limit: int = 100,
+    after_id: Optional[int] = Query(None, description="Keyset cursor: id of the last row of the previous page"),
     db: Session = Depends(get_db)
 ):
     """
@@ -74,52 +79,83 @@ def get_current_readings(
     Can filter by station, city, or pollutant
     """
     # Get readings from last 24 hours
-    since = datetime.utcnow() - timedelta(hours=24)
+    since = utc_hours_ago(24)
     
-    query = db.query(AirQualityReading).filter(
+    # Plain row mappings with only the ReadingResponse columns (no raw_json)
+    query = select(*columns_for(AirQualityReading, ReadingResponse)).where(
         AirQualityReading.datetime >= since
     )
     
     if station_id:
-        query = query.filter(AirQualityReading.station_id == station_id)
+        query = query.where(AirQualityReading.station_id == station_id)
     
     if pollutant_id:
-        query = query.filter(AirQualityReading.pollutant_id == pollutant_id)
+        query = query.where(AirQualityReading.pollutant_id == pollutant_id)
     
     if city:
-        query = query.join(Station).filter(Station.city.ilike(f"%{city}%"))
+        query = query.join(Station, Station.id == AirQualityReading.station_id).where(
+            Station.city.ilike(f"%{city}%")
+        )
+    
+    if after_id is not None:
+        # Seek past the cursor row in (datetime, id) DESC order instead of OFFSET;
+        # the datetime bound keeps the anchor lookup on the recent partitions
+        anchor = db.query(AirQualityReading.datetime).filter(
+            AirQualityReading.id == after_id,
+            AirQualityReading.datetime >= since
+        ).scalar()
+        if anchor is None:
+            raise HTTPException(status_code=400, detail="Invalid after_id")
+        query = query.where(
+            tuple_(AirQualityReading.datetime, AirQualityReading.id) < tuple_(anchor, after_id)
+        )
     
-    readings = query.order_by(AirQualityReading.datetime.desc()).limit(limit).all()
+    readings = db.execute(
+        query.order_by(
+            AirQualityReading.datetime.desc(),
+            AirQualityReading.id.desc()
+        ).limit(limit)
+    ).mappings().all()
     
-    return readings
+    return rows_response(readings)
+
+
+def _historical_range(start_date: datetime, end_date: datetime) -> Tuple[datetime, datetime]:
+    """
+    Validate the raw-readings date range
+    Declared before get_db so rejected requests never create a session
+    """
+    if (end_date - start_date).days > 90:
+        raise HTTPException(
+            status_code=400, 
+            detail="Date range too large. Maximum 90 days for raw readings. Use daily stats for longer periods."
+        )
+    return start_date, end_date
 
 
 @router.get("/readings/historical")
 def get_historical_readings(
     station_id: int,
     pollutant_id: int,
-    start_date: datetime,
-    end_date: datetime,
+    date_range: Tuple[datetime, datetime] = Depends(_historical_range),
     db: Session = Depends(get_db)
 ):
     """
     Get historical readings for a specific station and pollutant
     Date range required
     """
-    if (end_date - start_date).days > 90:
-        raise HTTPException(
-            status_code=400, 
-            detail="Date range too large. Maximum 90 days for raw readings. Use daily stats for longer periods."
-        )
+    start_date, end_date = date_range
     
-    readings = db.query(AirQualityReading).filter(
-        AirQualityReading.station_id == station_id,
-        AirQualityReading.pollutant_id == pollutant_id,
-        AirQualityReading.datetime >= start_date,
-        AirQualityReading.datetime <= end_date
-    ).order_by(AirQualityReading.datetime.asc()).all()
+    readings = db.execute(
+        select(*columns_for(AirQualityReading, ReadingResponse)).where(
+            AirQualityReading.station_id == station_id,
+            AirQualityReading.pollutant_id == pollutant_id,
+            AirQualityReading.datetime >= start_date,
+            AirQualityReading.datetime <= end_date
+        ).order_by(AirQualityReading.datetime.asc())
+    ).mappings().all()
     
-    return readings
+    return rows_response(readings)
 
 
 @router.get("/readings/latest/{station_id}")
@@ -131,26 +167,36 @@ def get_latest_by_station(
     Get latest reading for each pollutant at a specific station
     Useful for dashboard "current conditions" displays
     """
-    # Subquery to get latest reading per pollutant
-    from sqlalchemy import func
-    
-    latest_readings = []
-    pollutants = db.query(Pollutant).all()
-    
-    for pollutant in pollutants:
-        reading = db.query(AirQualityReading).filter(
-            AirQualityReading.station_id == station_id,
-            AirQualityReading.pollutant_id == pollutant.id
-        ).order_by(AirQualityReading.datetime.desc()).first()
-        
-        if reading:
-            latest_readings.append({
-                "pollutant": pollutant.name,
-                "value": reading.value,
-                "aqi": reading.aqi,
-                "datetime": reading.datetime,
-                "unit": pollutant.unit
-            })
+    # Latest reading per pollutant in one query: DISTINCT ON keeps the first
+    # row of each pollutant_id, i.e. the newest one (served by the
+    # (station_id, pollutant_id, datetime) index)
+    rows = db.execute(
+        select(
+            Pollutant.name,
+            Pollutant.unit,
+            AirQualityReading.value,
+            AirQualityReading.aqi,
+            AirQualityReading.datetime
+        ).select_from(AirQualityReading).join(
+            Pollutant, Pollutant.id == AirQualityReading.pollutant_id
+        ).where(
+            AirQualityReading.station_id == station_id
+        ).order_by(
+            AirQualityReading.pollutant_id,
+            AirQualityReading.datetime.desc()
+        ).distinct(AirQualityReading.pollutant_id)
+    ).all()
+    
+    latest_readings = [
+        {
+            "pollutant": row.name,
+            "value": row.value,
+            "aqi": row.aqi,
+            "datetime": row.datetime,
+            "unit": row.unit
+        }
+        for row in rows
+    ]
     
     return latest_readings
 
@@ -159,60 +205,98 @@ def get_latest_by_station(
 # DAILY STATISTICS
 # =====================================================
 
-@router.get("/stats/daily", response_model=List[DailyStatsResponse])
+# Hot list endpoints: rows are selected with exactly the schema's columns and
+# returned as-is (rows_response), so the schema is only documented through
+# `responses` instead of re-validating every row with response_model
+@router.get("/stats/daily", responses={200: {"model": List[DailyStatsResponse]}})
 def get_daily_stats(
     station_id: int,
     pollutant_id: Optional[int] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     limit: int = 365,
+    after_id: Optional[int] = Query(None, description="Keyset cursor: id of the last row of the previous page"),
     db: Session = Depends(get_db)
 ):
     """
     Get pre-aggregated daily statistics
     More efficient than querying raw readings for trends
+    Cached per query until the TTL expires or the aggregation job runs
     """
-    from datetime import date
-    
-    query = db.query(AirQualityDailyStats).filter(
+    key = f"daily_stats:{station_id}:{pollutant_id}:{start_date}:{end_date}:{limit}:{after_id}"
+    stats = stats_cache.get_or_load(
+        key,
+        lambda: _load_daily_stats(db, station_id, pollutant_id, start_date, end_date, limit, after_id)
+    )
+    return rows_response(stats)
+
+
+def _load_daily_stats(
+    db: Session,
+    station_id: int,
+    pollutant_id: Optional[int],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    limit: int,
+    after_id: Optional[int]
+) -> List[dict]:
+    query = select(*columns_for(AirQualityDailyStats, DailyStatsResponse)).where(
         AirQualityDailyStats.station_id == station_id
     )
     
     if pollutant_id:
-        query = query.filter(AirQualityDailyStats.pollutant_id == pollutant_id)
+        query = query.where(AirQualityDailyStats.pollutant_id == pollutant_id)
     
     if start_date:
-        query = query.filter(AirQualityDailyStats.date >= start_date)
+        query = query.where(AirQualityDailyStats.date >= start_date)
     
     if end_date:
-        query = query.filter(AirQualityDailyStats.date <= end_date)
+        query = query.where(AirQualityDailyStats.date <= end_date)
+    
+    if after_id is not None:
+        # Seek past the cursor row in (date, id) DESC order instead of OFFSET
+        anchor = db.query(AirQualityDailyStats.date).filter(AirQualityDailyStats.id == after_id).scalar()
+        if anchor is None:
+            raise HTTPException(status_code=400, detail="Invalid after_id")
+        query = query.where(
+            tuple_(AirQualityDailyStats.date, AirQualityDailyStats.id) < tuple_(anchor, after_id)
+        )
     
-    stats = query.order_by(AirQualityDailyStats.date.desc()).limit(limit).all()
+    stats = db.execute(query.order_by(
+        AirQualityDailyStats.date.desc(),
+        AirQualityDailyStats.id.desc()
+    ).limit(limit)).mappings().all()
     
-    return stats
+    return [dict(row) for row in stats]
 
 
 # =====================================================
 # ALERTS (User-specific, requires authentication)
 # =====================================================
 
-@router.get("/alerts", response_model=List[AlertResponse])
+@router.get("/alerts", responses={200: {"model": List[AlertResponse]}})
 def get_user_alerts(
     user_id: int = Query(..., description="User ID (from auth token)"),
     is_active: Optional[bool] = None,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = Query(None, description="Keyset cursor: id of the last row of the previous page"),
     db: Session = Depends(get_db)
 ):
     """
     Get user's configured alerts
+    All of them unless limit is given; page with after_id
     TODO: Extract user_id from JWT token instead of query param
     """
-    query = db.query(Alert).filter(Alert.user_id == user_id)
+    query = select(*columns_for(Alert, AlertResponse)).where(Alert.user_id == user_id)
     
     if is_active is not None:
-        query = query.filter(Alert.is_active == is_active)
+        query = query.where(Alert.is_active == is_active)
+    
+    if after_id is not None:
+        query = query.where(Alert.id > after_id)
     
-    alerts = query.all()
-    return alerts
+    alerts = db.execute(query.order_by(Alert.id).limit(limit)).mappings().all()
+    return rows_response(alerts)
 
 
 @router.post("/alerts", response_model=AlertResponse, status_code=201)
@@ -234,6 +318,51 @@ def create_alert(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/alerts/bulk", responses={201: {"model": List[AlertResponse]}}, status_code=201)
+def create_alerts_bulk(
+    alerts: List[AlertCreate],
+    user_id: int = Query(..., description="User ID (from auth token)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Create several alerts for the user in one transaction
+    Single multi-row INSERT ... RETURNING, no per-alert refresh
+    """
+    if not alerts:
+        return rows_response([])
+    
+    try:
+        created = db.execute(
+            insert(Alert).returning(*columns_for(Alert, AlertResponse)),
+            [{**alert.model_dump(), "user_id": user_id} for alert in alerts]
+        ).mappings().all()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    response = rows_response(created)
+    response.status_code = 201
+    return response
+
+
+@router.post("/alerts/deactivate")
+def deactivate_alerts(
+    user_id: int = Query(..., description="User ID (from auth token)"),
+    station_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Deactivate all active alerts of the user (optionally for one station) in a single UPDATE"""
+    query = update(Alert).where(Alert.user_id == user_id, Alert.is_active.is_(True))
+    
+    if station_id:
+        query = query.where(Alert.station_id == station_id)
+    
+    result = db.execute(query.values(is_active=False))
+    db.commit()
+    return {"deactivated": result.rowcount}
+
+
 @router.patch("/alerts/{alert_id}", response_model=AlertResponse)
 def update_alert(
     alert_id: int,
@@ -283,27 +412,43 @@ def delete_alert(
 # RECOMMENDATIONS
 # =====================================================
 
-@router.get("/recommendations", response_model=List[RecommendationResponse])
+@router.get("/recommendations", responses={200: {"model": List[RecommendationResponse]}})
 def get_recommendations(
     user_id: int = Query(..., description="User ID (from auth token)"),
     station_id: Optional[int] = None,
     limit: int = 50,
+    after_id: Optional[int] = Query(None, description="Keyset cursor: id of the last row of the previous page"),
     db: Session = Depends(get_db)
 ):
     """
     Get personalized health recommendations
     Based on recent air quality conditions
     """
-    query = db.query(Recommendation).filter(Recommendation.user_id == user_id)
+    query = select(*columns_for(Recommendation, RecommendationResponse)).where(
+        Recommendation.user_id == user_id
+    )
     
     if station_id:
-        query = query.filter(Recommendation.station_id == station_id)
+        query = query.where(Recommendation.station_id == station_id)
+    
+    if after_id is not None:
+        # Seek past the cursor row in (created_at, id) DESC order instead of OFFSET
+        anchor = db.query(Recommendation.created_at).filter(
+            Recommendation.id == after_id,
+            Recommendation.user_id == user_id
+        ).scalar()
+        if anchor is None:
+            raise HTTPException(status_code=400, detail="Invalid after_id")
+        query = query.where(
+            tuple_(Recommendation.created_at, Recommendation.id) < tuple_(anchor, after_id)
+        )
     
-    recommendations = query.order_by(
-        Recommendation.created_at.desc()
-    ).limit(limit).all()
+    recommendations = db.execute(query.order_by(
+        Recommendation.created_at.desc(),
+        Recommendation.id.desc()
+    ).limit(limit)).mappings().all()
     
-    return recommendations
+    return rows_response(recommendations)
 
 
 # =====================================================
@@ -313,8 +458,9 @@ def get_recommendations(
 @router.get("/pollutants")
 def get_pollutants(db: Session = Depends(get_db)):
     """Get list of all monitored pollutants"""
-    pollutants = db.query(Pollutant).all()
-    return pollutants
+    return reference_cache.get_or_load(
+        "pollutants", lambda: jsonable_encoder(db.query(Pollutant).all())
+    )
 
 
 # =====================================================
@@ -326,32 +472,54 @@ def get_reports(
     user_id: int = Query(..., description="User ID (from auth token)"),
     skip: int = 0,
     limit: int = 50,
+    after_id: Optional[int] = Query(None, description="Keyset cursor: id of the last report of the previous page"),
     db: Session = Depends(get_db)
 ):
-    """Get list of reports for a user"""
-    reports = db.query(Report).filter(
+    """
+    Get list of reports for a user, newest first
+    Pass the last report's id as after_id to fetch the next page without OFFSET
+    """
+    query = db.query(Report).options(raiseload("*")).filter(
         Report.user_id == user_id
-    ).order_by(
-        Report.created_at.desc()
+    )
+    
+    if after_id is not None:
+        anchor = db.query(Report.created_at).filter(
+            Report.id == after_id,
+            Report.user_id == user_id
+        ).scalar()
+        if anchor is None:
+            raise HTTPException(status_code=400, detail="Invalid after_id")
+        query = query.filter(tuple_(Report.created_at, Report.id) < tuple_(anchor, after_id))
+    
+    reports = query.order_by(
+        Report.created_at.desc(),
+        Report.id.desc()
     ).offset(skip).limit(limit).all()
     
     return reports
 
 
-@router.post("/reports", response_model=ReportResponse)
+@router.post("/reports", response_model=ReportResponse, status_code=202)
 def create_report(
     report: ReportCreate,
+    background_tasks: BackgroundTasks,
     user_id: int = Query(..., description="User ID (from auth token)"),
     db: Session = Depends(get_db)
 ):
     """
-    Create and generate a new report
-    Supports PDF and CSV formats
+    Create a new report and generate its file in the background
+    Supports PDF (CSV not yet implemented). The report is returned right away
+    with generated_at = None; the download endpoint answers 409 until ready
     """
     # Validate dates
     if report.end_date < report.start_date:
         raise HTTPException(status_code=400, detail="End date must be after start date")
     
+    if report.file_format.upper() != "PDF":
+        # CSV generation can be added later
+        raise HTTPException(status_code=501, detail="CSV format not yet implemented")
+    
     # Create report record
     db_report = Report(
         user_id=user_id,
@@ -366,22 +534,8 @@ def create_report(
     db.commit()
     db.refresh(db_report)
     
-    # Generate report file
-    try:
-        if report.file_format.upper() == "PDF":
-            generator = ReportGenerator(db)
-            file_path = generator.generate_pdf_report(db_report, user_id)
-            db_report.file_path = file_path
-            db_report.generated_at = datetime.now()
-            db.commit()
-            db.refresh(db_report)
-        else:
-            # CSV generation can be added later
-            raise HTTPException(status_code=501, detail="CSV format not yet implemented")
-    except Exception as e:
-        db.delete(db_report)
-        db.commit()
-        raise HTTPException(status_code=500, detail=f"Report generation failed: {str(e)}")
+    # Generate report file after the response is sent (own DB session)
+    background_tasks.add_task(generate_report_file, db_report.id, user_id)
     
     return db_report
 
@@ -401,6 +555,9 @@ def download_report(
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
+    if report.generated_at is None:
+        raise HTTPException(status_code=409, detail="Report is still being generated")
+    
     if not report.file_path or not os.path.exists(report.file_path):
         raise HTTPException(status_code=404, detail="Report file not found")
     
@@ -0,0 +1,26 @@
+"""
+Response helpers shared by the API routers
+"""
+
+from typing import Any, Iterable, Mapping
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+
+try:
+    import orjson  # noqa: F401
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def rows_response(rows: Iterable[Mapping[str, Any]]) -> Response:
+    """
+    Serialize plain rows (dicts / SQLAlchemy row mappings) straight to JSON,
+    skipping FastAPI's per-value jsonable_encoder pass when orjson is
+    available (it encodes datetimes and nested dicts natively)
+    """
+    content = [dict(row) for row in rows]
+    if ORJSON_AVAILABLE:
+        return ORJSONResponse(content)
+    return JSONResponse(jsonable_encoder(content))
@@ -174,6 +174,7 @@ class DailyStatsResponse(BaseModel):
     avg_aqi: Optional[int]
     max_aqi: Optional[int]
     min_aqi: Optional[int]
+    p95_value: Optional[float] = None
     readings_count: Optional[int]
     
     class Config:
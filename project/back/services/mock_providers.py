@@ -6,8 +6,111 @@ These mocks simulate external API responses for development/testing
 """
 
 import random
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Batched float draws: one vectorized call per provider batch instead of
+# one random.uniform call per value
+_RNG = np.random.default_rng()
+
+# (pollutant code, low, high) of the synthetic concentrations per provider
+_AQICN_IAQI_RANGES = (
+    ("pm25", 10, 150),
+    ("pm10", 20, 200),
+    ("o3", 10, 100),
+    ("no2", 5, 80),
+    ("so2", 2, 40),
+    ("co", 0.3, 2.5),
+)
+_GOOGLE_CONCENTRATION_RANGES = (
+    ("pm25", 10, 100),
+    ("pm10", 20, 150),
+    ("o3", 20, 120),
+    ("no2", 10, 80),
+)
+
+
+def _draw_uniform(ranges: Sequence[Tuple[str, float, float]], n: int) -> List[List[float]]:
+    """Draw n rows of uniform samples, one column per (code, low, high) range"""
+    lows = [low for _, low, _ in ranges]
+    highs = [high for _, _, high in ranges]
+    return _RNG.uniform(lows, highs, size=(n, len(ranges))).tolist()
+
+
+# Google AQI bands: upper bound of each band, then parallel lookup tables
+# (last entry = above the highest bound). Color dicts are shared, not copied.
+_AQI_THRESHOLDS = (50, 100, 150, 200, 300)
+_AQI_DISPLAY = (
+    "Good",
+    "Moderate",
+    "Unhealthy for Sensitive Groups",
+    "Unhealthy",
+    "Very Unhealthy",
+    "Hazardous",
+)
+_AQI_COLOR = (
+    {"red": 0, "green": 228 / 255, "blue": 0},
+    {"red": 1.0, "green": 1.0, "blue": 0},
+    {"red": 1.0, "green": 126 / 255, "blue": 0},
+    {"red": 1.0, "green": 0, "blue": 0},
+    {"red": 143 / 255, "green": 63 / 255, "blue": 151 / 255},
+    {"red": 126 / 255, "green": 0, "blue": 35 / 255},
+)
+_AQI_CATEGORY = (
+    "Excellent air quality",
+    "Acceptable air quality",
+    "Air quality adequate for most people",
+    "Air quality may begin to affect everyone",
+    "Health warnings of emergency conditions",
+    "Health alert: everyone may experience serious effects",
+)
+
+# City lookup tables shared by all mock instances (keys are lowercase)
+_AQICN_COORDS = {  # (lat, lon)
+    "bogota": (4.6097, -74.0817),
+    "medellin": (6.2442, -75.5812),
+    "cali": (3.4516, -76.5320),
+    "barranquilla": (10.9639, -74.7964),
+    "cartagena": (10.3910, -75.4794),
+}
+_AQICN_DEFAULT_COORDS = (4.0, -74.0)
+
+_IQAIR_STATES = {
+    "bogota": "Bogotá D.C.",
+    "medellin": "Antioquia",
+    "cali": "Valle del Cauca",
+    "barranquilla": "Atlántico",
+    "cartagena": "Bolívar",
+}
+_IQAIR_COORDS = {  # GeoJSON order: (lon, lat)
+    city: (lon, lat) for city, (lat, lon) in _AQICN_COORDS.items()
+}
+_IQAIR_DEFAULT_COORDS = (-74.0, 4.0)
+
+# IQAir main pollutant candidates per US AQI band: < 50, < 100, >= 100
+# (PM2.5 is typically the worst at high AQI)
+_MAIN_POLLUTANT_THRESHOLDS = (50, 100)
+_MAIN_POLLUTANT_CHOICES = (
+    ("pm25", "pm10", "o3"),
+    ("pm25", "pm10"),
+    ("pm25",),
+)
+
+# Constant parts of the Google payload, shared by every response
+# (consumers only read them)
+_GOOGLE_HEALTH_RECOMMENDATIONS = {
+    "generalPopulation": "Enjoy outdoor activities.",
+    "elderly": "Consider reducing prolonged outdoor exertion.",
+    "children": "Children can play outside.",
+    "athletes": "No restrictions on training outdoors.",
+}
+_GOOGLE_PM25_ADDITIONAL_INFO = {
+    "sources": "Main sources: vehicle emissions, wood burning",
+    "effects": "Penetrates deep into lungs and bloodstream",
+}
 
 
 class AQICNMockService:
@@ -17,11 +120,21 @@ class AQICNMockService:
         self.base_url = "https://api.waqi.info/feed/"
         self.cities = ["bogota", "medellin", "cali", "barranquilla", "cartagena"]
         
-    def get_station_data(self, city: str) -> Dict[str, Any]:
+    def get_station_data(
+        self,
+        city: str,
+        iaqi: Optional[List[float]] = None,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
         """
         Simulate AQICN API response for a city
         Returns mock air quality data
+        iaqi: pre-drawn concentrations in _AQICN_IAQI_RANGES order
+        now: shared timestamp of the batch (defaults to utcnow)
         """
+        now = now or datetime.utcnow()
+        if iaqi is None:
+            iaqi = _draw_uniform(_AQICN_IAQI_RANGES, 1)[0]
         return {
             "status": "ok",
             "data": {
@@ -32,34 +145,28 @@ class AQICNMockService:
                     "geo": self._get_mock_coordinates(city),
                 },
                 "time": {
-                    "s": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+                    "s": now.strftime("%Y-%m-%d %H:%M:%S"),
                     "tz": "-05:00",
                 },
                 "iaqi": {
-                    "pm25": {"v": random.uniform(10, 150)},
-                    "pm10": {"v": random.uniform(20, 200)},
-                    "o3": {"v": random.uniform(10, 100)},
-                    "no2": {"v": random.uniform(5, 80)},
-                    "so2": {"v": random.uniform(2, 40)},
-                    "co": {"v": random.uniform(0.3, 2.5)},
+                    code: {"v": value}
+                    for (code, _, _), value in zip(_AQICN_IAQI_RANGES, iaqi)
                 }
             }
         }
     
-    def get_all_stations(self) -> List[Dict[str, Any]]:
+    def get_all_stations(self, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
         """Get mock data for all cities"""
-        return [self.get_station_data(city) for city in self.cities]
+        now = now or datetime.utcnow()
+        samples = _draw_uniform(_AQICN_IAQI_RANGES, len(self.cities))
+        return [
+            self.get_station_data(city, iaqi, now)
+            for city, iaqi in zip(self.cities, samples)
+        ]
     
-    def _get_mock_coordinates(self, city: str) -> List[float]:
+    def _get_mock_coordinates(self, city: str) -> Tuple[float, float]:
         """Return mock coordinates for Colombian cities"""
-        coords = {
-            "bogota": [4.6097, -74.0817],
-            "medellin": [6.2442, -75.5812],
-            "cali": [3.4516, -76.5320],
-            "barranquilla": [10.9639, -74.7964],
-            "cartagena": [10.3910, -75.4794],
-        }
-        return coords.get(city.lower(), [4.0, -74.0])
+        return _AQICN_COORDS.get(city.lower(), _AQICN_DEFAULT_COORDS)
 
 
 class GoogleAirQualityMockService:
@@ -68,21 +175,35 @@ class GoogleAirQualityMockService:
     def __init__(self):
         self.base_url = "https://airquality.googleapis.com/v1/"
         
-    def get_current_conditions(self, latitude: float, longitude: float) -> Dict[str, Any]:
+    def get_current_conditions(
+        self,
+        latitude: float,
+        longitude: float,
+        concentrations: Optional[List[float]] = None,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
         """
         Simulate Google Air Quality API response
+        concentrations: pre-drawn values in _GOOGLE_CONCENTRATION_RANGES order
+        now: shared timestamp of the batch (defaults to utcnow)
         """
+        now = now or datetime.utcnow()
+        if concentrations is None:
+            concentrations = _draw_uniform(_GOOGLE_CONCENTRATION_RANGES, 1)[0]
+        pm25, pm10, o3, no2 = concentrations
+        aqi = random.randint(20, 150)
+        display, color, category = self._band(aqi)
         return {
-            "dateTime": datetime.utcnow().isoformat() + "Z",
+            "dateTime": now.isoformat() + "Z",
             "regionCode": "CO",
             "indexes": [
                 {
                     "code": "uaqi",
                     "displayName": "Universal AQI",
-                    "aqi": random.randint(20, 150),
-                    "aqiDisplay": self._get_aqi_display(random.randint(20, 150)),
-                    "color": self._get_aqi_color(random.randint(20, 150)),
-                    "category": self._get_aqi_category(random.randint(20, 150)),
+                    "aqi": aqi,
+                    "aqiDisplay": display,
+                    "color": color,
+                    "category": category,
                 }
             ],
             "pollutants": [
@@ -90,68 +211,48 @@ class GoogleAirQualityMockService:
                     "code": "pm25",
                     "displayName": "PM2.5",
                     "fullName": "Fine particulate matter (<2.5µm)",
-                    "concentration": {"value": random.uniform(10, 100), "units": "MICROGRAMS_PER_CUBIC_METER"},
-                    "additionalInfo": {
-                        "sources": "Main sources: vehicle emissions, wood burning",
-                        "effects": "Penetrates deep into lungs and bloodstream",
-                    }
+                    "concentration": {"value": pm25, "units": "MICROGRAMS_PER_CUBIC_METER"},
+                    "additionalInfo": _GOOGLE_PM25_ADDITIONAL_INFO,
                 },
                 {
                     "code": "pm10",
                     "displayName": "PM10",
-                    "concentration": {"value": random.uniform(20, 150), "units": "MICROGRAMS_PER_CUBIC_METER"},
+                    "concentration": {"value": pm10, "units": "MICROGRAMS_PER_CUBIC_METER"},
                 },
                 {
                     "code": "o3",
                     "displayName": "Ozone",
-                    "concentration": {"value": random.uniform(20, 120), "units": "PARTS_PER_BILLION"},
+                    "concentration": {"value": o3, "units": "PARTS_PER_BILLION"},
                 },
                 {
                     "code": "no2",
                     "displayName": "Nitrogen dioxide",
-                    "concentration": {"value": random.uniform(10, 80), "units": "PARTS_PER_BILLION"},
+                    "concentration": {"value": no2, "units": "PARTS_PER_BILLION"},
                 }
             ],
-            "healthRecommendations": {
-                "generalPopulation": self._get_health_recommendation("general"),
-                "elderly": self._get_health_recommendation("elderly"),
-                "children": self._get_health_recommendation("children"),
-                "athletes": self._get_health_recommendation("athletes"),
-            }
+            "healthRecommendations": _GOOGLE_HEALTH_RECOMMENDATIONS,
         }
     
-    def _get_aqi_display(self, aqi: int) -> str:
-        if aqi <= 50: return "Good"
-        elif aqi <= 100: return "Moderate"
-        elif aqi <= 150: return "Unhealthy for Sensitive Groups"
-        elif aqi <= 200: return "Unhealthy"
-        elif aqi <= 300: return "Very Unhealthy"
-        else: return "Hazardous"
-    
-    def _get_aqi_color(self, aqi: int) -> Dict[str, float]:
-        if aqi <= 50: return {"red": 0, "green": 228/255, "blue": 0}
-        elif aqi <= 100: return {"red": 255/255, "green": 255/255, "blue": 0}
-        elif aqi <= 150: return {"red": 255/255, "green": 126/255, "blue": 0}
-        elif aqi <= 200: return {"red": 255/255, "green": 0, "blue": 0}
-        elif aqi <= 300: return {"red": 143/255, "green": 63/255, "blue": 151/255}
-        else: return {"red": 126/255, "green": 0, "blue": 35/255}
-    
-    def _get_aqi_category(self, aqi: int) -> str:
-        if aqi <= 50: return "Excellent air quality"
-        elif aqi <= 100: return "Acceptable air quality"
-        elif aqi <= 150: return "Air quality adequate for most people"
-        elif aqi <= 200: return "Air quality may begin to affect everyone"
-        elif aqi <= 300: return "Health warnings of emergency conditions"
-        else: return "Health alert: everyone may experience serious effects"
+    def get_conditions_batch(
+        self,
+        locations: Sequence[Tuple[float, float]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Simulate responses for several (lat, lon) points with a single batched draw
+        Each response keeps its own timestamp: the payload carries no location,
+        so the normalizer maps every record to the same station and a shared
+        timestamp would make them duplicate (station, pollutant, datetime) keys
+        """
+        samples = _draw_uniform(_GOOGLE_CONCENTRATION_RANGES, len(locations))
+        return [
+            self.get_current_conditions(lat, lon, concentrations)
+            for (lat, lon), concentrations in zip(locations, samples)
+        ]
     
-    def _get_health_recommendation(self, group: str) -> str:
-        recommendations = {
-            "general": "Enjoy outdoor activities.",
-            "elderly": "Consider reducing prolonged outdoor exertion.",
-            "children": "Children can play outside.",
-            "athletes": "No restrictions on training outdoors.",
-        }
-        return recommendations.get(group, "No specific recommendations.")
+    def _band(self, aqi: int) -> Tuple[str, Dict[str, float], str]:
+        """Return (display name, color, category) of the AQI band"""
+        band = bisect_left(_AQI_THRESHOLDS, aqi)
+        return _AQI_DISPLAY[band], _AQI_COLOR[band], _AQI_CATEGORY[band]
 
 
 class IQAirMockService:
@@ -160,10 +261,17 @@ class IQAirMockService:
     def __init__(self):
         self.base_url = "https://api.airvisual.com/v2/"
         
-    def get_city_data(self, city: str, country: str = "Colombia") -> Dict[str, Any]:
+    def get_city_data(
+        self,
+        city: str,
+        country: str = "Colombia",
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
         """
         Simulate IQAir API response for a city
+        now: shared timestamp of the batch (defaults to utcnow)
         """
+        ts = (now or datetime.utcnow()).isoformat() + "Z"
         aqi = random.randint(20, 180)
         return {
             "status": "success",
@@ -177,7 +285,7 @@ class IQAirMockService:
                 },
                 "current": {
                     "weather": {
-                        "ts": datetime.utcnow().isoformat() + "Z",
+                        "ts": ts,
                         "tp": random.randint(18, 32),  # Temperature
                         "pr": random.randint(1010, 1020),  # Pressure
                         "hu": random.randint(40, 90),  # Humidity
@@ -185,7 +293,7 @@ class IQAirMockService:
                         "wd": random.randint(0, 360),  # Wind direction
                     },
                     "pollution": {
-                        "ts": datetime.utcnow().isoformat() + "Z",
+                        "ts": ts,
                         "aqius": aqi,  # US AQI
                         "mainus": self._get_main_pollutant(aqi),
                         "aqicn": int(aqi * 0.9),  # China AQI
@@ -195,7 +303,12 @@ class IQAirMockService:
             }
         }
     
-    def get_nearest_station(self, latitude: float, longitude: float) -> Dict[str, Any]:
+    def get_nearest_station(
+        self,
+        latitude: float,
+        longitude: float,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
         """Get nearest station data by coordinates"""
         return {
             "status": "success",
@@ -209,7 +322,7 @@ class IQAirMockService:
                 },
                 "current": {
                     "pollution": {
-                        "ts": datetime.utcnow().isoformat() + "Z",
+                        "ts": (now or datetime.utcnow()).isoformat() + "Z",
                         "aqius": random.randint(20, 150),
                         "mainus": "pm25",
                     }
@@ -218,32 +331,13 @@ class IQAirMockService:
         }
     
     def _get_state(self, city: str) -> str:
-        states = {
-            "bogota": "Bogotá D.C.",
-            "medellin": "Antioquia",
-            "cali": "Valle del Cauca",
-            "barranquilla": "Atlántico",
-            "cartagena": "Bolívar",
-        }
-        return states.get(city.lower(), "Unknown")
+        return _IQAIR_STATES.get(city.lower(), "Unknown")
     
-    def _get_coordinates(self, city: str) -> List[float]:
-        coords = {
-            "bogota": [-74.0817, 4.6097],
-            "medellin": [-75.5812, 6.2442],
-            "cali": [-76.5320, 3.4516],
-            "barranquilla": [-74.7964, 10.9639],
-            "cartagena": [-75.4794, 10.3910],
-        }
-        return coords.get(city.lower(), [-74.0, 4.0])
+    def _get_coordinates(self, city: str) -> Tuple[float, float]:
+        return _IQAIR_COORDS.get(city.lower(), _IQAIR_DEFAULT_COORDS)
     
     def _get_main_pollutant(self, aqi: int) -> str:
-        if aqi < 50:
-            return random.choice(["pm25", "pm10", "o3"])
-        elif aqi < 100:
-            return random.choice(["pm25", "pm10"])
-        else:
-            return "pm25"  # PM2.5 is typically the worst at high AQI
+        return random.choice(_MAIN_POLLUTANT_CHOICES[bisect_right(_MAIN_POLLUTANT_THRESHOLDS, aqi)])
 
 
 # =====================================================
@@ -265,17 +359,18 @@ class MockServiceManager:
         """
         Fetch mock data from all providers
         Returns data organized by provider
+        AQICN and IQAir payloads of the batch share the same timestamp
         """
+        now = datetime.utcnow()
         return {
-            "aqicn": self.aqicn.get_all_stations(),
-            "google": [
-                self.google.get_current_conditions(4.6097, -74.0817),  # Bogotá
-                self.google.get_current_conditions(6.2442, -75.5812),  # Medellín
-            ],
+            "aqicn": self.aqicn.get_all_stations(now),
+            "google": self.google.get_conditions_batch([
+                (4.6097, -74.0817),  # Bogotá
+                (6.2442, -75.5812),  # Medellín
+            ]),
             "iqair": [
-                self.iqair.get_city_data("bogota"),
-                self.iqair.get_city_data("medellin"),
-                self.iqair.get_city_data("cali"),
+                self.iqair.get_city_data(city, now=now)
+                for city in ("bogota", "medellin", "cali")
             ]
         }
     
@@ -0,0 +1,67 @@
+"""
+Reference Data Cache
+In-process TTL cache for rarely-changing reference lists (pollutants,
+providers, roles, permissions) and daily stats served by the API
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "120"))  # seconds
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "3600"))  # seconds
+STATS_CACHE_MAX_ENTRIES = 1024
+
+
+class ReferenceCache:
+    """
+    Caches already-serialized payloads (plain dicts/lists, never ORM
+    objects) by key for `ttl` seconds. Sync handlers run in FastAPI's
+    threadpool, so access is guarded by a lock. With max_entries set
+    (parameterized keys), expired entries are pruned once the bound is hit.
+    """
+
+    def __init__(self, ttl: float = REFERENCE_CACHE_TTL, max_entries: Optional[int] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling loader() when missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                return entry[1]
+
+        # Loaded outside the lock; concurrent misses may both query the DB
+        value = loader()
+        with self._lock:
+            if self.max_entries is not None and len(self._entries) >= self.max_entries:
+                self._prune(now)
+            self._entries[key] = (now, value)
+        return value
+
+    def _prune(self, now: float):
+        """Drop expired entries, or everything if the cache is still full"""
+        for key, (loaded_at, _) in list(self._entries.items()):
+            if now - loaded_at >= self.ttl:
+                del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+
+    def invalidate(self, *keys: str):
+        """Drop the given keys (all keys if none given)"""
+        with self._lock:
+            if not keys:
+                self._entries.clear()
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+reference_cache = ReferenceCache()
+
+# Daily stats change only when the aggregation job runs, which invalidates it
+stats_cache = ReferenceCache(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES)
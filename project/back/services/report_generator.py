@@ -5,20 +5,31 @@ Generates PDF reports with charts using WeasyPrint and matplotlib
 
 import os
 import logging
-import random
+from bisect import bisect_left
+from collections import namedtuple
 from datetime import datetime, date, timedelta
-from typing import Optional, List, Dict
+from typing import Iterable, Optional, List, Dict, Tuple
 import io
-import base64
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+import numpy as np
 
 import matplotlib
 matplotlib.use('Agg')  # Non-interactive backend
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from weasyprint import HTML, CSS
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+from jinja2 import Environment
+from weasyprint import HTML, CSS, default_url_fetcher
+from weasyprint.text.fonts import FontConfiguration
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import Date, cast, func, select
 
+from database.postgres_db import SessionLocal
 from models import (
     AirQualityReading, Station, Pollutant, 
     AirQualityDailyStats, Report
@@ -27,14 +38,342 @@ from models import (
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per round trip when streaming the timeline readings
+TIMELINE_CHUNK_SIZE = 10000
+
+# Chart resolution: 12in-wide charts at 100 dpi still exceed ~170 dpi once
+# scaled to the A4 content width
+CHART_DPI = 100
+
+# Timeline points plotted at most; longer series are strided down (the
+# marker density already saturates the chart width well before this)
+TIMELINE_MAX_POINTS = 5000
+
+# Worker processes rendering a report's charts concurrently (1 = in-process)
+REPORT_CHART_WORKERS = int(os.getenv("REPORT_CHART_WORKERS", "4"))
+
+# Mock reading / daily stat (not DB models) used when a report period has no real data
+MockReading = namedtuple("MockReading", ["datetime", "station_id", "pollutant_id", "aqi", "pollutant_value"])
+MockDailyStat = namedtuple("MockDailyStat", ["date", "avg_aqi", "max_aqi", "min_aqi"])
+
+_RNG = np.random.default_rng()
+
+
+def _value_bands(breaks, ranges):
+    """(AQI upper bounds, range lows, range highs) arrays; one more range than bounds"""
+    return np.array(breaks), np.array([r[0] for r in ranges]), np.array([r[1] for r in ranges])
+
+
+# Simplified AQI -> concentration ranges per normalized pollutant name
+# (in reality this is more complex)
+_POLLUTANT_VALUE_BANDS = {
+    "PM25": _value_bands((50, 100, 150), ((0, 12), (12, 35), (35, 55), (55, 150))),
+    "PM10": _value_bands((50, 100, 150), ((0, 54), (55, 154), (155, 254), (255, 354))),
+    "O3": _value_bands((50, 100), ((0, 54), (55, 70), (71, 85))),
+    "NO2": _value_bands((50, 100), ((0, 53), (54, 100), (101, 360))),
+    "SO2": _value_bands((50, 100), ((0, 35), (36, 75), (76, 185))),
+    "CO": _value_bands((50, 100), ((0, 4.4), (4.5, 9.4), (9.5, 12.4))),
+}
+
+# AQI category upper bounds (inclusive) and their interpretation; one more
+# interpretation than bounds, for AQI above 300
+_AQI_INTERPRETATION_BOUNDS = (50, 100, 150, 200, 300)
+_AQI_INTERPRETATIONS = (
+    {
+        'category': 'Good',
+        'description': 'Air quality is satisfactory, and air pollution poses little or no risk.'
+    },
+    {
+        'category': 'Moderate',
+        'description': 'Air quality is acceptable. However, there may be a risk for some people, particularly those who are unusually sensitive to air pollution.'
+    },
+    {
+        'category': 'Unhealthy for Sensitive Groups',
+        'description': 'Members of sensitive groups may experience health effects. The general public is less likely to be affected.'
+    },
+    {
+        'category': 'Unhealthy',
+        'description': 'Some members of the general public may experience health effects; members of sensitive groups may experience more serious health effects.'
+    },
+    {
+        'category': 'Very Unhealthy',
+        'description': 'Health alert: The risk of health effects is increased for everyone.'
+    },
+    {
+        'category': 'Hazardous',
+        'description': 'Health warning of emergency conditions: everyone is more likely to be affected.'
+    },
+)
+
+
+# =====================================================
+# Charts: module-level functions over plain values, so they can be
+# rendered in worker processes (REPORT_CHART_WORKERS)
+# =====================================================
+
+@lru_cache(maxsize=1)
+def _chart_pool() -> ProcessPoolExecutor:
+    # spawn: the API process runs threads (server, scheduler, DB pool),
+    # which fork would copy in an undefined state
+    return ProcessPoolExecutor(
+        max_workers=REPORT_CHART_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _render_charts(jobs: Dict[str, Tuple]) -> Dict[str, bytes]:
+    """
+    Render {name: (chart function, *args)} to {name: PNG bytes}, keeping
+    the jobs' order; concurrently in the chart pool when it is enabled
+    """
+    if REPORT_CHART_WORKERS <= 1 or len(jobs) <= 1:
+        return {name: func(*args) for name, (func, *args) in jobs.items()}
+    
+    try:
+        futures = {name: _chart_pool().submit(func, *args) for name, (func, *args) in jobs.items()}
+        return {name: future.result() for name, future in futures.items()}
+    except BrokenProcessPool:
+        logger.warning("Chart worker pool broke, rendering charts in-process")
+        _chart_pool.cache_clear()
+        return {name: func(*args) for name, (func, *args) in jobs.items()}
+
+
+# One Figure per thread (worker process or in-process report thread),
+# cleared and resized for each chart instead of allocating a new one
+_chart_figure = threading.local()
+
+
+def _figure(width: float, height: float) -> Tuple[Figure, Axes]:
+    """This thread's chart Figure, cleared and sized to width x height inches, with one Axes"""
+    fig = getattr(_chart_figure, "fig", None)
+    if fig is None:
+        # Figure without pyplot: no global figure registry to track/close
+        fig = _chart_figure.fig = Figure()
+    fig.clear()
+    fig.set_size_inches(width, height)
+    return fig, fig.add_subplot()
+
+
+def _create_timeline_chart(times: np.ndarray, aqis: np.ndarray) -> bytes:
+    """Create AQI timeline chart"""
+    fig, ax = _figure(12, 6)
+    
+    ax.plot(times, aqis, marker='o', linestyle='-', linewidth=2, markersize=4)
+    ax.set_xlabel('Date/Time', fontsize=12)
+    ax.set_ylabel('AQI', fontsize=12)
+    ax.set_title('Air Quality Index Over Time', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    
+    # Format x-axis
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+    ax.tick_params(axis='x', labelrotation=45)
+    
+    # Color zones
+    ax.axhspan(0, 50, alpha=0.1, color='green', label='Good')
+    ax.axhspan(51, 100, alpha=0.1, color='yellow', label='Moderate')
+    ax.axhspan(101, 150, alpha=0.1, color='orange', label='Unhealthy for Sensitive')
+    ax.axhspan(151, 500, alpha=0.1, color='red', label='Unhealthy')
+    
+    ax.legend(loc='upper right')
+    fig.tight_layout()
+    
+    return _fig_to_png(fig)
+
+
+def _create_station_comparison_chart(station_avg_aqi: List) -> bytes:
+    """Create station comparison bar chart from (station name, average AQI) pairs"""
+    fig, ax = _figure(10, 6)
+    
+    station_names = [name[:20] for name, _ in station_avg_aqi]  # Truncate long names
+    avg_aqis = [avg_aqi for _, avg_aqi in station_avg_aqi]
+    
+    bars = ax.bar(station_names, avg_aqis, color='steelblue')
+    
+    # Color bars based on AQI
+    for bar, aqi in zip(bars, avg_aqis):
+        if aqi <= 50:
+            bar.set_color('green')
+        elif aqi <= 100:
+            bar.set_color('yellow')
+        elif aqi <= 150:
+            bar.set_color('orange')
+        else:
+            bar.set_color('red')
+    
+    ax.set_xlabel('Station', fontsize=12)
+    ax.set_ylabel('Average AQI', fontsize=12)
+    ax.set_title('Average AQI by Station', fontsize=14, fontweight='bold')
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    fig.tight_layout()
+    
+    return _fig_to_png(fig)
+
+
+def _create_pollutant_chart(pollutant_counts: List) -> bytes:
+    """Create pollutant distribution pie chart from (pollutant name, count) pairs"""
+    fig, ax = _figure(8, 8)
+    
+    labels = [name for name, _ in pollutant_counts]
+    sizes = [count for _, count in pollutant_counts]
+    
+    colors = matplotlib.colormaps['Set3'](range(len(labels)))
+    ax.pie(sizes, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
+    ax.set_title('Readings by Pollutant', fontsize=14, fontweight='bold')
+    fig.tight_layout()
+    
+    return _fig_to_png(fig)
+
+
+def _create_daily_stats_chart(dates: List[date], avg_aqis: List, max_aqis: List, min_aqis: List) -> bytes:
+    """Create daily statistics chart"""
+    fig, ax = _figure(12, 6)
+    
+    ax.plot(dates, avg_aqis, label='Average AQI', marker='o', linewidth=2)
+    ax.fill_between(dates, min_aqis, max_aqis, alpha=0.3, label='Min-Max Range')
+    
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('AQI', fontsize=12)
+    ax.set_title('Daily Air Quality Statistics', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    
+    return _fig_to_png(fig)
+
+
+def _fig_to_png(fig: Figure) -> bytes:
+    """Convert matplotlib figure to PNG bytes (the figure is kept for reuse)"""
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=CHART_DPI, bbox_inches='tight')
+    return buf.getvalue()
+
+
+def _chart_url_fetcher(charts: Dict[str, bytes]):
+    """
+    WeasyPrint url_fetcher serving chart:<name> image URLs straight from the
+    rendered PNG bytes (no base64 data URIs to encode and decode)
+    """
+    def fetch(url: str):
+        if url.startswith("chart:"):
+            return {"string": charts[url[len("chart:"):]], "mime_type": "image/png"}
+        return default_url_fetcher(url)
+    
+    return fetch
+
+
+# Report HTML, compiled once; autoescape keeps user-supplied text (report
+# title) from injecting markup. Charts are chart:<name> URLs served by
+# _chart_url_fetcher
+_REPORT_TEMPLATE = Environment(autoescape=True).from_string("""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>{{ report.title }}</title>
+</head>
+<body>
+    <div class="header">
+        <h1>🌍 Air Quality Monitor</h1>
+        <p class="subtitle">Environmental Data Report</p>
+    </div>
+    
+    <div class="report-info">
+        <h2>{{ report.title }}</h2>
+        <div class="info-grid">
+            <div class="info-item">
+                <span class="label">Period:</span>
+                <span class="value">{{ report.start_date }} to {{ report.end_date }}</span>
+            </div>
+            <div class="info-item">
+                <span class="label">Station:</span>
+                <span class="value">{{ station_name }}</span>
+            </div>
+            <div class="info-item">
+                <span class="label">Pollutant:</span>
+                <span class="value">{{ pollutant_name }}</span>
+            </div>
+            <div class="info-item">
+                <span class="label">Generated:</span>
+                <span class="value">{{ generated_at }}</span>
+            </div>
+        </div>
+    </div>
+    
+    <div class="summary">
+        <h3>Summary Statistics</h3>
+        <div class="stats-grid">
+            <div class="stat-card">
+                <div class="stat-label">Total Readings</div>
+                <div class="stat-value">{{ stats.total_readings }}</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-label">Average AQI</div>
+                <div class="stat-value">{{ "%.1f"|format(stats.avg_aqi) }}</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-label">Maximum AQI</div>
+                <div class="stat-value">{{ stats.max_aqi }}</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-label">Minimum AQI</div>
+                <div class="stat-value">{{ stats.min_aqi }}</div>
+            </div>
+        </div>
+    </div>
+    {% if charts %}
+    <div class="charts">
+        <h3>Data Visualizations</h3>
+        {% for chart_name in charts %}
+        <div class="chart-container"><img src="chart:{{ chart_name }}" alt="{{ chart_name }}" /></div>
+        {% endfor %}
+    </div>
+    {% endif %}
+    <div class="interpretation">
+        <h3>Air Quality Interpretation</h3>
+        <p>The average Air Quality Index (AQI) for this period is <strong>{{ "%.1f"|format(avg_aqi) }}</strong>, 
+        which is classified as <strong>{{ interpretation.category }}</strong>.</p>
+        <p>{{ interpretation.description }}</p>
+    </div>
+    
+    <div class="footer">
+        <p>© 2025 Air Quality Monitor | Generated by Jarcoz Environmental System</p>
+        <p>This report was automatically generated based on data collected from monitoring stations.</p>
+    </div>
+</body>
+</html>
+""")
+
+
+@lru_cache(maxsize=1)
+def _pdf_stylesheet() -> Tuple[CSS, FontConfiguration]:
+    """
+    Report stylesheet parsed once per process, with the font configuration
+    it was parsed against (fonts are discovered once, not per report)
+    """
+    font_config = FontConfiguration()
+    return CSS(string=ReportGenerator._get_pdf_styles(), font_config=font_config), font_config
+
 
 class ReportGenerator:
     """Service for generating air quality reports with visualizations"""
     
+    reports_dir = "/app/reports"
+    _dir_ready = False
+    
     def __init__(self, db: Session):
         self.db = db
-        self.reports_dir = "/app/reports"
-        os.makedirs(self.reports_dir, exist_ok=True)
+        self._ensure_reports_dir()
+    
+    @classmethod
+    def _ensure_reports_dir(cls):
+        """Create the reports directory once per process, not per report"""
+        if not cls._dir_ready:
+            os.makedirs(cls.reports_dir, exist_ok=True)
+            cls._dir_ready = True
     
     def generate_pdf_report(
         self,
@@ -51,6 +390,9 @@ class ReportGenerator:
         Returns:
             file_path: Path to generated PDF file
         """
+        # Timestamps the file name, the PDF's "Generated" line and generated_at alike
+        now = datetime.now()
+        
         # Fetch data
         data = self._fetch_report_data(
             report.start_date,
@@ -66,19 +408,25 @@ class ReportGenerator:
         logger.info(f"Charts generated: {list(charts.keys())}")
         
         # Generate HTML content
-        html_content = self._generate_html(report, data, charts)
+        html_content = self._generate_html(report, data, charts, now)
         
         # Generate PDF
-        filename = f"report_{report.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        filename = f"report_{report.id}_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
         filepath = os.path.join(self.reports_dir, filename)
         
-        html_doc = HTML(string=html_content)
-        css_doc = CSS(string=self._get_pdf_styles())
-        html_doc.write_pdf(filepath, stylesheets=[css_doc])
+        html_doc = HTML(string=html_content, url_fetcher=_chart_url_fetcher(charts))
+        css_doc, font_config = _pdf_stylesheet()
+        # optimize_images losslessly recompresses the embedded chart PNGs
+        html_doc.write_pdf(
+            filepath,
+            stylesheets=[css_doc],
+            font_config=font_config,
+            optimize_images=True
+        )
         
         # Update report record
         report.file_path = filepath
-        report.generated_at = datetime.now()
+        report.generated_at = now
         self.db.commit()
         
         return filepath
@@ -93,29 +441,21 @@ class ReportGenerator:
         """Fetch data for the report"""
         
         # Convert dates to datetime to include full day range
-        from datetime import datetime as dt
-        start_datetime = dt.combine(start_date, dt.min.time())
-        end_datetime = dt.combine(end_date, dt.max.time())
-        
-        # Base query for readings
-        query = self.db.query(AirQualityReading).filter(
-            AirQualityReading.datetime >= start_datetime,
-            AirQualityReading.datetime <= end_datetime
-        )
+        start_datetime = datetime.combine(start_date, datetime.min.time())
+        end_datetime = datetime.combine(end_date, datetime.max.time())
         
-        if station_id:
-            query = query.filter(AirQualityReading.station_id == station_id)
-        if pollutant_id:
-            query = query.filter(AirQualityReading.pollutant_id == pollutant_id)
+        criteria = self._reading_filters(start_datetime, end_datetime, station_id, pollutant_id)
         
-        readings = query.order_by(AirQualityReading.datetime).all()
+        # Summary statistics aggregated in Postgres (one row back)
+        stats = self._query_statistics(criteria)
         
         logger.info(f"Report data fetch: start={start_datetime}, end={end_datetime}, "
                    f"station_id={station_id}, pollutant_id={pollutant_id}")
-        logger.info(f"Found {len(readings)} readings")
+        logger.info(f"Found {stats['total_readings']} readings")
         
         # If no real data found, generate mock data
-        if not readings:
+        is_mock = stats['total_readings'] == 0
+        if is_mock:
             logger.warning("No real data found for report period. Generating mock data...")
             readings = self._generate_mock_readings(
                 start_datetime, 
@@ -124,32 +464,29 @@ class ReportGenerator:
                 pollutant_id
             )
             logger.info(f"Generated {len(readings)} mock readings")
+            stats = self._calculate_statistics(readings)
+            timeline = self._timeline_arrays([[(r.datetime, r.aqi) for r in readings]])
+        else:
+            timeline = self._stream_timeline(criteria)
         
-        # Get station info
-        stations = {}
+        # Station/pollutant names by id (only used for titles and chart labels)
+        station_query = select(Station.id, Station.name)
         if station_id:
-            station = self.db.query(Station).filter(Station.id == station_id).first()
-            if station:
-                stations[station.id] = station
-        else:
-            all_stations = self.db.query(Station).all()
-            stations = {s.id: s for s in all_stations}
+            station_query = station_query.where(Station.id == station_id)
+        stations = dict(self.db.execute(station_query).all())
         
-        # Get pollutant info
-        pollutants = {}
+        pollutant_query = select(Pollutant.id, Pollutant.name)
         if pollutant_id:
-            pollutant = self.db.query(Pollutant).filter(Pollutant.id == pollutant_id).first()
-            if pollutant:
-                pollutants[pollutant.id] = pollutant
-        else:
-            all_pollutants = self.db.query(Pollutant).all()
-            pollutants = {p.id: p for p in all_pollutants}
-        
-        # Calculate statistics
-        stats = self._calculate_statistics(readings)
-        
-        # Get daily aggregates
-        daily_query = self.db.query(AirQualityDailyStats).filter(
+            pollutant_query = pollutant_query.where(Pollutant.id == pollutant_id)
+        pollutants = dict(self.db.execute(pollutant_query).all())
+        
+        # Get daily aggregates from the rollup table (only the charted columns)
+        daily_query = self.db.query(
+            AirQualityDailyStats.date,
+            AirQualityDailyStats.avg_aqi,
+            AirQualityDailyStats.max_aqi,
+            AirQualityDailyStats.min_aqi
+        ).filter(
             AirQualityDailyStats.date >= start_date,
             AirQualityDailyStats.date <= end_date
         )
@@ -161,20 +498,173 @@ class ReportGenerator:
         
         daily_stats = daily_query.order_by(AirQualityDailyStats.date).all()
         
-        # If no daily stats and we have mock readings, generate mock daily stats
-        if not daily_stats and readings:
-            logger.warning("No daily stats found. Generating mock daily stats from readings...")
-            daily_stats = self._generate_mock_daily_stats(readings, start_date, end_date)
-            logger.info(f"Generated {len(daily_stats)} mock daily stats")
+        # Rollup not computed for this window: aggregate real readings per day
+        # in one GROUP BY, or derive mock daily stats from mock readings
+        if not daily_stats and stats['total_readings']:
+            if is_mock:
+                logger.warning("No daily stats found. Generating mock daily stats from readings...")
+                daily_stats = self._generate_mock_daily_stats(readings, start_date, end_date)
+                logger.info(f"Generated {len(daily_stats)} mock daily stats")
+            else:
+                logger.warning("No daily stats found. Aggregating readings per day...")
+                daily_stats = self._aggregate_daily_stats(start_date, end_date, station_id, pollutant_id)
+        
+        # Average AQI per station and readings per pollutant for the charts
+        # (GROUP BY in SQL)
+        if is_mock:
+            station_avg_aqi = self._mock_station_avg_aqi(readings, stations)
+            pollutant_counts = self._mock_pollutant_counts(readings, pollutants)
+        else:
+            station_avg_aqi = self._station_avg_aqi(criteria)
+            pollutant_counts = self._pollutant_counts(criteria)
         
         return {
-            'readings': readings,
+            'timeline': timeline,
             'stations': stations,
             'pollutants': pollutants,
             'statistics': stats,
-            'daily_stats': daily_stats
+            'daily_stats': daily_stats,
+            'station_avg_aqi': station_avg_aqi,
+            'pollutant_counts': pollutant_counts
         }
     
+    def _reading_filters(
+        self,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        station_id: Optional[int] = None,
+        pollutant_id: Optional[int] = None
+    ) -> List:
+        """WHERE criteria selecting the report's readings"""
+        criteria = [
+            AirQualityReading.datetime >= start_datetime,
+            AirQualityReading.datetime <= end_datetime
+        ]
+        if station_id:
+            criteria.append(AirQualityReading.station_id == station_id)
+        if pollutant_id:
+            criteria.append(AirQualityReading.pollutant_id == pollutant_id)
+        return criteria
+    
+    def _query_statistics(self, criteria: List) -> Dict:
+        """Summary statistics (same keys as _calculate_statistics) computed in SQL"""
+        total, avg_aqi, max_aqi, min_aqi = self.db.query(
+            func.count(AirQualityReading.id),
+            func.avg(AirQualityReading.aqi),
+            func.max(AirQualityReading.aqi),
+            func.min(AirQualityReading.aqi)
+        ).filter(*criteria).one()
+        
+        return {
+            'total_readings': total,
+            'avg_aqi': float(avg_aqi) if avg_aqi is not None else 0,
+            'max_aqi': max_aqi if max_aqi is not None else 0,
+            'min_aqi': min_aqi if min_aqi is not None else 0
+        }
+    
+    def _stream_timeline(self, criteria: List) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (datetime, AQI) of the report's readings in time order, streamed with a
+        server-side cursor in TIMELINE_CHUNK_SIZE chunks (plain tuples, no ORM
+        instances, bounded memory while fetching). Readings without an AQI are
+        left out in SQL rather than plotted as 0.
+        """
+        result = self.db.execute(
+            select(AirQualityReading.datetime, AirQualityReading.aqi)
+            .where(*criteria, AirQualityReading.aqi.isnot(None))
+            .order_by(AirQualityReading.datetime)
+            .execution_options(yield_per=TIMELINE_CHUNK_SIZE)
+        )
+        return self._timeline_arrays(result.partitions())
+    
+    def _timeline_arrays(self, chunks: Iterable) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenate chunks of (datetime, aqi) rows into time and AQI arrays"""
+        times = []
+        aqis = []
+        for chunk in chunks:
+            times.append(np.array([row[0] for row in chunk], dtype='datetime64[s]'))
+            aqis.append(np.array([row[1] for row in chunk], dtype=np.int32))
+        
+        if not times:
+            return np.empty(0, dtype='datetime64[s]'), np.empty(0, dtype=np.int32)
+        return np.concatenate(times), np.concatenate(aqis)
+    
+    def _station_avg_aqi(self, criteria: List) -> List:
+        """(station name, average AQI) pairs of the report's readings, one grouped query"""
+        rows = self.db.query(
+            Station.name,
+            func.avg(AirQualityReading.aqi)
+        ).join(
+            Station, Station.id == AirQualityReading.station_id
+        ).filter(*criteria).group_by(Station.id, Station.name).order_by(Station.name).all()
+        
+        return [(name, float(avg_aqi) if avg_aqi is not None else 0) for name, avg_aqi in rows]
+    
+    def _mock_station_avg_aqi(self, readings: List, stations: Dict[int, str]) -> List:
+        """(station name, average AQI) pairs computed from mock readings"""
+        station_aqis = {}
+        for reading in readings:
+            station_aqis.setdefault(reading.station_id, []).append(reading.aqi)
+        
+        return [
+            (stations[station_id], sum(aqis) / len(aqis))
+            for station_id, aqis in station_aqis.items()
+            if station_id in stations
+        ]
+    
+    def _pollutant_counts(self, criteria: List) -> List:
+        """(pollutant name, reading count) pairs of the report's readings, one grouped query"""
+        return [
+            (name, count)
+            for name, count in self.db.query(
+                Pollutant.name,
+                func.count(AirQualityReading.id)
+            ).join(
+                Pollutant, Pollutant.id == AirQualityReading.pollutant_id
+            ).filter(*criteria).group_by(Pollutant.id, Pollutant.name).order_by(Pollutant.name)
+        ]
+    
+    def _mock_pollutant_counts(self, readings: List, pollutants: Dict[int, str]) -> List:
+        """(pollutant name, reading count) pairs computed from mock readings"""
+        counts = {}
+        for reading in readings:
+            counts[reading.pollutant_id] = counts.get(reading.pollutant_id, 0) + 1
+        
+        return [
+            (pollutants[pollutant_id], count)
+            for pollutant_id, count in counts.items()
+            if pollutant_id in pollutants
+        ]
+    
+    def _aggregate_daily_stats(
+        self,
+        start_date: date,
+        end_date: date,
+        station_id: Optional[int] = None,
+        pollutant_id: Optional[int] = None
+    ) -> List:
+        """
+        Daily AQI aggregates (date, avg_aqi, max_aqi, min_aqi) computed from the
+        readings in a single scan, for windows the daily job has not rolled up
+        """
+        day = cast(AirQualityReading.datetime, Date)
+        query = self.db.query(
+            day.label("date"),
+            func.avg(AirQualityReading.aqi).label("avg_aqi"),
+            func.max(AirQualityReading.aqi).label("max_aqi"),
+            func.min(AirQualityReading.aqi).label("min_aqi")
+        ).filter(
+            AirQualityReading.datetime >= datetime.combine(start_date, datetime.min.time()),
+            AirQualityReading.datetime < datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        )
+        
+        if station_id:
+            query = query.filter(AirQualityReading.station_id == station_id)
+        if pollutant_id:
+            query = query.filter(AirQualityReading.pollutant_id == pollutant_id)
+        
+        return query.group_by(day).order_by(day).all()
+    
     def _generate_mock_readings(
         self,
         start_datetime: datetime,
@@ -190,8 +680,8 @@ class ReportGenerator:
         mock_readings = []
         
         # Get available stations and pollutants from DB
-        stations = self.db.query(Station).all()
-        pollutants = self.db.query(Pollutant).all()
+        stations = self.db.execute(select(Station.id)).all()
+        pollutants = self.db.execute(select(Pollutant.id, Pollutant.name)).all()
         
         # If no stations or pollutants in DB, return empty
         if not stations or not pollutants:
@@ -203,99 +693,52 @@ class ReportGenerator:
         target_pollutants = [p for p in pollutants if p.id == pollutant_id] if pollutant_id else pollutants[:2]  # Max 2 pollutants
         
         # Generate readings every 6 hours
-        current_time = start_datetime
         delta = timedelta(hours=6)
-        
-        while current_time <= end_datetime:
-            for station in target_stations:
-                for pollutant in target_pollutants:
-                    # Generate realistic AQI value (most readings in 20-150 range)
-                    base_aqi = random.triangular(20, 150, 70)  # Mode at 70
-                    aqi = int(base_aqi + random.gauss(0, 15))  # Add some noise
-                    aqi = max(10, min(300, aqi))  # Clamp between 10 and 300
-                    
-                    # Generate pollutant value based on AQI
-                    pollutant_value = self._aqi_to_pollutant_value(aqi, pollutant.name)
-                    
-                    # Create mock reading object (not a DB model, just a dict-like object)
-                    class MockReading:
-                        def __init__(self, dt, sid, pid, aqi_val, poll_val):
-                            self.datetime = dt
-                            self.station_id = sid
-                            self.pollutant_id = pid
-                            self.aqi = aqi_val
-                            self.pollutant_value = poll_val
-                    
-                    mock_reading = MockReading(
-                        dt=current_time,
-                        sid=station.id,
-                        pid=pollutant.id,
-                        aqi_val=aqi,
-                        poll_val=pollutant_value
-                    )
-                    
-                    mock_readings.append(mock_reading)
-            
-            current_time += delta
+        n_steps = int((end_datetime - start_datetime) / delta) + 1
+        shape = (n_steps, len(target_stations), len(target_pollutants))
+        
+        # Realistic AQI values drawn at once (most readings in 20-150 range):
+        # triangular with mode at 70, plus noise, clamped between 10 and 300
+        base_aqi = _RNG.triangular(20, 70, 150, size=shape)
+        noise = _RNG.normal(0, 15, size=shape)
+        aqis = np.clip((base_aqi + noise).astype(np.int32), 10, 300)
+        
+        # Generate pollutant values based on AQI, one batch per pollutant
+        values = np.empty(shape)
+        for index, pollutant in enumerate(target_pollutants):
+            values[:, :, index] = self._aqi_to_pollutant_values(aqis[:, :, index], pollutant.name)
+        
+        for step, (step_aqis, step_values) in enumerate(zip(aqis.tolist(), values.tolist())):
+            current_time = start_datetime + step * delta
+            for station, station_aqis, station_values in zip(target_stations, step_aqis, step_values):
+                for pollutant, aqi, value in zip(target_pollutants, station_aqis, station_values):
+                    mock_readings.append(MockReading(
+                        datetime=current_time,
+                        station_id=station.id,
+                        pollutant_id=pollutant.id,
+                        aqi=aqi,
+                        pollutant_value=value
+                    ))
         
         logger.info(f"Generated {len(mock_readings)} mock readings from {start_datetime} to {end_datetime}")
         return mock_readings
     
-    def _aqi_to_pollutant_value(self, aqi: int, pollutant_name: str) -> float:
-        """Convert AQI to approximate pollutant value (rough approximation)"""
-        # Simplified conversion - in reality this is more complex
+    def _aqi_to_pollutant_values(self, aqis: np.ndarray, pollutant_name: str) -> np.ndarray:
+        """
+        Convert AQIs to approximate pollutant values (rough approximation),
+        one uniform draw per AQI within its band's concentration range
+        """
         # Normalize pollutant name (remove spaces and make uppercase)
         pollutant_normalized = pollutant_name.upper().replace(" ", "").replace(".", "")
         
-        if pollutant_normalized == "PM25":
-            if aqi <= 50:
-                return random.uniform(0, 12)
-            elif aqi <= 100:
-                return random.uniform(12, 35)
-            elif aqi <= 150:
-                return random.uniform(35, 55)
-            else:
-                return random.uniform(55, 150)
-        elif pollutant_normalized == "PM10":
-            if aqi <= 50:
-                return random.uniform(0, 54)
-            elif aqi <= 100:
-                return random.uniform(55, 154)
-            elif aqi <= 150:
-                return random.uniform(155, 254)
-            else:
-                return random.uniform(255, 354)
-        elif pollutant_normalized == "O3":
-            if aqi <= 50:
-                return random.uniform(0, 54)
-            elif aqi <= 100:
-                return random.uniform(55, 70)
-            else:
-                return random.uniform(71, 85)
-        elif pollutant_normalized == "NO2":
-            if aqi <= 50:
-                return random.uniform(0, 53)
-            elif aqi <= 100:
-                return random.uniform(54, 100)
-            else:
-                return random.uniform(101, 360)
-        elif pollutant_normalized == "SO2":
-            if aqi <= 50:
-                return random.uniform(0, 35)
-            elif aqi <= 100:
-                return random.uniform(36, 75)
-            else:
-                return random.uniform(76, 185)
-        elif pollutant_normalized == "CO":
-            if aqi <= 50:
-                return random.uniform(0, 4.4)
-            elif aqi <= 100:
-                return random.uniform(4.5, 9.4)
-            else:
-                return random.uniform(9.5, 12.4)
-        else:
+        bands = _POLLUTANT_VALUE_BANDS.get(pollutant_normalized)
+        if bands is None:
             # Default case
-            return aqi * 0.5
+            return aqis * 0.5
+        
+        breaks, lows, highs = bands
+        band = np.searchsorted(breaks, aqis)  # first break >= aqi, i.e. aqi <= break
+        return _RNG.uniform(lows[band], highs[band])
     
     def _generate_mock_daily_stats(
         self, 
@@ -308,43 +751,38 @@ class ReportGenerator:
         
         Returns list of mock daily stat objects
         """
-        # Group readings by date
-        daily_data = {}
-        for reading in readings:
-            read_date = reading.datetime.date()
-            if read_date not in daily_data:
-                daily_data[read_date] = []
-            daily_data[read_date].append(reading.aqi)
-        
-        # Create mock daily stats
-        mock_daily_stats = []
-        current_date = start_date
-        
-        while current_date <= end_date:
-            if current_date in daily_data:
-                aqis = daily_data[current_date]
-                
-                class MockDailyStat:
-                    def __init__(self, d, avg, mx, mn):
-                        self.date = d
-                        self.avg_aqi = avg
-                        self.max_aqi = mx
-                        self.min_aqi = mn
-                
-                mock_stat = MockDailyStat(
-                    d=current_date,
-                    avg=sum(aqis) / len(aqis),
-                    mx=max(aqis),
-                    mn=min(aqis)
-                )
-                mock_daily_stats.append(mock_stat)
-            
-            current_date += timedelta(days=1)
+        n_days = (end_date - start_date).days + 1
         
-        return mock_daily_stats
+        # Day index (from start_date) and AQI of every reading, as arrays
+        days = np.fromiter(
+            ((reading.datetime.date() - start_date).days for reading in readings),
+            dtype=np.int64, count=len(readings)
+        )
+        aqis = np.fromiter((reading.aqi for reading in readings), dtype=np.float64, count=len(readings))
+        in_range = (days >= 0) & (days < n_days)
+        days, aqis = days[in_range], aqis[in_range]
+        
+        # Per-day count/sum/max/min in single vectorized passes
+        counts = np.bincount(days, minlength=n_days)
+        sums = np.bincount(days, weights=aqis, minlength=n_days)
+        maxes = np.full(n_days, -np.inf)
+        np.maximum.at(maxes, days, aqis)
+        mins = np.full(n_days, np.inf)
+        np.minimum.at(mins, days, aqis)
+        
+        # Only days that have readings
+        return [
+            MockDailyStat(
+                date=start_date + timedelta(days=day),
+                avg_aqi=sums[day] / counts[day],
+                max_aqi=int(maxes[day]),
+                min_aqi=int(mins[day])
+            )
+            for day in np.flatnonzero(counts).tolist()
+        ]
 
-    def _calculate_statistics(self, readings: List[AirQualityReading]) -> Dict:
-        """Calculate summary statistics from readings"""
+    def _calculate_statistics(self, readings: List) -> Dict:
+        """Calculate summary statistics from (mock) readings"""
         if not readings:
             return {
                 'total_readings': 0,
@@ -353,315 +791,84 @@ class ReportGenerator:
                 'min_aqi': 0
             }
         
-        aqis = [r.aqi for r in readings if r.aqi is not None]
+        aqis = [r.aqi for r in readings]
         
         return {
             'total_readings': len(readings),
-            'avg_aqi': sum(aqis) / len(aqis) if aqis else 0,
-            'max_aqi': max(aqis) if aqis else 0,
-            'min_aqi': min(aqis) if aqis else 0
+            'avg_aqi': sum(aqis) / len(aqis),
+            'max_aqi': max(aqis),
+            'min_aqi': min(aqis)
         }
     
-    def _generate_charts(self, data: Dict, report: Report) -> Dict[str, str]:
-        """Generate charts as base64 encoded images"""
-        charts = {}
+    def _generate_charts(self, data: Dict, report: Report) -> Dict[str, bytes]:
+        """Generate charts as PNG images (bytes)"""
+        jobs = {}
         
         # Chart 1: AQI Over Time
-        if data['readings']:
-            charts['aqi_timeline'] = self._create_timeline_chart(data['readings'])
+        times, aqis = data['timeline']
+        if len(times):
+            stride = -(-len(times) // TIMELINE_MAX_POINTS)  # ceil division
+            jobs['aqi_timeline'] = (_create_timeline_chart, times[::stride], aqis[::stride])
         
         # Chart 2: Average AQI by Station (if multiple stations)
         if not report.station_id and len(data['stations']) > 1:
-            charts['aqi_by_station'] = self._create_station_comparison_chart(
-                data['readings'], 
-                data['stations']
-            )
+            jobs['aqi_by_station'] = (_create_station_comparison_chart, data['station_avg_aqi'])
         
         # Chart 3: Pollutant Distribution (if multiple pollutants)
         if not report.pollutant_id and len(data['pollutants']) > 1:
-            charts['pollutant_distribution'] = self._create_pollutant_chart(
-                data['readings'],
-                data['pollutants']
-            )
+            jobs['pollutant_distribution'] = (_create_pollutant_chart, data['pollutant_counts'])
         
         # Chart 4: Daily Statistics
-        if data['daily_stats']:
-            charts['daily_stats'] = self._create_daily_stats_chart(data['daily_stats'])
-        
-        return charts
-    
-    def _create_timeline_chart(self, readings: List[AirQualityReading]) -> str:
-        """Create AQI timeline chart"""
-        fig, ax = plt.subplots(figsize=(12, 6))
-        
-        # Group by datetime
-        times = [r.datetime for r in readings]
-        aqis = [r.aqi if r.aqi else 0 for r in readings]
-        
-        ax.plot(times, aqis, marker='o', linestyle='-', linewidth=2, markersize=4)
-        ax.set_xlabel('Date/Time', fontsize=12)
-        ax.set_ylabel('AQI', fontsize=12)
-        ax.set_title('Air Quality Index Over Time', fontsize=14, fontweight='bold')
-        ax.grid(True, alpha=0.3)
-        
-        # Format x-axis
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-        plt.xticks(rotation=45)
-        
-        # Color zones
-        ax.axhspan(0, 50, alpha=0.1, color='green', label='Good')
-        ax.axhspan(51, 100, alpha=0.1, color='yellow', label='Moderate')
-        ax.axhspan(101, 150, alpha=0.1, color='orange', label='Unhealthy for Sensitive')
-        ax.axhspan(151, 500, alpha=0.1, color='red', label='Unhealthy')
-        
-        ax.legend(loc='upper right')
-        plt.tight_layout()
-        
-        return self._fig_to_base64(fig)
-    
-    def _create_station_comparison_chart(
-        self, 
-        readings: List[AirQualityReading],
-        stations: Dict[int, Station]
-    ) -> str:
-        """Create station comparison bar chart"""
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Calculate average AQI per station
-        station_aqis = {}
-        for reading in readings:
-            if reading.station_id not in station_aqis:
-                station_aqis[reading.station_id] = []
-            if reading.aqi:
-                station_aqis[reading.station_id].append(reading.aqi)
-        
-        station_names = []
-        avg_aqis = []
-        for station_id, aqis in station_aqis.items():
-            if station_id in stations:
-                station_names.append(stations[station_id].name[:20])  # Truncate long names
-                avg_aqis.append(sum(aqis) / len(aqis) if aqis else 0)
-        
-        bars = ax.bar(station_names, avg_aqis, color='steelblue')
-        
-        # Color bars based on AQI
-        for bar, aqi in zip(bars, avg_aqis):
-            if aqi <= 50:
-                bar.set_color('green')
-            elif aqi <= 100:
-                bar.set_color('yellow')
-            elif aqi <= 150:
-                bar.set_color('orange')
-            else:
-                bar.set_color('red')
-        
-        ax.set_xlabel('Station', fontsize=12)
-        ax.set_ylabel('Average AQI', fontsize=12)
-        ax.set_title('Average AQI by Station', fontsize=14, fontweight='bold')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
+        daily_stats = data['daily_stats']
+        if daily_stats:
+            jobs['daily_stats'] = (
+                _create_daily_stats_chart,
+                [stat.date for stat in daily_stats],
+                [stat.avg_aqi if stat.avg_aqi else 0 for stat in daily_stats],
+                [stat.max_aqi if stat.max_aqi else 0 for stat in daily_stats],
+                [stat.min_aqi if stat.min_aqi else 0 for stat in daily_stats]
+            )
         
-        return self._fig_to_base64(fig)
+        return _render_charts(jobs)
     
-    def _create_pollutant_chart(
+    def _generate_html(
         self,
-        readings: List[AirQualityReading],
-        pollutants: Dict[int, Pollutant]
+        report: Report,
+        data: Dict,
+        charts: Dict[str, bytes],
+        generated_at: datetime
     ) -> str:
-        """Create pollutant distribution pie chart"""
-        fig, ax = plt.subplots(figsize=(8, 8))
-        
-        # Count readings per pollutant
-        pollutant_counts = {}
-        for reading in readings:
-            pollutant_counts[reading.pollutant_id] = pollutant_counts.get(reading.pollutant_id, 0) + 1
-        
-        labels = []
-        sizes = []
-        for pollutant_id, count in pollutant_counts.items():
-            if pollutant_id in pollutants:
-                labels.append(pollutants[pollutant_id].name)
-                sizes.append(count)
-        
-        colors = plt.cm.Set3(range(len(labels)))
-        ax.pie(sizes, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
-        ax.set_title('Readings by Pollutant', fontsize=14, fontweight='bold')
-        plt.tight_layout()
-        
-        return self._fig_to_base64(fig)
-    
-    def _create_daily_stats_chart(self, daily_stats: List[AirQualityDailyStats]) -> str:
-        """Create daily statistics chart"""
-        fig, ax = plt.subplots(figsize=(12, 6))
-        
-        dates = [stat.date for stat in daily_stats]
-        avg_aqis = [stat.avg_aqi if stat.avg_aqi else 0 for stat in daily_stats]
-        max_aqis = [stat.max_aqi if stat.max_aqi else 0 for stat in daily_stats]
-        min_aqis = [stat.min_aqi if stat.min_aqi else 0 for stat in daily_stats]
-        
-        ax.plot(dates, avg_aqis, label='Average AQI', marker='o', linewidth=2)
-        ax.fill_between(dates, min_aqis, max_aqis, alpha=0.3, label='Min-Max Range')
-        
-        ax.set_xlabel('Date', fontsize=12)
-        ax.set_ylabel('AQI', fontsize=12)
-        ax.set_title('Daily Air Quality Statistics', fontsize=14, fontweight='bold')
-        ax.grid(True, alpha=0.3)
-        ax.legend()
-        
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        return self._fig_to_base64(fig)
-    
-    def _fig_to_base64(self, fig) -> str:
-        """Convert matplotlib figure to base64 string"""
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close(fig)
-        return f"data:image/png;base64,{img_base64}"
-    
-    def _generate_html(self, report: Report, data: Dict, charts: Dict[str, str]) -> str:
         """Generate HTML content for the PDF"""
         
         # Get station and pollutant names
         station_name = "All Stations"
         if report.station_id and report.station_id in data['stations']:
-            station_name = data['stations'][report.station_id].name
+            station_name = data['stations'][report.station_id]
         
         pollutant_name = "All Pollutants"
         if report.pollutant_id and report.pollutant_id in data['pollutants']:
-            pollutant_name = data['pollutants'][report.pollutant_id].name
+            pollutant_name = data['pollutants'][report.pollutant_id]
         
         stats = data['statistics']
-        
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>{report.title}</title>
-        </head>
-        <body>
-            <div class="header">
-                <h1>🌍 Air Quality Monitor</h1>
-                <p class="subtitle">Environmental Data Report</p>
-            </div>
-            
-            <div class="report-info">
-                <h2>{report.title}</h2>
-                <div class="info-grid">
-                    <div class="info-item">
-                        <span class="label">Period:</span>
-                        <span class="value">{report.start_date} to {report.end_date}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="label">Station:</span>
-                        <span class="value">{station_name}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="label">Pollutant:</span>
-                        <span class="value">{pollutant_name}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="label">Generated:</span>
-                        <span class="value">{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</span>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="summary">
-                <h3>Summary Statistics</h3>
-                <div class="stats-grid">
-                    <div class="stat-card">
-                        <div class="stat-label">Total Readings</div>
-                        <div class="stat-value">{stats['total_readings']}</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-label">Average AQI</div>
-                        <div class="stat-value">{stats['avg_aqi']:.1f}</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-label">Maximum AQI</div>
-                        <div class="stat-value">{stats['max_aqi']}</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-label">Minimum AQI</div>
-                        <div class="stat-value">{stats['min_aqi']}</div>
-                    </div>
-                </div>
-            </div>
-        """
-        
-        # Add charts
-        if charts:
-            html += '<div class="charts">'
-            html += '<h3>Data Visualizations</h3>'
-            
-            for chart_name, chart_data in charts.items():
-                html += f'<div class="chart-container">'
-                html += f'<img src="{chart_data}" alt="{chart_name}" />'
-                html += '</div>'
-            
-            html += '</div>'
-        
-        # Add interpretation
         avg_aqi = stats['avg_aqi']
-        interpretation = self._get_aqi_interpretation(avg_aqi)
-        
-        html += f"""
-            <div class="interpretation">
-                <h3>Air Quality Interpretation</h3>
-                <p>The average Air Quality Index (AQI) for this period is <strong>{avg_aqi:.1f}</strong>, 
-                which is classified as <strong>{interpretation['category']}</strong>.</p>
-                <p>{interpretation['description']}</p>
-            </div>
-            
-            <div class="footer">
-                <p>© 2025 Air Quality Monitor | Generated by Jarcoz Environmental System</p>
-                <p>This report was automatically generated based on data collected from monitoring stations.</p>
-            </div>
-        </body>
-        </html>
-        """
         
-        return html
+        return _REPORT_TEMPLATE.render(
+            report=report,
+            station_name=station_name,
+            pollutant_name=pollutant_name,
+            generated_at=generated_at.strftime('%Y-%m-%d %H:%M:%S'),
+            stats=stats,
+            charts=list(charts),
+            avg_aqi=avg_aqi,
+            interpretation=self._get_aqi_interpretation(avg_aqi)
+        )
     
     def _get_aqi_interpretation(self, aqi: float) -> Dict[str, str]:
         """Get AQI category and description"""
-        if aqi <= 50:
-            return {
-                'category': 'Good',
-                'description': 'Air quality is satisfactory, and air pollution poses little or no risk.'
-            }
-        elif aqi <= 100:
-            return {
-                'category': 'Moderate',
-                'description': 'Air quality is acceptable. However, there may be a risk for some people, particularly those who are unusually sensitive to air pollution.'
-            }
-        elif aqi <= 150:
-            return {
-                'category': 'Unhealthy for Sensitive Groups',
-                'description': 'Members of sensitive groups may experience health effects. The general public is less likely to be affected.'
-            }
-        elif aqi <= 200:
-            return {
-                'category': 'Unhealthy',
-                'description': 'Some members of the general public may experience health effects; members of sensitive groups may experience more serious health effects.'
-            }
-        elif aqi <= 300:
-            return {
-                'category': 'Very Unhealthy',
-                'description': 'Health alert: The risk of health effects is increased for everyone.'
-            }
-        else:
-            return {
-                'category': 'Hazardous',
-                'description': 'Health warning of emergency conditions: everyone is more likely to be affected.'
-            }
+        return _AQI_INTERPRETATIONS[bisect_left(_AQI_INTERPRETATION_BOUNDS, aqi)]
     
-    def _get_pdf_styles(self) -> str:
+    @staticmethod
+    def _get_pdf_styles() -> str:
         """CSS styles for PDF generation"""
         return """
         @page {
@@ -809,3 +1016,31 @@ class ReportGenerator:
             margin: 5px 0;
         }
         """
+
+
+def generate_report_file(report_id: int, user_id: int):
+    """
+    Background task: generate the file of a pending report with its own
+    session. If generation fails the report row is removed, so it does not
+    stay pending forever
+    """
+    db = SessionLocal()
+    try:
+        # Every report query (summary, charts, daily rollup) reads the same
+        # snapshot, so figures agree with each other while ingestion writes
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        report = db.query(Report).filter(Report.id == report_id).first()
+        if not report:
+            logger.warning(f"Report {report_id} not found, skipping generation")
+            return
+        
+        try:
+            ReportGenerator(db).generate_pdf_report(report, user_id)
+            logger.info(f"Report {report_id} generated")
+        except Exception as e:
+            logger.error(f"Report {report_id} generation failed: {str(e)}")
+            db.rollback()
+            db.delete(report)
+            db.commit()
+    finally:
+        db.close()
@@ -5,74 +5,375 @@ Sends air quality alerts to Telegram groups/channels
 
 import os
 import logging
-from typing import Optional, Dict, Any
+import math
+import time
+from bisect import bisect_left
+from typing import Optional, Dict, Any, List, Set, Tuple, Callable, Awaitable
 from datetime import datetime
+from html import escape
+from contextlib import nullcontext
+from functools import lru_cache
 import asyncio
 
+# python-telegram-bot (and its HTTP stack) is imported in TelegramNotifier
+# only when a bot token and chat are configured
+
 try:
-    from telegram import Bot
-    from telegram.error import TelegramError
-    TELEGRAM_AVAILABLE = True
+    from aiolimiter import AsyncLimiter
+    AIOLIMITER_AVAILABLE = True
 except ImportError:
-    TELEGRAM_AVAILABLE = False
-    logging.warning("python-telegram-bot not installed. Telegram notifications disabled.")
+    AIOLIMITER_AVAILABLE = False
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _env_seconds(name: str, default: float, low: float, high: float) -> float:
+    """Float env var clamped to [low, high]; NaN/inf fall back to the default"""
+    value = float(os.getenv(name, default))
+    if not math.isfinite(value):
+        return default
+    return max(low, min(high, value))
+
+
+@lru_cache(maxsize=256)
+def _escape_html(text: str) -> str:
+    """
+    Escape a dynamic value for Telegram's HTML parse mode (a stray & or <
+    would make Telegram reject the whole message); station and pollutant
+    names repeat, so results are cached
+    """
+    return escape(str(text), quote=False)
+
+
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+
+# Las alertas se agrupan en un solo mensaje: se envía cuando pasa este
+# intervalo desde la primera alerta en cola o cuando se llena el mensaje
+BATCH_FLUSH_INTERVAL = _env_seconds("TELEGRAM_BATCH_FLUSH_INTERVAL", 3.0, 0.1, 30.0)
+
+# Alertas pendientes como máximo (p. ej. con Telegram caído); al llenarse
+# se descarta la más antigua para conservar las más recientes
+MAX_QUEUED_ALERTS = 1000
+
+# Tamaño máximo de un mensaje agrupado (Telegram admite hasta 4096 caracteres)
+MAX_BATCH_CHARS = 3800
+
+BATCH_SEPARATOR = "\n\n──\n\n"
+
+# Pool de conexiones HTTP del bot: las conexiones TLS a api.telegram.org se
+# reutilizan durante toda la vida del proceso
+TELEGRAM_POOL_SIZE = max(1, int(os.getenv("TELEGRAM_POOL_SIZE", "32")))
+
+# Ventana en la que se omiten alertas repetidas de una misma estación,
+# contaminante y nivel (se cuentan y se indican en la siguiente que se envíe)
+ALERT_DEDUP_WINDOW = _env_seconds("TELEGRAM_ALERT_DEDUP_WINDOW", 300.0, 0.0, 3600.0)
+
+# Tiempo máximo esperando los envíos pendientes al apagar la aplicación
+SHUTDOWN_DRAIN_TIMEOUT = 15.0  # seconds
+
+# Límite de Telegram para un grupo: ~20 mensajes por minuto
+CHAT_RATE_LIMIT = 20
+CHAT_RATE_PERIOD = 60  # seconds
+
+# Intentos por mensaje ante 429 (RetryAfter) o errores de red
+MAX_SEND_ATTEMPTS = 5
+
+# Límites superiores (inclusivos) de cada nivel de AQI y su
+# (emoji, severidad, recomendación); el último nivel es AQI > 300
+AQI_THRESHOLDS = (50, 100, 150, 200, 300)
+AQI_LEVELS = (
+    ("🟢", "Bueno ✅",
+     "La calidad del aire es satisfactoria. Disfrute de actividades al aire libre."),
+    ("🟡", "Moderado ⚠️",
+     "Calidad del aire aceptable. Personas sensibles deben considerar limitar actividades prolongadas."),
+    ("🟠", "Dañino para Grupos Sensibles 🔶",
+     "Grupos sensibles pueden experimentar efectos. Reduzca esfuerzos prolongados al aire libre."),
+    ("🔴", "Dañino 🔴",
+     "Todos pueden experimentar efectos. Limite el tiempo al aire libre."),
+    ("🟣", "Muy Dañino ⛔",
+     "Alerta de salud: todos deben evitar esfuerzos al aire libre."),
+    ("🟤", "Peligroso ☠️",
+     "Emergencia de salud: permanezca en interiores con ventanas cerradas."),
+)
+
+# Condición de disparo de la alerta, en español
+CONDITION_TRANSLATIONS = {
+    'exceeds': 'supera',
+    'below': 'está por debajo de',
+    'equals': 'es igual a'
+}
+
+# Plantillas de los mensajes (HTML de Telegram), para str.format_map
+ALERT_TEMPLATE = """\
+🚨 <b>ALERTA DE CALIDAD DEL AIRE</b> {emoji}{repeats}
+
+📍 <b>Estación:</b> {station_name}
+🧪 <b>Contaminante:</b> {pollutant_name}
+
+📊 <b>Valores Actuales:</b>
+• Concentración: {current_value}
+• AQI: {aqi}
+• Umbral: {threshold}
+• Condición: {condition}
+
+⚠️ <b>Nivel:</b> {severity}
+
+🕐 <b>Hora:</b> {timestamp}
+
+💡 <b>Recomendación:</b>
+{recommendation}
+
+🌍 Air Quality Monitor - Jarcoz System"""
+
+SUMMARY_TEMPLATE = """\
+📊 <b>RESUMEN DIARIO - CALIDAD DEL AIRE</b> {emoji}
+
+📅 <b>Fecha:</b> {date}
+📈 <b>Lecturas Totales:</b> {total_readings}
+
+<b>Índices de Calidad del Aire:</b>
+• AQI Promedio: {avg_aqi:.1f}
+• AQI Máximo: {max_aqi}
+
+<b>Estado por Estación:</b>
+{station_rows}
+
+🌍 Air Quality Monitor - Jarcoz System"""
+
+STATION_ROW_TEMPLATE = "\n{emoji} {name}: AQI {avg_aqi:.1f}"
+
+
 class TelegramNotifier:
     """Service for sending notifications via Telegram"""
     
     def __init__(self):
-        self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-        self.chat_id = os.getenv("TELEGRAM_CHAT_ID")
-        self.enabled = TELEGRAM_AVAILABLE and self.bot_token and self.chat_id
+        self.bot_token = TELEGRAM_BOT_TOKEN
+        self.chat_id = TELEGRAM_CHAT_ID
+        self.enabled = False
         
-        if not TELEGRAM_AVAILABLE:
-            logger.warning("Telegram notifications disabled: python-telegram-bot not installed")
-        elif not self.bot_token:
+        # Cola de alertas pendientes y tarea que las agrupa (creadas al primer envío)
+        self._queue: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        # Envíos en curso (referencias para que no se recolecten a medio enviar)
+        self._inflight: Set[asyncio.Task] = set()
+        # (estación, contaminante, nivel) -> [último envío, alertas omitidas desde entonces]
+        self._dedup: Dict[Tuple[str, str, str], List] = {}
+        
+        if not self.bot_token:
             logger.warning("Telegram notifications disabled: TELEGRAM_BOT_TOKEN not configured")
         elif not self.chat_id:
             logger.warning("Telegram notifications disabled: TELEGRAM_CHAT_ID not configured")
         else:
-            self.bot = Bot(token=self.bot_token)
-            logger.info(f"Telegram notifier initialized for chat {self.chat_id}")
+            self._init_bot()
+    
+    def _init_bot(self):
+        """Import python-telegram-bot and build the bot (enables the notifier)"""
+        try:
+            from telegram import Bot
+            from telegram.error import NetworkError, RetryAfter, TelegramError
+            from telegram.request import HTTPXRequest
+        except ImportError:
+            logger.warning("Telegram notifications disabled: python-telegram-bot not installed")
+            return
+        
+        # Clases de error usadas en los except de los envíos
+        self._TelegramError = TelegramError
+        self._RetryAfter = RetryAfter
+        self._NetworkError = NetworkError
+        
+        self._request = HTTPXRequest(
+            connection_pool_size=TELEGRAM_POOL_SIZE,
+            pool_timeout=5.0,
+            connect_timeout=5.0,
+            read_timeout=10.0
+        )
+        self.bot = Bot(token=self.bot_token, request=self._request)
+        # Sin aiolimiter no se limita de antemano; los 429 se reintentan igual
+        self._limiter = (
+            AsyncLimiter(CHAT_RATE_LIMIT, CHAT_RATE_PERIOD)
+            if AIOLIMITER_AVAILABLE else nullcontext()
+        )
+        self.enabled = True
+        logger.info("Telegram notifier initialized for chat %s", self.chat_id)
     
     async def send_alert(
         self,
         alert_data: Dict[str, Any],
-        reading_data: Dict[str, Any]
+        reading_data: Dict[str, Any],
+        on_failure: Optional[Callable[[], Awaitable[None]]] = None
     ) -> bool:
         """
-        Send an air quality alert to Telegram
+        Queue an air quality alert for Telegram. Alerts queued within
+        BATCH_FLUSH_INTERVAL are sent together as a single message.
         
         Args:
             alert_data: Dictionary with alert information
             reading_data: Dictionary with current reading that triggered alert
+            on_failure: Awaited if the queued alert is finally not delivered
+                (send failed after MAX_SEND_ATTEMPTS, or dropped on overflow)
             
         Returns:
-            True if message sent successfully, False otherwise
+            True if the alert was queued, False otherwise
         """
         if not self.enabled:
             logger.debug("Telegram notifications disabled, skipping alert")
             return False
         
         try:
-            message = self._format_alert_message(alert_data, reading_data)
-            await self.bot.send_message(
-                chat_id=self.chat_id,
-                text=message,
-                parse_mode='HTML'
-            )
-            logger.info(f"Alert sent to Telegram: {alert_data.get('station_name')} - {alert_data.get('pollutant_name')}")
+            fields = self._alert_fields(alert_data, reading_data)
+        except Exception as e:
+            logger.error("Unexpected error formatting Telegram alert: %s", e)
+            return False
+        
+        if self._suppress_duplicate(fields):
+            logger.info("Duplicate alert suppressed: %s - %s",
+                        alert_data.get('station_name'), alert_data.get('pollutant_name'))
             return True
+        
+        self._ensure_flush_task()
+        try:
+            self._queue.put_nowait((fields, on_failure))
+        except asyncio.QueueFull:
+            _, dropped_on_failure = self._queue.get_nowait()
+            self._queue.task_done()
+            self._queue.put_nowait((fields, on_failure))
+            logger.warning("Telegram alert queue full, dropped the oldest alert")
+            self._track(self._notify_failure([dropped_on_failure]))
+        logger.info("Alert queued for Telegram: %s - %s",
+                    alert_data.get('station_name'), alert_data.get('pollutant_name'))
+        return True
+    
+    async def close(self):
+        """
+        Send the pending alerts (up to SHUTDOWN_DRAIN_TIMEOUT) and close the
+        bot's HTTP connection pool (called on app shutdown)
+        """
+        if not self.enabled:
+            return
+        try:
+            await asyncio.wait_for(self.drain(), timeout=SHUTDOWN_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Telegram alerts still pending at shutdown were dropped")
+        await self._request.shutdown()
+    
+    async def drain(self):
+        """Wait until every queued alert has been delivered"""
+        if self._queue is not None:
+            await self._queue.join()
+        await asyncio.gather(*self._inflight, return_exceptions=True)
+    
+    def _suppress_duplicate(self, fields: Dict[str, str]) -> bool:
+        """
+        True (and counted) if the same station/pollutant/severity alert was
+        queued within ALERT_DEDUP_WINDOW; otherwise notes the alerts omitted
+        since the last one in its fields
+        """
+        key = (fields['station_name'], fields['pollutant_name'], fields['severity'])
+        now = time.monotonic()
+        entry = self._dedup.get(key)
+        if entry is not None and now - entry[0] < ALERT_DEDUP_WINDOW:
+            entry[1] += 1
+            return True
+        
+        if entry is not None and entry[1]:
+            fields['repeats'] = f" (+{entry[1]} similares omitidas)"
+        self._dedup[key] = [now, 0]
+        return False
+    
+    def _evict_dedup(self):
+        """Forget expired dedup entries with no omitted alerts pending"""
+        now = time.monotonic()
+        for key, (sent_at, omitted) in list(self._dedup.items()):
+            if not omitted and now - sent_at >= ALERT_DEDUP_WINDOW:
+                del self._dedup[key]
+    
+    def _ensure_flush_task(self):
+        """Start the batching task on the running event loop if it isn't running"""
+        if self._flush_task is None or self._flush_task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=MAX_QUEUED_ALERTS)
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        """
+        Agrupa las alertas en cola: espera la primera y acumula las que lleguen
+        durante BATCH_FLUSH_INTERVAL (sin pasar de MAX_BATCH_CHARS), y las
+        envía en un solo mensaje
+        """
+        loop = asyncio.get_running_loop()
+        carry = None  # alerta que no cupo en el mensaje anterior
+        
+        while True:
+            fields, on_failure = carry if carry is not None else await self._queue.get()
+            carry = None
+            # Una sola marca de hora para todas las alertas del lote
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            message = self._format_alert_message(fields, timestamp)
+            batch = [message]
+            callbacks = [on_failure]
+            size = len(message)
+            deadline = loop.time() + BATCH_FLUSH_INTERVAL
+            
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                message = self._format_alert_message(item[0], timestamp)
+                if size + len(BATCH_SEPARATOR) + len(message) > MAX_BATCH_CHARS:
+                    carry = item
+                    break
+                batch.append(message)
+                callbacks.append(item[1])
+                size += len(BATCH_SEPARATOR) + len(message)
+            
+            self._evict_dedup()
             
-        except TelegramError as e:
-            logger.error(f"Failed to send Telegram alert: {str(e)}")
+            # Entregar en segundo plano y seguir agrupando mientras tanto
+            self._track(self._deliver(batch, callbacks))
+    
+    def _track(self, coro):
+        """Run a coroutine as a background task kept in the in-flight set"""
+        task = asyncio.create_task(coro)
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+    
+    async def _deliver(self, batch: List[str], callbacks: List):
+        """Send a batch and mark its alerts as done in the queue"""
+        try:
+            if not await self._send_batch(batch):
+                await self._notify_failure(callbacks)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+    
+    async def _notify_failure(self, callbacks: List):
+        """Await the on_failure callbacks of alerts that were not delivered"""
+        for on_failure in callbacks:
+            if on_failure is None:
+                continue
+            try:
+                await on_failure()
+            except Exception as e:
+                logger.error("Telegram alert failure callback raised: %s", e)
+    
+    async def _send_batch(self, batch: List[str]) -> bool:
+        """Send a batch of formatted alerts as one Telegram message"""
+        try:
+            await self._send_message(BATCH_SEPARATOR.join(batch))
+            logger.info("Sent %d alert(s) to Telegram", len(batch))
+            return True
+            
+        except self._TelegramError as e:
+            logger.error("Failed to send Telegram alerts: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error sending Telegram alert: {str(e)}")
+            logger.error("Unexpected error sending Telegram alerts: %s", e)
             return False
     
     async def send_daily_summary(
@@ -93,24 +394,49 @@ class TelegramNotifier:
         
         try:
             message = self._format_summary_message(summary_data)
-            await self.bot.send_message(
-                chat_id=self.chat_id,
-                text=message,
-                parse_mode='HTML'
-            )
+            await self._send_message(message)
             logger.info("Daily summary sent to Telegram")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send daily summary: {str(e)}")
+            logger.error("Failed to send daily summary: %s", e)
             return False
     
-    def _format_alert_message(
+    async def _send_message(self, text: str):
+        """
+        Send an HTML message to the chat within the rate limit, waiting out
+        429 responses (retry_after) and retrying network errors with
+        exponential backoff, up to MAX_SEND_ATTEMPTS
+        """
+        for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+            try:
+                async with self._limiter:
+                    await self.bot.send_message(
+                        chat_id=self.chat_id,
+                        text=text,
+                        parse_mode='HTML'
+                    )
+                return
+            except self._RetryAfter as e:
+                if attempt == MAX_SEND_ATTEMPTS:
+                    raise
+                logger.warning("Telegram rate limit hit, retrying in %ss", e.retry_after)
+                await asyncio.sleep(e.retry_after + 0.1)
+            except self._NetworkError as e:  # includes TimedOut
+                if attempt == MAX_SEND_ATTEMPTS:
+                    raise
+                logger.warning("Telegram network error (%s), retry %d/%d", e, attempt, MAX_SEND_ATTEMPTS - 1)
+                await asyncio.sleep(2 ** (attempt - 1))
+    
+    def _alert_fields(
         self,
         alert_data: Dict[str, Any],
         reading_data: Dict[str, Any]
-    ) -> str:
-        """Format alert data into a Telegram message"""
+    ) -> Dict[str, str]:
+        """
+        Values of ALERT_TEMPLATE for an alert, already formatted as text
+        (all but the timestamp, which is set once per batch)
+        """
         
         station_name = alert_data.get('station_name', 'Unknown Station')
         pollutant_name = alert_data.get('pollutant_name', 'Unknown Pollutant')
@@ -119,34 +445,25 @@ class TelegramNotifier:
         aqi = reading_data.get('aqi', 0)
         condition = alert_data.get('trigger_condition', 'exceeds')
         
-        # Determinar emoji según el nivel de AQI
-        emoji = self._get_aqi_emoji(aqi)
+        # Emoji, severidad y recomendación según el nivel de AQI
+        emoji, severity, recommendation = self._level(aqi)
         
-        # Determinar severidad
-        severity = self._get_severity_level(aqi)
-        
-        message = f"""
-🚨 <b>ALERTA DE CALIDAD DEL AIRE</b> {emoji}
-
-📍 <b>Estación:</b> {station_name}
-🧪 <b>Contaminante:</b> {pollutant_name}
-
-📊 <b>Valores Actuales:</b>
-• Concentración: {current_value:.2f}
-• AQI: {aqi}
-• Umbral: {threshold}
-• Condición: {self._translate_condition(condition)}
-
-⚠️ <b>Nivel:</b> {severity}
-
-🕐 <b>Hora:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-💡 <b>Recomendación:</b>
-{self._get_health_recommendation(aqi)}
-
-🌍 Air Quality Monitor - Jarcoz System
-"""
-        return message.strip()
+        return {
+            'emoji': emoji,
+            'station_name': _escape_html(station_name),
+            'pollutant_name': _escape_html(pollutant_name),
+            'current_value': f"{current_value:.2f}",
+            'aqi': aqi,
+            'threshold': threshold,
+            'condition': _escape_html(self._translate_condition(condition)),
+            'severity': severity,
+            'recommendation': recommendation,
+            'repeats': "",
+        }
+    
+    def _format_alert_message(self, fields: Dict[str, str], timestamp: str) -> str:
+        """Format an alert's template values into a Telegram message"""
+        return ALERT_TEMPLATE.format_map({**fields, 'timestamp': timestamp})
     
     def _format_summary_message(self, summary_data: Dict[str, Any]) -> str:
         """Format daily summary into a Telegram message"""
@@ -157,84 +474,33 @@ class TelegramNotifier:
         max_aqi = summary_data.get('max_aqi', 0)
         stations_data = summary_data.get('stations', [])
         
-        emoji = self._get_aqi_emoji(avg_aqi)
+        emoji = self._level(avg_aqi)[0]
         
-        message = f"""
-📊 <b>RESUMEN DIARIO - CALIDAD DEL AIRE</b> {emoji}
-
-📅 <b>Fecha:</b> {date}
-📈 <b>Lecturas Totales:</b> {total_readings}
-
-<b>Índices de Calidad del Aire:</b>
-• AQI Promedio: {avg_aqi:.1f}
-• AQI Máximo: {max_aqi}
-
-<b>Estado por Estación:</b>
-"""
-        
-        for station in stations_data[:5]:  # Limitar a 5 estaciones
-            name = station.get('name', 'Unknown')
-            aqi = station.get('avg_aqi', 0)
-            emoji_st = self._get_aqi_emoji(aqi)
-            message += f"\n{emoji_st} {name}: AQI {aqi:.1f}"
+        station_rows = "".join(
+            STATION_ROW_TEMPLATE.format_map({
+                'emoji': self._level(station.get('avg_aqi', 0))[0],
+                'name': _escape_html(station.get('name', 'Unknown')),
+                'avg_aqi': station.get('avg_aqi', 0),
+            })
+            for station in stations_data[:5]  # Limitar a 5 estaciones
+        )
         
-        message += "\n\n🌍 Air Quality Monitor - Jarcoz System"
-        
-        return message.strip()
-    
-    def _get_aqi_emoji(self, aqi: float) -> str:
-        """Get emoji based on AQI level"""
-        if aqi <= 50:
-            return "🟢"  # Good
-        elif aqi <= 100:
-            return "🟡"  # Moderate
-        elif aqi <= 150:
-            return "🟠"  # Unhealthy for Sensitive
-        elif aqi <= 200:
-            return "🔴"  # Unhealthy
-        elif aqi <= 300:
-            return "🟣"  # Very Unhealthy
-        else:
-            return "🟤"  # Hazardous
-    
-    def _get_severity_level(self, aqi: float) -> str:
-        """Get severity description based on AQI"""
-        if aqi <= 50:
-            return "Bueno ✅"
-        elif aqi <= 100:
-            return "Moderado ⚠️"
-        elif aqi <= 150:
-            return "Dañino para Grupos Sensibles 🔶"
-        elif aqi <= 200:
-            return "Dañino 🔴"
-        elif aqi <= 300:
-            return "Muy Dañino ⛔"
-        else:
-            return "Peligroso ☠️"
+        return SUMMARY_TEMPLATE.format_map({
+            'emoji': emoji,
+            'date': _escape_html(date),
+            'total_readings': total_readings,
+            'avg_aqi': avg_aqi,
+            'max_aqi': max_aqi,
+            'station_rows': station_rows,
+        })
     
-    def _get_health_recommendation(self, aqi: float) -> str:
-        """Get health recommendation based on AQI"""
-        if aqi <= 50:
-            return "La calidad del aire es satisfactoria. Disfrute de actividades al aire libre."
-        elif aqi <= 100:
-            return "Calidad del aire aceptable. Personas sensibles deben considerar limitar actividades prolongadas."
-        elif aqi <= 150:
-            return "Grupos sensibles pueden experimentar efectos. Reduzca esfuerzos prolongados al aire libre."
-        elif aqi <= 200:
-            return "Todos pueden experimentar efectos. Limite el tiempo al aire libre."
-        elif aqi <= 300:
-            return "Alerta de salud: todos deben evitar esfuerzos al aire libre."
-        else:
-            return "Emergencia de salud: permanezca en interiores con ventanas cerradas."
+    def _level(self, aqi: float) -> Tuple[str, str, str]:
+        """(emoji, severity, health recommendation) for an AQI value"""
+        return AQI_LEVELS[bisect_left(AQI_THRESHOLDS, aqi)]
     
     def _translate_condition(self, condition: str) -> str:
         """Translate trigger condition to Spanish"""
-        translations = {
-            'exceeds': 'supera',
-            'below': 'está por debajo de',
-            'equals': 'es igual a'
-        }
-        return translations.get(condition, condition)
+        return CONDITION_TRANSLATIONS.get(condition, condition)
     
     async def test_connection(self) -> bool:
         """Test Telegram bot connection"""
@@ -244,7 +510,7 @@ class TelegramNotifier:
         
         try:
             bot_info = await self.bot.get_me()
-            logger.info(f"Telegram bot connected: @{bot_info.username}")
+            logger.info("Telegram bot connected: @%s", bot_info.username)
             
             # Send test message
             await self.bot.send_message(
@@ -254,19 +520,14 @@ class TelegramNotifier:
             return True
             
         except Exception as e:
-            logger.error(f"Telegram connection test failed: {str(e)}")
+            logger.error("Telegram connection test failed: %s", e)
             return False
 
 
-# Singleton instance
-_notifier_instance = None
-
+@lru_cache(maxsize=1)
 def get_telegram_notifier() -> TelegramNotifier:
     """Get or create Telegram notifier singleton"""
-    global _notifier_instance
-    if _notifier_instance is None:
-        _notifier_instance = TelegramNotifier()
-    return _notifier_instance
+    return TelegramNotifier()
 
 
 async def main():
@@ -291,9 +552,16 @@ async def main():
         }
         
         await notifier.send_alert(test_alert, test_reading)
+        await notifier.drain()
     else:
         logger.error("Telegram notifier not enabled. Check configuration.")
 
 
 if __name__ == "__main__":
+    try:
+        # uvloop's C event loop and TLS socket path, same loop uvicorn uses for the API
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main())